@@ -0,0 +1,93 @@
+import hashlib
+from typing import Final, Literal, TypeAlias
+
+from app import bip32
+from app.base58 import check_encode_many
+
+ScriptType: TypeAlias = Literal["p2pkh", "p2wpkh", "p2tr"]
+Addresses: TypeAlias = dict[ScriptType, str]
+
+# Bitcoin mainnet
+P2PKH_VERSION: Final[bytes] = b"\x00"
+HRP: Final[str] = "bc"
+
+# BIP173 and BIP350
+CHARSET: Final[str] = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_CONSTANT: Final[int] = 1
+BECH32M_CONSTANT: Final[int] = 0x2BC830A3
+GENERATOR: Final[tuple[int, ...]] = (
+    0x3B6A57B2,
+    0x26508E6D,
+    0x1EA119FA,
+    0x3D4233DD,
+    0x2A1462B3,
+)
+
+# BIP340 tagged hash: the two hashes of the tag are the same for every key
+TAP_TWEAK_PREFIX: Final[bytes] = hashlib.sha256(b"TapTweak").digest() * 2
+
+
+def polymod(values: list[int], checksum: int = 1) -> int:
+    for value in values:
+        top: int = checksum >> 25
+        checksum = (checksum & 0x1FFFFFF) << 5 ^ value
+        for bit in range(5):
+            if top >> bit & 1:
+                checksum ^= GENERATOR[bit]
+    return checksum
+
+
+# checksum state after the human readable part, shared by every address
+HRP_CHECKSUM: Final[int] = polymod(
+    [ord(char) >> 5 for char in HRP] + [0] + [ord(char) & 31 for char in HRP]
+)
+
+
+def to_words(data: bytes) -> list[int]:
+    # 8 bits bytes to 5 bits words, the last one padded with zeros
+    bits: int = len(data) * 8
+    padding: int = -bits % 5
+    value: int = int.from_bytes(data) << padding
+    count: int = (bits + padding) // 5
+    return [value >> 5 * (count - 1 - index) & 31 for index in range(count)]
+
+
+def segwit_address(version: int, program: bytes) -> str:
+    # bech32 for version 0 witness programs, bech32m from version 1
+    data: list[int] = [version, *to_words(program)]
+    checksum: int = polymod(data + [0] * 6, HRP_CHECKSUM) ^ (
+        BECH32_CONSTANT if version == 0 else BECH32M_CONSTANT
+    )
+    data += [checksum >> 5 * (5 - index) & 31 for index in range(6)]
+    return HRP + "1" + "".join(CHARSET[word] for word in data)
+
+
+def taproot_output_key(public_key: bytes) -> bytes:
+    # BIP86, key path spending only: the x-only internal key tweaked by its
+    # own tagged hash
+    x: bytes = public_key[1:]
+    tweak: bytes = hashlib.sha256(TAP_TWEAK_PREFIX + x).digest()
+    return bip32.add_tweak(b"\x02" + x, tweak)[1:]
+
+
+def encode_addresses(
+    public_keys: list[bytes], scripts: tuple[ScriptType, ...]
+) -> list[Addresses]:
+    # addresses of compressed public keys, each script type encoded for the
+    # whole list at once: HASH160 computed once for P2PKH and P2WPKH, and the
+    # Base58Check of P2PKH in a single call
+    columns: dict[ScriptType, list[str]] = {}
+    if "p2pkh" in scripts or "p2wpkh" in scripts:
+        hashes: list[bytes] = [bip32.hash160(key) for key in public_keys]
+        if "p2pkh" in scripts:
+            columns["p2pkh"] = check_encode_many([P2PKH_VERSION + h for h in hashes])
+        if "p2wpkh" in scripts:
+            columns["p2wpkh"] = [segwit_address(0, h) for h in hashes]
+    if "p2tr" in scripts:
+        columns["p2tr"] = [
+            segwit_address(1, taproot_output_key(key)) for key in public_keys
+        ]
+    return [
+        {script: columns[script][position] for script in scripts}
+        for position in range(len(public_keys))
+    ]
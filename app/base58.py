@@ -0,0 +1,66 @@
+import hashlib
+from collections.abc import Iterable
+from typing import Final
+
+ALPHABET: Final[str] = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+INDEXES: Final[dict[str, int]] = {char: index for index, char in enumerate(ALPHABET)}
+# every pair of digits, 58 * 58 = 3364 entries
+PAIRS: Final[tuple[str, ...]] = tuple(a + b for a in ALPHABET for b in ALPHABET)
+PAIR_BASE: Final[int] = 58 * 58
+# 10 digits per chunk, still a machine word for the int -> chunks divisions
+CHUNK_PAIRS: Final[int] = 5
+CHUNK_BASE: Final[int] = PAIR_BASE**CHUNK_PAIRS
+CHECKSUM_SIZE: Final[int] = 4
+
+
+def checksum(data: bytes) -> bytes:
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()[:CHECKSUM_SIZE]
+
+
+def encode(data: bytes) -> str:
+    # the big integer is split in base 58^10 chunks, then each chunk in 5 pairs
+    # of digits read from a table: 12 big integer divisions for an extended key
+    # instead of 111
+    value: int = int.from_bytes(data)
+    chunks: list[int] = []
+    while value:
+        value, chunk = divmod(value, CHUNK_BASE)
+        chunks.append(chunk)
+    digits: list[str] = []
+    for chunk in reversed(chunks):
+        # unrolled for CHUNK_PAIRS = 5
+        chunk, e = divmod(chunk, PAIR_BASE)
+        chunk, d = divmod(chunk, PAIR_BASE)
+        chunk, c = divmod(chunk, PAIR_BASE)
+        a, b = divmod(chunk, PAIR_BASE)
+        digits += (PAIRS[a], PAIRS[b], PAIRS[c], PAIRS[d], PAIRS[e])
+    zeros: int = len(data) - len(data.lstrip(b"\0"))
+    return ALPHABET[0] * zeros + "".join(digits).lstrip(ALPHABET[0])
+
+
+def decode(encoded: str) -> bytes:
+    value: int = 0
+    for char in encoded:
+        index: int | None = INDEXES.get(char)
+        if index is None:
+            raise ValueError(f"invalid base58 character: {char!r}")
+        value = value * 58 + index
+    zeros: int = len(encoded) - len(encoded.lstrip(ALPHABET[0]))
+    return bytes(zeros) + value.to_bytes((value.bit_length() + 7) // 8)
+
+
+def check_encode(data: bytes) -> str:
+    return encode(data + checksum(data))
+
+
+def check_encode_many(items: Iterable[bytes]) -> list[str]:
+    # batch of extended keys, encoded in one call from the CPU executor
+    return [encode(data + checksum(data)) for data in items]
+
+
+def check_decode(encoded: str) -> bytes:
+    decoded: bytes = decode(encoded)
+    data, expected = decoded[:-CHECKSUM_SIZE], decoded[-CHECKSUM_SIZE:]
+    if len(decoded) < CHECKSUM_SIZE or checksum(data) != expected:
+        raise ValueError("base58 checksum is not valid")
+    return data
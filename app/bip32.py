@@ -0,0 +1,179 @@
+import hashlib
+import hmac
+from typing import Final, Self
+
+from coincurve import PublicKey  # libsecp256k1, a dependency of hdwallet
+
+from app.base58 import check_decode, check_encode
+from app.derivation import HARDENED
+
+CURVE_ORDER: Final[int] = (
+    0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+)
+MASTER_KEY: Final[bytes] = b"Bitcoin seed"
+XPRV_VERSION: Final[bytes] = bytes.fromhex("0488ade4")
+XPUB_VERSION: Final[bytes] = bytes.fromhex("0488b21e")
+NODE_SIZE: Final[int] = 78
+
+
+def hash160(data: bytes) -> bytes:
+    sha256: bytes = hashlib.sha256(data).digest()
+    try:
+        return hashlib.new("ripemd160", sha256).digest()
+    except ValueError:
+        # OpenSSL 3 may not provide the legacy RIPEMD-160
+        from hdwallet.libs.ripemd160 import ripemd160
+
+        return ripemd160(sha256)
+
+
+# Bitcoin BIP32 extended key, on raw bytes: a 32 bytes private key or a 33
+# bytes compressed public key, and its chain code. Serialized, it is the same
+# 78 bytes as hdwallet's xprivate_key(encoded=False) and xpublic_key(...).
+class Node:
+    __slots__: tuple[str, ...] = (
+        "depth",
+        "parent_fingerprint",
+        "index",
+        "chain_code",
+        "private_key",
+        "_public_key",
+        "_fingerprint",
+    )
+
+    def __init__(
+        self,
+        depth: int,
+        parent_fingerprint: bytes,
+        index: int,
+        chain_code: bytes,
+        private_key: bytes | None,
+        public_key: bytes | None = None,
+    ) -> None:
+        self.depth: int = depth
+        self.parent_fingerprint: bytes = parent_fingerprint
+        self.index: int = index
+        self.chain_code: bytes = chain_code
+        self.private_key: bytes | None = private_key
+        self._public_key: bytes | None = public_key
+        self._fingerprint: bytes | None = None
+
+    @classmethod
+    def from_seed(cls, seed: bytes) -> Self:
+        digest: bytes = hmac.digest(MASTER_KEY, seed, "sha512")
+        check_private_key(int.from_bytes(digest[:32]))
+        return cls(0, bytes(4), 0, digest[32:], digest[:32])
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> Self:
+        if len(raw) != NODE_SIZE:
+            raise ValueError(f"extended key must be {NODE_SIZE} bytes")
+        version: bytes = raw[:4]
+        key: bytes = raw[45:]
+        depth, parent_fingerprint, index, chain_code = (
+            raw[4],
+            raw[5:9],
+            int.from_bytes(raw[9:13]),
+            raw[13:45],
+        )
+        if version == XPRV_VERSION and key[0] == 0:
+            check_private_key(int.from_bytes(key[1:]))
+            return cls(depth, parent_fingerprint, index, chain_code, key[1:])
+        if version == XPUB_VERSION and key[0] in (2, 3):
+            # raises on a point which is not on the curve
+            _ = PublicKey(key)
+            return cls(depth, parent_fingerprint, index, chain_code, None, key)
+        raise ValueError("not a Bitcoin mainnet extended key")
+
+    @classmethod
+    def decode(cls, encoded: str) -> Self:
+        return cls.from_bytes(check_decode(encoded))
+
+    @property
+    def public_key(self) -> bytes:
+        # computed once per node, siblings derived from a parent share it
+        if self._public_key is None:
+            assert self.private_key is not None
+            self._public_key = PublicKey.from_valid_secret(self.private_key).format()
+        return self._public_key
+
+    def fingerprint(self) -> bytes:
+        if self._fingerprint is None:
+            self._fingerprint = hash160(self.public_key)[:4]
+        return self._fingerprint
+
+    def child(self, index: int) -> "Node":
+        # CKDpriv, or CKDpub for a public node
+        if index >= HARDENED:
+            if self.private_key is None:
+                raise ValueError("hardened child of a public key")
+            data: bytes = b"\x00" + self.private_key + index.to_bytes(4)
+        else:
+            data = self.public_key + index.to_bytes(4)
+        digest: bytes = hmac.digest(self.chain_code, data, "sha512")
+        tweak: int = int.from_bytes(digest[:32])
+        if tweak >= CURVE_ORDER:
+            raise ValueError(f"invalid child {index}, use the next index")
+        if self.private_key is None:
+            return Node(
+                self.depth + 1,
+                self.fingerprint(),
+                index,
+                digest[32:],
+                None,
+                add_tweak(self.public_key, digest[:32]),
+            )
+        key: int = (tweak + int.from_bytes(self.private_key)) % CURVE_ORDER
+        check_private_key(key)
+        return Node(
+            self.depth + 1,
+            self.fingerprint(),
+            index,
+            digest[32:],
+            key.to_bytes(32),
+        )
+
+    def derive(self, indexes: tuple[int, ...]) -> "Node":
+        node: Node = self
+        for index in indexes:
+            node = node.child(index)
+        return node
+
+    def neuter(self) -> "Node":
+        return Node(
+            self.depth,
+            self.parent_fingerprint,
+            self.index,
+            self.chain_code,
+            None,
+            self.public_key,
+        )
+
+    def to_bytes(self, private: bool = True) -> bytes:
+        header: bytes = (
+            bytes((self.depth,))
+            + self.parent_fingerprint
+            + self.index.to_bytes(4)
+            + self.chain_code
+        )
+        if private and self.private_key is not None:
+            return XPRV_VERSION + header + b"\x00" + self.private_key
+        return XPUB_VERSION + header + self.public_key
+
+    def xprv(self) -> str:
+        if self.private_key is None:
+            raise ValueError("public node has no private key")
+        return check_encode(self.to_bytes())
+
+    def xpub(self) -> str:
+        return check_encode(self.to_bytes(private=False))
+
+
+def check_private_key(key: int) -> None:
+    if not 0 < key < CURVE_ORDER:
+        raise ValueError("invalid private key, use the next index")
+
+
+def add_tweak(public_key: bytes, tweak: bytes) -> bytes:
+    # compressed public key of P + tweak·G
+    return PublicKey(public_key).add(tweak).format()
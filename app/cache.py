@@ -0,0 +1,155 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import ClassVar, Generic, NamedTuple, TypeVar
+
+from pydantic import BaseModel, ConfigDict, computed_field
+
+K = TypeVar("K", bound=Hashable)
+
+
+class CacheStats(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    entries: int
+    size: int
+    max_size: int
+    max_entries: int | None
+
+    @computed_field
+    @property
+    def hit_rate(self) -> float:
+        lookups: int = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry(NamedTuple):
+    value: bytearray
+    expires_at: float
+
+
+def zeroise(buffer: bytearray) -> None:
+    buffer[:] = bytes(len(buffer))
+
+
+def keyed_fingerprint(key: bytes, *parts: bytes) -> bytes:
+    # keyed with a per-cache random key, so secrets never appear in keys
+    blake2b = hashlib.blake2b(key=key, digest_size=16)
+    for part in parts:
+        blake2b.update(len(part).to_bytes(4, "big"))
+        blake2b.update(part)
+    return blake2b.digest()
+
+
+# LRU cache of secret byte strings. Values are copied into private bytearrays
+# which are overwritten with zeros as soon as they leave the cache, whether
+# evicted, expired or cleared. `max_size` bounds the number of stored bytes,
+# `max_entries` optionally bounds the number of entries.
+class SecretCache(Generic[K]):
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        max_entries: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.max_entries: int | None = max_entries
+        self._clock: Callable[[], float] = clock
+        self._entries: OrderedDict[K, _Entry] = OrderedDict()
+        self._size: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._fingerprint_key: bytes = secrets.token_bytes(32)
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0 and self.max_entries != 0
+
+    def fingerprint(self, *parts: bytes) -> bytes:
+        return keyed_fingerprint(self._fingerprint_key, *parts)
+
+    def get(self, key: K) -> bytes | None:
+        value: bytes | None = self.peek(key)
+        self.record(hit=value is not None)
+        return value
+
+    def peek(self, key: K) -> bytes | None:
+        # like get(), without touching the hit and miss counters: for callers
+        # probing several keys to answer a single lookup, see record()
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                self._discard(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return bytes(entry.value)
+
+    def record(self, hit: bool) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key: K, value: bytes) -> None:
+        if not self.enabled or len(value) > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = _Entry(bytearray(value), self._clock() + self.ttl)
+            self._size += len(value)
+            while self._size > self.max_size or (
+                self.max_entries is not None and len(self._entries) > self.max_entries
+            ):
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def delete(self, key: K) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._discard(key)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                expirations=self.expirations,
+                entries=len(self._entries),
+                size=self._size,
+                max_size=self.max_size,
+                max_entries=self.max_entries,
+            )
+
+    def _discard(self, key: K) -> None:
+        entry = self._entries.pop(key)
+        self._size -= len(entry.value)
+        zeroise(entry.value)
@@ -0,0 +1,107 @@
+import struct
+from pathlib import Path
+from typing import Final, NamedTuple, Self
+
+from app.addresses import ScriptType
+from app.bip32 import NODE_SIZE, XPRV_VERSION
+from app.cache import SecretCache
+from app.shared_cache import CURSOR_SIZE, SharedCursorCache
+from app.settings import settings
+
+# private key, chain code, depth, next child and flags of an account node
+STATE: Final[struct.Struct] = struct.Struct(">32s32sBIB")
+PUBLIC_ONLY, HEX_ENCODING, HARDENED_CHILDREN = 1, 2, 4
+# script types of the addresses of every child, always in this order
+SCRIPT_FLAGS: Final[dict[ScriptType, int]] = {"p2pkh": 8, "p2wpkh": 16, "p2tr": 32}
+assert STATE.size == CURSOR_SIZE
+
+
+# a cursor over the children of an account node, with the options of its
+# pages. Only what the derivation of the children needs is kept: not the
+# index nor the parent fingerprint of the account node itself.
+class CursorState(NamedTuple):
+    private_key: bytes
+    chain_code: bytes
+    depth: int
+    position: int
+    public_only: bool
+    hex_encoding: bool
+    hardened: bool
+    scripts: tuple[ScriptType, ...] = ()
+
+    @classmethod
+    def from_node(
+        cls,
+        node: bytes,
+        position: int,
+        public_only: bool,
+        hex_encoding: bool,
+        hardened: bool,
+        scripts: tuple[ScriptType, ...] = (),
+    ) -> Self:
+        if len(node) != NODE_SIZE or node[:4] != XPRV_VERSION or node[45] != 0:
+            raise ValueError("not a serialized extended private key")
+        return cls(
+            node[46:],
+            node[13:45],
+            node[4],
+            position,
+            public_only,
+            hex_encoding,
+            hardened,
+            tuple(script for script in SCRIPT_FLAGS if script in scripts),
+        )
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> Self:
+        private_key, chain_code, depth, position, flags = STATE.unpack(raw)
+        return cls(
+            private_key,
+            chain_code,
+            depth,
+            position,
+            bool(flags & PUBLIC_ONLY),
+            bool(flags & HEX_ENCODING),
+            bool(flags & HARDENED_CHILDREN),
+            tuple(script for script, flag in SCRIPT_FLAGS.items() if flags & flag),
+        )
+
+    def to_bytes(self) -> bytes:
+        flags: int = (
+            (PUBLIC_ONLY if self.public_only else 0)
+            | (HEX_ENCODING if self.hex_encoding else 0)
+            | (HARDENED_CHILDREN if self.hardened else 0)
+            | sum(SCRIPT_FLAGS[script] for script in self.scripts)
+        )
+        return STATE.pack(
+            self.private_key, self.chain_code, self.depth, self.position, flags
+        )
+
+    def node(self) -> bytes:
+        # the account node, enough to derive and serialize its children
+        return (
+            XPRV_VERSION
+            + bytes((self.depth,))
+            + bytes(8)
+            + self.chain_code
+            + b"\x00"
+            + self.private_key
+        )
+
+
+# keyed BLAKE2b digest of a cursor id -> cursor state, shared by the workers
+# of a deployment when APP_SHARED_CACHE_DIR is set. Bounded: the least
+# recently used cursors are evicted, and expire once unused for the TTL.
+cursor_store: Final[SecretCache[bytes] | SharedCursorCache] = (
+    SharedCursorCache(
+        Path(settings.shared_cache_dir, "cursor.cache"),
+        slots=settings.keypair_cursor_max_entries,
+        ttl=settings.keypair_cursor_ttl,
+    )
+    if settings.shared_cache_dir
+    else SecretCache(
+        max_size=settings.keypair_cursor_max_entries * CURSOR_SIZE,
+        ttl=settings.keypair_cursor_ttl,
+        max_entries=settings.keypair_cursor_max_entries,
+    )
+)
@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import Any, ClassVar, Final, Self, TypeVar
+
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
+
+HARDENED: Final[int] = 0x80000000
+# the depth of a node is a single byte of its BIP32 serialization
+MAX_DEPTH: Final[int] = 255
+DERIVATION_PATTERN: Final[str] = r"^m(/\d+'?)*$"
+PUBLIC_DERIVATION_PATTERN: Final[str] = r"^m(/\d+)*$"
+
+
+# BIP32 path parsed once into the uint32 indexes handed to the derivation
+# engine, hardened bit applied: "m/44'/0" -> (0x8000002c, 0). Out of range
+# indexes and paths deeper than a node can be are validation errors.
+class Derivation:
+    __slots__: tuple[str, ...] = ("path", "indexes")
+    pattern: ClassVar[str] = DERIVATION_PATTERN
+    hardened: ClassVar[bool] = True
+
+    def __init__(self, path: str, indexes: tuple[int, ...]) -> None:
+        self.path: str = path
+        self.indexes: tuple[int, ...] = indexes
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Derivation) and self.indexes == other.indexes
+
+    def __hash__(self) -> int:
+        return hash(self.indexes)
+
+    @classmethod
+    def parse(cls, path: str) -> Self:
+        return parse_derivation(cls, path)
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        # validated from, and serialized back to, the "m/..." string
+        return core_schema.no_info_after_validator_function(
+            cls.parse,
+            core_schema.str_schema(min_length=1, pattern=cls.pattern),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda derivation: derivation.path
+            ),
+        )
+
+
+class PublicDerivation(Derivation):
+    # non-hardened only, derivable from an extended public key
+    pattern: ClassVar[str] = PUBLIC_DERIVATION_PATTERN
+    hardened: ClassVar[bool] = False
+
+
+D = TypeVar("D", bound=Derivation)
+
+
+# common paths are interned: the same object is returned for the same string
+@lru_cache(maxsize=1024)
+def parse_derivation(cls: type[D], path: str) -> D:
+    head, *segments = path.split("/")
+    if head != "m":
+        raise ValueError(f"derivation must start with m: {path}")
+    if len(segments) > MAX_DEPTH:
+        raise ValueError(f"derivation must be at most {MAX_DEPTH} levels deep")
+    indexes: list[int] = []
+    for segment in segments:
+        hardened: bool = segment.endswith("'")
+        if hardened and not cls.hardened:
+            raise ValueError(f"derivation index must not be hardened: {segment}")
+        digits: str = segment.removesuffix("'")
+        if not digits.isdecimal():
+            raise ValueError(f"derivation index is not valid: {segment}")
+        index: int = int(digits)
+        if index >= HARDENED:
+            raise ValueError(f"derivation index {index} must be below {HARDENED}")
+        indexes.append(index + HARDENED if hardened else index)
+    return cls(path, tuple(indexes))
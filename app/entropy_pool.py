@@ -0,0 +1,120 @@
+import os
+import threading
+from collections import deque
+from typing import ClassVar, Final
+
+from pydantic import BaseModel, ConfigDict
+
+from app.mnemonic import STRENGTHS
+from app.settings import settings
+
+
+class PoolLevel(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    strength: int
+    available: int
+    low_watermark: int
+    high_watermark: int
+
+
+# Pre-generated hex entropies, one queue per strength. A background thread
+# tops every queue up to the high watermark with a single os.urandom() read
+# whenever one of them falls below the low watermark, so requests are served
+# without any syscall. Entries are popped, never peeked: the same bytes are
+# never handed out twice.
+class EntropyPool:
+    def __init__(
+        self,
+        low_watermark: int,
+        high_watermark: int,
+        strengths: tuple[int, ...] = STRENGTHS,
+    ) -> None:
+        self.low_watermark: int = low_watermark
+        self.high_watermark: int = high_watermark
+        self._queues: dict[int, deque[str]] = {
+            strength: deque() for strength in strengths
+        }
+        self._lock: threading.Lock = threading.Lock()
+        self._wakeup: threading.Event = threading.Event()
+        self._closed: bool = False
+        self._refiller: threading.Thread | None = None
+
+    def take(self, strength: int, count: int = 1) -> list[str]:
+        queue: deque[str] = self._queues[strength]
+        entropies: list[str] = []
+        with self._lock:
+            while queue and len(entropies) < count:
+                entropies.append(queue.popleft())
+            low: bool = len(queue) < self.low_watermark
+        if len(entropies) < count:
+            # pool drained faster than refilled: pay for the syscall inline
+            missing: int = count - len(entropies)
+            entropies.extend(split(os.urandom(missing * strength // 8), strength))
+        if low:
+            self._wake_refiller()
+        return entropies
+
+    def refill(self) -> None:
+        with self._lock:
+            missing: dict[int, int] = {
+                strength: self.high_watermark - len(queue)
+                for strength, queue in self._queues.items()
+                if len(queue) < self.high_watermark
+            }
+        if not missing:
+            return
+        # one read for every strength, split afterwards
+        buffer: bytes = os.urandom(
+            sum(count * strength // 8 for strength, count in missing.items())
+        )
+        offset: int = 0
+        for strength, count in missing.items():
+            size: int = count * strength // 8
+            entropies: list[str] = split(buffer[offset : offset + size], strength)
+            offset += size
+            with self._lock:
+                self._queues[strength].extend(entropies)
+
+    def levels(self) -> list[PoolLevel]:
+        with self._lock:
+            return [
+                PoolLevel(
+                    strength=strength,
+                    available=len(queue),
+                    low_watermark=self.low_watermark,
+                    high_watermark=self.high_watermark,
+                )
+                for strength, queue in self._queues.items()
+            ]
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+    def _wake_refiller(self) -> None:
+        with self._lock:
+            if self._refiller is None and not self._closed:
+                self._refiller = threading.Thread(
+                    target=self._run, name="entropy-pool", daemon=True
+                )
+                self._refiller.start()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self.refill()
+            _ = self._wakeup.wait()
+            self._wakeup.clear()
+
+
+def split(buffer: bytes, strength: int) -> list[str]:
+    size: int = strength // 8
+    return [
+        buffer[offset : offset + size].hex() for offset in range(0, len(buffer), size)
+    ]
+
+
+entropy_pool: Final[EntropyPool] = EntropyPool(
+    low_watermark=settings.entropy_pool_low_watermark,
+    high_watermark=settings.entropy_pool_high_watermark,
+)
@@ -0,0 +1,230 @@
+import asyncio
+import multiprocessing
+import threading
+from collections.abc import Callable
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Final, Literal, TypeVar
+
+from fastapi import HTTPException, status
+
+from app.metrics import Counter, Gauge, registry, stage
+from app.settings import Settings, settings
+
+T = TypeVar("T")
+
+ExecutorKind = Literal["process", "thread"]
+Waiter = tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]
+
+
+def wake(waiter: asyncio.Future[None]) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# Runs blocking crypto work off the event loop. At most `workers + queue_depth`
+# jobs are admitted at once, anything beyond is rejected with a 503 so that
+# cheap routes keep being served while the pool is busy. Streamed responses
+# are admitted once before they start, their jobs then wait for a free slot.
+class CPUExecutor:
+    def __init__(
+        self,
+        kind: ExecutorKind,
+        workers: int,
+        queue_depth: int,
+        retry_after: int = 1,
+    ) -> None:
+        self.kind: ExecutorKind = kind
+        self.workers: int = workers
+        self.queue_depth: int = queue_depth
+        self.retry_after: int = retry_after
+        self._pool: Executor | None = None
+        self._in_flight: int = 0
+        self.rejected: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        # jobs of admitted streams waiting for free slots, woken on release
+        self._waiters: list[Waiter] = []
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "CPUExecutor":
+        return cls(
+            kind=settings.cpu_executor,
+            workers=settings.cpu_workers,
+            queue_depth=settings.cpu_queue_depth,
+            retry_after=settings.cpu_retry_after,
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_depth
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        # admitted jobs waiting for a free worker
+        return max(0, self._in_flight - self.workers)
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+            return self._pool
+
+    def _create_pool(self) -> Executor:
+        if self.kind == "process":
+            try:
+                # spawn: forking the multi-threaded server process is unsafe
+                return ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (ImportError, NotImplementedError, OSError):
+                # no working multiprocessing primitives (e.g. sandboxed /dev/shm)
+                self.kind = "thread"
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+
+    def _saturated(self, count: int) -> HTTPException:
+        self.rejected += count
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="CPU executor is saturated, retry later",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def admit(self, count: int = 1) -> None:
+        # checked before a streamed response starts, whose jobs then wait for
+        # their slots: a 503 cannot be sent once the headers are out
+        with self._lock:
+            if self._in_flight + count > self.capacity:
+                raise self._saturated(count)
+
+    def _acquire(self, count: int = 1) -> None:
+        with self._lock:
+            if self._in_flight + count > self.capacity:
+                raise self._saturated(count)
+            self._in_flight += count
+
+    async def _acquire_waiting(self, count: int) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                # a group larger than the capacity still runs on an idle pool
+                if self._in_flight + count <= self.capacity or not self._in_flight:
+                    self._in_flight += count
+                    return
+                waiter: asyncio.Future[None] = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+
+    def _release(self, _: Future[object] | None = None, count: int = 1) -> None:
+        with self._lock:
+            self._in_flight -= count
+            waiters, self._waiters = self._waiters, []
+        # every waiter checks the capacity again, only as many as fit get in
+        for loop, waiter in waiters:
+            try:
+                _ = loop.call_soon_threadsafe(wake, waiter)
+            except RuntimeError:
+                # its event loop is closed, nobody waits anymore
+                pass
+
+    def _submit(self, calls: list[Callable[[], T]]) -> list[Future[T]]:
+        # slots must already be acquired for every call. Each one is held until
+        # its job really finishes, even if the caller goes away, so the bound
+        # reflects the work actually queued on the pool
+        futures: list[Future[T]] = []
+        try:
+            pool: Executor = self._get_pool()
+            for call in calls:
+                future: Future[T] = pool.submit(call)
+                future.add_done_callback(self._release)
+                futures.append(future)
+        except BaseException:
+            self._release(count=len(calls) - len(futures))
+            for future in futures:
+                _ = future.cancel()
+            raise
+        return futures
+
+    async def _wait(self, futures: list[Future[T]]) -> list[T]:
+        try:
+            with stage("crypto"):
+                return list(
+                    await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+                )
+        except BaseException as error:
+            # a failed or cancelled caller does not need the other jobs anymore
+            for future in futures:
+                _ = future.cancel()
+            if isinstance(error, BrokenProcessPool):
+                with self._lock:
+                    self._pool = None
+            raise
+
+    async def run(
+        self, fn: Callable[..., T], *args: object, wait: bool = False, **kwargs: object
+    ) -> T:
+        if wait:
+            await self._acquire_waiting(1)
+        else:
+            self._acquire()
+        futures: list[Future[T]] = self._submit([partial(fn, *args, **kwargs)])
+        return (await self._wait(futures))[0]
+
+    async def run_all(
+        self, fn: Callable[..., T], calls: list[tuple[object, ...]], wait: bool = False
+    ) -> list[T]:
+        # all or nothing: the whole group is admitted at once, or rejected
+        if wait:
+            await self._acquire_waiting(len(calls))
+        else:
+            self._acquire(len(calls))
+        futures: list[Future[T]] = self._submit([partial(fn, *args) for args in calls])
+        return await self._wait(futures)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+cpu_executor: Final[CPUExecutor] = CPUExecutor.from_settings(settings)
+
+_ = registry.register(
+    Gauge(
+        "cpu_executor_in_flight",
+        "Jobs admitted in the CPU executor, running or queued",
+        lambda: cpu_executor.in_flight,
+    )
+)
+_ = registry.register(
+    Gauge(
+        "cpu_executor_queued",
+        "Jobs admitted in the CPU executor and waiting for a worker",
+        lambda: cpu_executor.queued,
+    )
+)
+_ = registry.register(
+    Gauge(
+        "cpu_executor_capacity",
+        "Jobs the CPU executor admits before answering 503",
+        lambda: cpu_executor.capacity,
+    )
+)
+_ = registry.register(
+    Counter(
+        "cpu_executor_rejected_total",
+        "Jobs rejected with a 503 by the saturated CPU executor",
+        lambda: cpu_executor.rejected,
+    )
+)
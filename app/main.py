@@ -1,10 +1,51 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from .entropy_pool import entropy_pool
+from .executor import cpu_executor
+from .metrics import MetricsMiddleware, monitor_event_loop
+from .profiler import ProfilerMiddleware, profiler
+from .ratelimit import RateLimitMiddleware
+from .responses import FastJSONResponse
+from .routers import debug, entropy, metrics, seed, keypair
+from .settings import settings
+from .warmup import warm_up
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    entropy_pool.refill()
+    if settings.warm_up:
+        await warm_up()
+    loop_monitor: asyncio.Task[None] = asyncio.create_task(monitor_event_loop())
+    yield
+    _ = loop_monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await loop_monitor
+    entropy_pool.close()
+    profiler.close()
+    cpu_executor.shutdown()
 
-from .routers import entropy, seed, keypair
 
-app = FastAPI()
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=(
+        FastJSONResponse if settings.fast_responses else JSONResponse
+    ),
+)
+# innermost: rejected requests are still timed and counted
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(entropy.router)
 app.include_router(seed.router)
+app.include_router(seed.router_v2)
 app.include_router(keypair.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
@@ -0,0 +1,275 @@
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Final, TypeAlias, TypeVar
+
+from fastapi import Request, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.responses import SerializingRoute
+
+BUCKETS: Final[tuple[float, ...]] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+LOOP_LAG_INTERVAL: Final[float] = 0.25
+
+Labels: TypeAlias = tuple[tuple[str, str], ...]
+Endpoint: TypeAlias = Callable[..., Coroutine[Any, Any, Any]]
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped: list[tuple[str, str]] = [
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    ]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = BUCKETS):
+        self.name: str = name
+        self.help: str = help
+        self.buckets: tuple[float, ...] = buckets
+        # labels -> per bucket counts (not cumulative, +Inf last), sum
+        self._series: dict[Labels, tuple[list[int], list[float]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key: Labels = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [
+                (key, list(counts), total[0])
+                for key, (counts, total) in self._series.items()
+            ]
+        for key, counts, total in sorted(series):
+            cumulative: int = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le: Labels = (*key, ("le", format_value(bound)))
+                yield f"{self.name}_bucket{format_labels(le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(key)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(key)} {cumulative}"
+
+
+# sampled when rendered, from a callback returning the current value
+class Gauge:
+    kind: str = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name: str = name
+        self.help: str = help
+        self.read: Callable[[], float] = read
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {format_value(self.read())}"
+
+
+class Counter(Gauge):
+    kind: str = "counter"
+
+
+M = TypeVar("M", Histogram, Gauge)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Histogram | Gauge] = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(
+            f"{line}\n" for metric in self._metrics.values() for line in metric.render()
+        )
+
+
+registry: Final[Registry] = Registry()
+
+request_duration: Final[Histogram] = registry.register(
+    Histogram("http_request_duration_seconds", "Time to serve a request, per route")
+)
+stage_duration: Final[Histogram] = registry.register(
+    Histogram(
+        "http_request_stage_duration_seconds",
+        "Time spent per stage of a request, the crypto stage is part of the endpoint",
+    )
+)
+event_loop_lag: Final[Histogram] = registry.register(
+    Histogram("event_loop_lag_seconds", "Delay of the event loop in running a timer")
+)
+
+
+# stages timed for the request being served, keyed by name. Set by the
+# middleware, missing when routes are served without it (e.g. in tests)
+class RequestTimings:
+    __slots__: tuple[str, ...] = ("stages", "endpoint_start", "endpoint_end")
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        self.endpoint_start: float | None = None
+        self.endpoint_end: float | None = None
+
+    def add(self, stage: str, duration: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + duration
+
+
+current_timings: Final[ContextVar[RequestTimings | None]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    # adds the time spent in the block to a stage of the current request
+    timings: RequestTimings | None = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed_endpoint(endpoint: Endpoint) -> Endpoint:
+    # marks when FastAPI is done validating the request and calls the endpoint,
+    # and when the endpoint returns and the response starts being serialized
+    @wraps(endpoint)
+    async def timed(*args: Any, **kwargs: Any) -> Any:
+        timings: RequestTimings | None = current_timings.get()
+        if timings is not None:
+            timings.endpoint_start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if timings is not None:
+                timings.endpoint_end = time.perf_counter()
+
+    return timed
+
+
+# route class splitting the handling of a request in validation, endpoint and
+# serialization stages. Only async endpoints are timed.
+class TimedRoute(SerializingRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        declared: Callable[..., Any] = endpoint
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+        # wrapped again by the route created when the router is included
+        self.endpoint = declared
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            timings: RequestTimings | None = current_timings.get()
+            if timings is None:
+                return await handler(request)
+            start: float = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                end: float = time.perf_counter()
+                if timings.endpoint_start is None:
+                    # rejected before reaching the endpoint
+                    timings.add("validation", end - start)
+                else:
+                    endpoint_end: float = timings.endpoint_end or end
+                    timings.add("validation", timings.endpoint_start - start)
+                    timings.add("endpoint", endpoint_end - timings.endpoint_start)
+                    timings.add("serialization", end - endpoint_end)
+
+        return timed_handler
+
+
+def route_template(scope: Scope) -> str:
+    # set by FastAPI once the request is routed
+    route: SerializingRoute | None = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+# records the duration of every HTTP request, and of its stages, labelled by
+# route template: paths and query strings carry seeds and are never recorded
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code: int = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        timings: RequestTimings = RequestTimings()
+        token = current_timings.set(timings)
+        start: float = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            duration: float = time.perf_counter() - start
+            current_timings.reset(token)
+            template: str = route_template(scope)
+            request_duration.observe(
+                duration,
+                method=scope["method"],
+                route=template,
+                status=str(status_code),
+            )
+            for name, stage_time in timings.stages.items():
+                stage_duration.observe(stage_time, route=template, stage=name)
+
+
+async def monitor_event_loop(interval: float = LOOP_LAG_INTERVAL) -> None:
+    # a timer firing late means the loop was blocked by something else
+    while True:
+        start: float = time.perf_counter()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, time.perf_counter() - start - interval))
@@ -0,0 +1,131 @@
+import hashlib
+import importlib.util
+import unicodedata
+from functools import cache
+from pathlib import Path
+from typing import Any, Final
+
+from pydantic import GetCoreSchemaHandler
+from pydantic_core import core_schema
+
+WORD_BIT_LENGTH: Final[int] = 11
+WORD_COUNTS: Final[tuple[int, ...]] = (12, 15, 18, 21, 24)
+# entropy bits of each word count
+STRENGTHS: Final[tuple[int, ...]] = (128, 160, 192, 224, 256)
+# in the order hdwallet tries them, so ambiguous mnemonics resolve the same way
+LANGUAGES: Final[tuple[str, ...]] = (
+    "chinese-simplified",
+    "chinese-traditional",
+    "czech",
+    "english",
+    "french",
+    "italian",
+    "japanese",
+    "korean",
+    "portuguese",
+    "russian",
+    "spanish",
+    "turkish",
+)
+
+
+def wordlist_directory() -> Path:
+    # the BIP39 wordlists shipped with hdwallet, located without importing it:
+    # importing any of its modules loads every coin it supports
+    spec = importlib.util.find_spec("hdwallet")
+    assert spec is not None and spec.submodule_search_locations is not None
+    return Path(spec.submodule_search_locations[0], "mnemonics", "bip39", "wordlist")
+
+
+def normalize(word: str) -> str:
+    return unicodedata.normalize("NFKD", word.lower())
+
+
+# read on first use, or by app.warmup before the first request
+@cache
+def wordlist(language: str) -> tuple[str, ...]:
+    path: Path = wordlist_directory() / f"{language.replace('-', '_')}.txt"
+    with path.open(encoding="utf-8") as lines:
+        return tuple(
+            normalize(line.strip())
+            for line in lines
+            if line.strip() and not line.startswith("#")
+        )
+
+
+# word -> index, built once per language instead of on every validation
+@cache
+def word_indexes(language: str) -> dict[str, int]:
+    return {word: index for index, word in enumerate(wordlist(language))}
+
+
+def load_wordlists() -> None:
+    for language in LANGUAGES:
+        _ = word_indexes(language)
+
+
+class Mnemonic:
+    __slots__: tuple[str, ...] = ("words", "language", "entropy")
+
+    def __init__(self, words: list[str], language: str, entropy: bytes) -> None:
+        self.words: list[str] = words
+        self.language: str = language
+        self.entropy: bytes = entropy
+
+    def phrase(self) -> str:
+        return " ".join(self.words)
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        # validated from the "/" separated words of a path parameter
+        return core_schema.no_info_after_validator_function(
+            lambda mnemonic: parse_mnemonic(mnemonic.split("/")),
+            core_schema.str_schema(),
+        )
+
+
+def parse_mnemonic(words: list[str], language: str | None = None) -> Mnemonic:
+    # validates the words and the checksum, and decodes the entropy in one pass.
+    # Without a language, the first one knowing every word is used.
+    normalized: list[str] = [normalize(word) for word in words]
+    if len(normalized) not in WORD_COUNTS:
+        raise ValueError(
+            f"mnemonic must have one of {list(WORD_COUNTS)} words, "
+            f"got {len(normalized)}"
+        )
+
+    languages: tuple[str, ...] = LANGUAGES if language is None else (language,)
+    for language in languages:
+        word_index: dict[str, int] = word_indexes(language)
+        if all(word in word_index for word in normalized):
+            break
+    else:
+        raise ValueError(f"mnemonic is not valid: {'/'.join(words)}")
+
+    bits: int = 0
+    for word in normalized:
+        bits = (bits << WORD_BIT_LENGTH) | word_index[word]
+    checksum_length: int = len(normalized) * WORD_BIT_LENGTH // 33
+    entropy: bytes = (bits >> checksum_length).to_bytes(checksum_length * 4, "big")
+    checksum: int = hashlib.sha256(entropy).digest()[0] >> (8 - checksum_length)
+    if checksum != bits & ((1 << checksum_length) - 1):
+        raise ValueError(f"mnemonic is not valid: {'/'.join(words)}")
+    return Mnemonic(normalized, language, entropy)
+
+
+def encode_mnemonic(entropy: bytes, language: str = "english") -> list[str]:
+    # entropy followed by the first bits of its SHA-256, 11 bits per word
+    if len(entropy) * 8 not in STRENGTHS:
+        raise ValueError(f"entropy must be one of {list(STRENGTHS)} bits")
+    checksum_length: int = len(entropy) // 4
+    bits: int = (int.from_bytes(entropy, "big") << checksum_length) | (
+        hashlib.sha256(entropy).digest()[0] >> (8 - checksum_length)
+    )
+    words: tuple[str, ...] = wordlist(language)
+    count: int = (len(entropy) * 8 + checksum_length) // WORD_BIT_LENGTH
+    return [
+        words[(bits >> (WORD_BIT_LENGTH * (count - 1 - position))) & 0x7FF]
+        for position in range(count)
+    ]
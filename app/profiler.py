@@ -0,0 +1,239 @@
+import asyncio
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, deque
+from types import FrameType
+from typing import Any, ClassVar, Final, Literal
+
+from pydantic import BaseModel, ConfigDict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import route_template
+from app.settings import Settings, settings
+
+
+class ProfileSummary(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    id: int
+    method: str
+    route: str
+    status: int
+    reason: Literal["slow", "sampled"]
+    started_at: float
+    duration: float
+    samples: int
+
+
+class Profile(ProfileSummary):
+    # folded stacks, "outer;...;inner" -> number of samples
+    stacks: dict[str, int]
+
+    def folded(self) -> str:
+        # the input format of flamegraph.pl, speedscope and similar tools
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def summary(self) -> ProfileSummary:
+        return ProfileSummary.model_validate(self.model_dump(exclude={"stacks"}))
+
+
+def describe(frame: FrameType) -> str:
+    # code locations only: arguments and locals may hold seeds or keys
+    module: str = frame.f_globals.get("__name__", "?")
+    return f"{module}.{frame.f_code.co_qualname}:{frame.f_lineno}"
+
+
+# stack samples of the task serving one request
+class Trace:
+    __slots__: tuple[str, ...] = ("task", "thread_id", "sampled", "stacks", "samples")
+
+    def __init__(self, task: asyncio.Task[Any], sampled: bool) -> None:
+        self.task: asyncio.Task[Any] = task
+        self.thread_id: int = threading.get_ident()
+        self.sampled: bool = sampled
+        self.stacks: Counter[str] = Counter()
+        self.samples: int = 0
+
+    def sample(self, frames: dict[int, FrameType]) -> None:
+        # called from the sampler thread while the event loop keeps running
+        stack: list[str] = []
+        coroutine: Any = self.task.get_coro()
+        if getattr(coroutine, "cr_running", False):
+            # running: the thread stack, up to the outermost coroutine frame
+            outermost: FrameType | None = coroutine.cr_frame
+            frame: FrameType | None = frames.get(self.thread_id)
+            while frame is not None:
+                stack.append(describe(frame))
+                if frame is outermost:
+                    break
+                frame = frame.f_back
+            stack.reverse()
+        else:
+            # suspended: the chain of awaited coroutines
+            while coroutine is not None and getattr(coroutine, "cr_frame", None):
+                stack.append(describe(coroutine.cr_frame))
+                coroutine = coroutine.cr_await
+        if stack:
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+
+# Opt-in profiler of slow requests: while a request is served, a background
+# thread samples the stack of its task every `interval` seconds. The trace is
+# kept when the request took longer than `slow_threshold`, or when it is one
+# of the 1 in `sample_rate` requests sampled regardless of their duration. The
+# last `buffer_size` traces are kept in memory.
+class Profiler:
+    def __init__(
+        self,
+        slow_threshold: float,
+        sample_rate: int,
+        interval: float,
+        buffer_size: int,
+    ) -> None:
+        self.slow_threshold: float = slow_threshold
+        self.sample_rate: int = sample_rate
+        self.interval: float = interval
+        self._profiles: deque[Profile] = deque(maxlen=buffer_size)
+        self._active: set[Trace] = set()
+        self._ids: itertools.count[int] = itertools.count(1)
+        self._requests: itertools.count[int] = itertools.count()
+        self._lock: threading.Lock = threading.Lock()
+        self._wakeup: threading.Event = threading.Event()
+        self._closed: bool = False
+        self._sampler: threading.Thread | None = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "Profiler":
+        return cls(
+            slow_threshold=settings.profiler_slow_threshold,
+            sample_rate=settings.profiler_sample_rate,
+            interval=settings.profiler_interval,
+            buffer_size=settings.profiler_buffer_size,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_threshold > 0 or self.sample_rate > 0
+
+    def start(self, task: asyncio.Task[Any]) -> Trace | None:
+        sampled: bool = (
+            self.sample_rate > 0 and next(self._requests) % self.sample_rate == 0
+        )
+        if not sampled and self.slow_threshold <= 0:
+            return None
+        trace: Trace = Trace(task, sampled)
+        with self._lock:
+            self._active.add(trace)
+            if self._sampler is None and not self._closed:
+                self._sampler = threading.Thread(
+                    target=self._run, name="profiler", daemon=True
+                )
+                self._sampler.start()
+        self._wakeup.set()
+        return trace
+
+    def finish(
+        self,
+        trace: Trace,
+        method: str,
+        route: str,
+        status: int,
+        started_at: float,
+        duration: float,
+    ) -> None:
+        with self._lock:
+            self._active.discard(trace)
+        reason: Literal["slow", "sampled"]
+        if self.slow_threshold > 0 and duration >= self.slow_threshold:
+            reason = "slow"
+        elif trace.sampled:
+            reason = "sampled"
+        else:
+            return
+        profile: Profile = Profile(
+            id=next(self._ids),
+            method=method,
+            route=route,
+            status=status,
+            reason=reason,
+            started_at=started_at,
+            duration=duration,
+            samples=trace.samples,
+            stacks=dict(trace.stacks),
+        )
+        with self._lock:
+            self._profiles.append(profile)
+
+    def profiles(self) -> list[ProfileSummary]:
+        with self._lock:
+            return [profile.summary() for profile in self._profiles]
+
+    def get(self, profile_id: int) -> Profile | None:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._closed:
+            with self._lock:
+                traces: list[Trace] = list(self._active)
+            if not traces:
+                # idle until a request is traced
+                _ = self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames: dict[int, FrameType] = sys._current_frames()
+            for trace in traces:
+                trace.sample(frames)
+            time.sleep(self.interval)
+
+
+# traces requests for the profiler, labelled by route template only: paths and
+# query strings carry seeds and are never recorded
+class ProfilerMiddleware:
+    def __init__(self, app: ASGIApp, profiler: Profiler) -> None:
+        self.app: ASGIApp = app
+        self.profiler: Profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        task: asyncio.Task[Any] | None = asyncio.current_task()
+        trace: Trace | None = (
+            self.profiler.start(task)
+            if scope["type"] == "http" and self.profiler.enabled and task is not None
+            else None
+        )
+        if trace is None:
+            await self.app(scope, receive, send)
+            return
+        status_code: int = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at: float = time.time()
+        start: float = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            self.profiler.finish(
+                trace,
+                method=scope["method"],
+                route=route_template(scope),
+                status=status_code,
+                started_at=started_at,
+                duration=time.perf_counter() - start,
+            )
+
+
+profiler: Final[Profiler] = Profiler.from_settings(settings)
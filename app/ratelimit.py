@@ -0,0 +1,253 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Final
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.metrics import Counter, Gauge, registry
+from app.settings import settings
+
+# tokens taken by a request, by path prefix, the first match wins: about a
+# millisecond of CPU per token. Batches are weighted for a typical size, their
+# body is not read before admission. Routes without a cost are not limited.
+ROUTE_COSTS: Final[tuple[tuple[str, int], ...]] = (
+    ("/entropy/generate/", 1),
+    ("/entropy/bulk/", 1),
+    ("/seed/cache/", 0),
+    ("/seed/batch", 100),
+    ("/seed/", 4),
+    ("/v2/seed/", 4),
+    ("/keypair/cache/", 0),
+    ("/keypair/batch", 50),
+    ("/keypair/stream", 50),
+    ("/keypair/", 2),
+)
+
+MAGIC: Final[bytes] = b"RATELIM1"
+HEADER: Final[struct.Struct] = struct.Struct(">8sI")
+HEADER_SIZE: Final[int] = 64
+# client key, tokens left, last update (wall clock, 0 for a free slot)
+BUCKET: Final[struct.Struct] = struct.Struct(">16sdd")
+# slots probed from the home slot of a client, the least recently seen one is
+# replaced when full: its bucket has most likely refilled anyway
+PROBES: Final[int] = 8
+
+
+def route_cost(path: str) -> int:
+    for prefix, cost in ROUTE_COSTS:
+        if path.startswith(prefix):
+            return cost
+    return 0
+
+
+def client_key(scope: Scope, header: bytes) -> bytes:
+    # the configured header, e.g. an API key or the first hop of
+    # X-Forwarded-For behind a proxy, or else the address of the peer.
+    # Hashed: the stores never hold the key itself.
+    key: bytes = b""
+    if header:
+        for name, value in scope["headers"]:
+            if name == header:
+                key = value.split(b",")[0].strip()
+                break
+    if not key and scope.get("client"):
+        key = scope["client"][0].encode()
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+
+def refill(
+    tokens: float, elapsed: float, cost: float, rate: float, burst: float
+) -> tuple[float, float]:
+    # tokens left, and the wait before the request could be admitted: 0 when
+    # it is, and its cost has been taken
+    tokens = min(burst, tokens + max(elapsed, 0.0) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+# token bucket per client, in the memory of one worker. Bounded: the least
+# recently seen clients are forgotten, as if their bucket was full.
+class TokenBuckets:
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_clients: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate: float = rate
+        self.burst: float = burst
+        self.max_clients: int = max_clients
+        self.rejected: int = 0
+        self._clock: Callable[[], float] = clock
+        self._buckets: OrderedDict[bytes, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: bytes, cost: float) -> float:
+        # a request costing more than the burst is admitted on a full bucket
+        cost = min(cost, self.burst)
+        now: float = self._clock()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens, wait = refill(tokens, now - updated, cost, self.rate, self.burst)
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            _ = self._buckets.popitem(last=False)
+        if wait:
+            self.rejected += 1
+        return wait
+
+    @property
+    def clients(self) -> int:
+        return len(self._buckets)
+
+
+# the same buckets in a file mapped by every worker of a deployment, see
+# app.serve, so a client gets one budget whichever worker serves it. Accesses
+# hold an fcntl lock on the file, and a thread lock within a worker.
+class SharedTokenBuckets(TokenBuckets):
+    def __init__(
+        self,
+        path: Path,
+        rate: float,
+        burst: float,
+        max_clients: int,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        # shared by processes: wall clock, not a per-process monotonic one
+        super().__init__(rate, burst, max_clients, clock)
+        self.path: Path = path
+        self._lock: threading.Lock = threading.Lock()
+        size: int = HEADER_SIZE + max_clients * BUCKET.size
+        fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                # the first worker to get the lock lays out the file
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, size)
+                    _ = os.pwrite(fd, HEADER.pack(MAGIC, max_clients), 0)
+                magic, slots = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            if (magic, slots) != (MAGIC, max_clients):
+                raise ValueError(f"{path} is not a table of {max_clients} buckets")
+            self._map: mmap.mmap = mmap.mmap(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd: int = fd
+
+    def take(self, key: bytes, cost: float) -> float:
+        cost = min(cost, self.burst)
+        home: int = int.from_bytes(key[:8]) % self.max_clients
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                now: float = self._clock()
+                target: int | None = None
+                oldest: tuple[float, int] | None = None
+                for step in range(min(PROBES, self.max_clients)):
+                    offset: int = (
+                        HEADER_SIZE + (home + step) % self.max_clients * BUCKET.size
+                    )
+                    stored, tokens, updated = BUCKET.unpack_from(self._map, offset)
+                    if updated != 0 and stored == key:
+                        target = offset
+                        break
+                    if oldest is None or updated < oldest[0]:
+                        oldest = (updated, offset)
+                if target is None:
+                    assert oldest is not None
+                    target = oldest[1]
+                    tokens, updated = self.burst, now
+                tokens, wait = refill(
+                    tokens, now - updated, cost, self.rate, self.burst
+                )
+                BUCKET.pack_into(self._map, target, key, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        if wait:
+            self.rejected += 1
+        return wait
+
+    @property
+    def clients(self) -> int:
+        with self._lock:
+            return sum(
+                BUCKET.unpack_from(self._map, HEADER_SIZE + slot * BUCKET.size)[2] != 0
+                for slot in range(self.max_clients)
+            )
+
+
+# token buckets of the clients, disabled unless APP_RATE_LIMIT_RATE is set,
+# shared by the workers of a deployment when APP_SHARED_CACHE_DIR is set
+buckets: Final[TokenBuckets] = (
+    SharedTokenBuckets(
+        Path(settings.shared_cache_dir, "ratelimit.table"),
+        rate=settings.rate_limit_rate,
+        burst=settings.rate_limit_burst,
+        max_clients=settings.rate_limit_max_clients,
+    )
+    if settings.shared_cache_dir and settings.rate_limit_rate > 0
+    else TokenBuckets(
+        rate=settings.rate_limit_rate,
+        burst=settings.rate_limit_burst,
+        max_clients=settings.rate_limit_max_clients,
+    )
+)
+_ = registry.register(
+    Gauge(
+        "rate_limit_clients",
+        "Clients with a token bucket in the rate limiter",
+        lambda: buckets.clients,
+    )
+)
+_ = registry.register(
+    Counter(
+        "rate_limited_requests_total",
+        "Requests rejected with a 429 by the rate limiter",
+        lambda: buckets.rejected,
+    )
+)
+
+
+# admission control per client, before routing: a request over budget is
+# answered with a 429 without its body being read, validated, or any crypto
+# work done
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        buckets: TokenBuckets = buckets,
+        client_header: str = settings.rate_limit_client_header,
+    ) -> None:
+        self.app: ASGIApp = app
+        self.buckets: TokenBuckets = buckets
+        self.client_header: bytes = client_header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        cost: int = route_cost(scope["path"]) if scope["type"] == "http" else 0
+        if cost and self.buckets.rate > 0:
+            wait: float = self.buckets.take(
+                client_key(scope, self.client_header), cost
+            )
+            if wait:
+                response = JSONResponse(
+                    {"detail": "rate limit exceeded, retry later"},
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
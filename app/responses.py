@@ -0,0 +1,195 @@
+import asyncio
+import struct
+from collections.abc import Callable, Coroutine
+from contextvars import ContextVar, Token
+from functools import wraps
+from typing import Any, Final, NamedTuple, TypeAlias
+
+import cbor2
+from fastapi import Request, Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # pydantic-core's serializer is used instead
+    orjson = None
+
+Endpoint: TypeAlias = Callable[..., Coroutine[Any, Any, Any]]
+Handler: TypeAlias = Callable[[Request], Coroutine[Any, Any, Response]]
+
+# hex fields of the response models, sent as raw bytes in binary formats
+RAW_FIELDS: Final[frozenset[str]] = frozenset(
+    {"entropy", "seed", "pubkey", "prvkey", "xpub"}
+)
+# big-endian length of each item of a list in binary formats
+FRAME_LENGTH: Final[struct.Struct] = struct.Struct(">I")
+
+
+def dumps(content: Any) -> bytes:
+    # compact UTF-8 JSON, as rendered by JSONResponse
+    if orjson is not None:
+        return orjson.dumps(content)
+    return to_json(content)
+
+
+def raw_fields(content: Any) -> Any:
+    if isinstance(content, list):
+        return [raw_fields(item) for item in content]
+    if isinstance(content, dict):
+        return {
+            key: (
+                bytes.fromhex(value)
+                if key in RAW_FIELDS and isinstance(value, str)
+                else raw_fields(value)
+            )
+            for key, value in content.items()
+        }
+    return content
+
+
+# compact alternative to JSON negotiated with the Accept header. Lists are
+# sent as a sequence of length-prefixed items, decodable one at a time.
+class BinaryFormat(NamedTuple):
+    media_type: str
+    encode: Callable[[Any], bytes]
+
+    def frame(self, item: Any) -> bytes:
+        body: bytes = self.encode(raw_fields(item))
+        return FRAME_LENGTH.pack(len(body)) + body
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, list):
+            return b"".join(self.frame(item) for item in content)
+        return self.encode(raw_fields(content))
+
+
+BINARY_FORMATS: Final[dict[str, BinaryFormat]] = {
+    "application/cbor": BinaryFormat("application/cbor", cbor2.dumps),
+}
+
+# the binary format negotiated for the current request, None for JSON
+response_format: ContextVar[BinaryFormat | None] = ContextVar(
+    "response_format", default=None
+)
+
+
+def negotiate(accept: str | None) -> BinaryFormat | None:
+    # a binary format listed with a quality at least as high as JSON's, most
+    # clients sending */* or no Accept header at all
+    if not accept:
+        return None
+    accept = accept.lower()
+    if "cbor" not in accept:
+        return None
+    json_quality: float = 0.0
+    best: BinaryFormat | None = None
+    best_quality: float = 0.0
+    for media_range in accept.split(","):
+        media_type, *parameters = media_range.split(";")
+        media_type = media_type.strip()
+        quality: float = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in ("application/json", "application/*", "*/*"):
+            json_quality = max(json_quality, quality)
+        elif media_type in BINARY_FORMATS and quality > best_quality:
+            best, best_quality = BINARY_FORMATS[media_type], quality
+    return best if best_quality >= json_quality else None
+
+
+# JSON response rendered with orjson when installed, or pydantic-core. Bytes
+# are taken as already serialized, see SerializingRoute.
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+# route serializing the model returned by its endpoint straight to JSON bytes,
+# when its response class is a FastJSONResponse. FastAPI would validate the
+# returned model again, dump it to Python objects, and only then encode them.
+# The model is rendered in a binary format instead when the client asks for
+# one, whatever the response class.
+class SerializingRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        self.adapter: TypeAdapter[Any] | None = None
+        self.serializer: TypeAdapter[Any] | None = None
+        self.serialized_class: type[FastJSONResponse] = FastJSONResponse
+        declared: Callable[..., Any] = endpoint
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = self.serialized_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+        # wrapped again by the route created when the router is included
+        self.endpoint = declared
+
+        response_class: type[Response] = (
+            self.response_class.value
+            if isinstance(self.response_class, DefaultPlaceholder)
+            else self.response_class
+        )
+        if (
+            self.response_model is not None
+            # headers or cookies set on an injected Response are kept by FastAPI
+            and self.dependant.response_param_name is None
+        ):
+            self.adapter = TypeAdapter(self.response_model)
+            if issubclass(response_class, FastJSONResponse):
+                self.serializer = self.adapter
+                self.serialized_class = response_class
+
+    def get_route_handler(self) -> Handler:
+        handler: Handler = super().get_route_handler()
+
+        # also read by endpoints streaming their own responses
+        async def negotiated_handler(request: Request) -> Response:
+            wire: BinaryFormat | None = negotiate(request.headers.get("accept"))
+            token: Token[BinaryFormat | None] = response_format.set(wire)
+            try:
+                return await handler(request)
+            finally:
+                response_format.reset(token)
+
+        return negotiated_handler
+
+    def dump_options(self) -> dict[str, Any]:
+        return {
+            "include": self.response_model_include,
+            "exclude": self.response_model_exclude,
+            "by_alias": self.response_model_by_alias,
+            "exclude_unset": self.response_model_exclude_unset,
+            "exclude_defaults": self.response_model_exclude_defaults,
+            "exclude_none": self.response_model_exclude_none,
+        }
+
+    def serialized_endpoint(self, endpoint: Endpoint) -> Endpoint:
+        @wraps(endpoint)
+        async def serialized(*args: Any, **kwargs: Any) -> Any:
+            content: Any = await endpoint(*args, **kwargs)
+            if self.adapter is None or isinstance(content, Response):
+                return content
+            wire: BinaryFormat | None = response_format.get()
+            if wire is not None:
+                data: Any = self.adapter.dump_python(content, **self.dump_options())
+                return Response(
+                    wire.render(data),
+                    status_code=self.status_code or 200,
+                    media_type=wire.media_type,
+                )
+            if self.serializer is None:
+                return content
+            body: bytes = self.serializer.dump_json(content, **self.dump_options())
+            if self.status_code is None:
+                return self.serialized_class(body)
+            return self.serialized_class(body, status_code=self.status_code)
+
+        return serialized
@@ -2,13 +2,15 @@ from typing import Annotated, Final, TypeAlias
 
 from pydantic import Field
 
+from app.derivation import Derivation, PublicDerivation
+
 
 HEXADECIMAL_PATTERN: Final[str] = r"^[0-9A-Fa-f]+$"
-DERIVATION_PATTERN: Final[str] = r"^m(/\d+'?)*$"
+XPUB_PATTERN: Final[str] = r"^xpub[1-9A-HJ-NP-Za-km-z]{107}$"
 
 SeedType: TypeAlias = Annotated[
     str, Field(min_length=32, max_length=128, pattern=HEXADECIMAL_PATTERN)
 ]
-DerivationType: TypeAlias = Annotated[
-    str, Field(min_length=1, pattern=DERIVATION_PATTERN)
-]
+# parsed into indexes, see app.derivation
+DerivationType: TypeAlias = Derivation
+PublicDerivationType: TypeAlias = PublicDerivation
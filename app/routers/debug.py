@@ -0,0 +1,58 @@
+import secrets
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.profiler import Profile, ProfileSummary, profiler
+from app.settings import settings
+
+
+def check_debug_token(authorization: Annotated[str | None, Header()] = None) -> None:
+    # the debug routes do not exist unless APP_DEBUG_TOKEN is set
+    if not settings.debug_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    expected: bytes = f"Bearer {settings.debug_token}".encode()
+    if authorization is None or not secrets.compare_digest(
+        authorization.encode(), expected
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="invalid debug token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"],
+    dependencies=[Depends(check_debug_token)],
+    include_in_schema=False,
+)
+
+
+@router.get(
+    "/profiles",
+    summary="Profiles of the last slow or sampled requests",
+    response_description="Route, duration and number of samples of each profile",
+)
+async def get_profiles() -> list[ProfileSummary]:
+    return profiler.profiles()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    summary="Download a profile",
+    response_description="Sampled stacks in the folded format of flamegraph tools",
+    response_class=PlainTextResponse,
+)
+async def get_profile(profile_id: int) -> PlainTextResponse:
+    profile: Profile | None = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(
+        profile.folded(),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'
+        },
+    )
@@ -1,18 +1,21 @@
 from typing import Annotated
 
-from fastapi import APIRouter
-from hdwallet.entropies.bip39 import BIP39Entropy
+from fastapi import APIRouter, Query
 from pydantic import AfterValidator, Field
 
+from app.entropy_pool import PoolLevel, entropy_pool
+from app.metrics import TimedRoute
+from app.mnemonic import STRENGTHS
 from app.routers.seed import EntropyBody
+from app.settings import settings
 
-router = APIRouter(prefix="/entropy", tags=["Entropy"])
+router = APIRouter(prefix="/entropy", tags=["Entropy"], route_class=TimedRoute)
 
 
 def check_strength(strength: int) -> int:
-    if BIP39Entropy.is_valid_strength(strength):
+    if strength in STRENGTHS:
         return strength
-    raise ValueError(f"strength must be one of: {BIP39Entropy.strengths}")
+    raise ValueError(f"strength must be one of: {list(STRENGTHS)}")
 
 
 @router.get(
@@ -23,5 +26,28 @@ def check_strength(strength: int) -> int:
 async def get_entropy_generate_with_size(
     strength: Annotated[int, Field(ge=128, le=256), AfterValidator(check_strength)],
 ) -> EntropyBody:
-    entropy: str = BIP39Entropy.generate(strength=strength)
+    (entropy,) = entropy_pool.take(strength)
     return EntropyBody(entropy=entropy)
+
+
+@router.get(
+    "/bulk/{strength}",
+    summary="Generate many entropies with a fixed strength",
+    response_description="Hex formatted entropies",
+)
+async def get_entropy_bulk_with_size(
+    strength: Annotated[int, Field(ge=128, le=256), AfterValidator(check_strength)],
+    count: Annotated[int, Query(ge=1, le=settings.entropy_bulk_max_size)] = 1,
+) -> list[EntropyBody]:
+    return [
+        EntropyBody(entropy=entropy) for entropy in entropy_pool.take(strength, count)
+    ]
+
+
+@router.get(
+    "/pool",
+    summary="Fill level of the entropy pool",
+    response_description="Available entropies and watermarks, per strength",
+)
+async def get_entropy_pool() -> list[PoolLevel]:
+    return entropy_pool.levels()
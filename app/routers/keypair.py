@@ -1,23 +1,326 @@
-from typing import Annotated, ClassVar
+import copy
+import secrets
+from collections.abc import AsyncIterator, Iterable, Iterator
+from itertools import batched
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, ClassVar, Final, Literal, Self, TypeAlias
 
-from fastapi import APIRouter, Query
-from hdwallet.cryptocurrencies import Bitcoin
-from hdwallet.derivations import CustomDerivation
-from hdwallet.hds import BIP32HD
-from pydantic import BaseModel, ConfigDict
+from fastapi import APIRouter, HTTPException, Path as PathParameter, Query, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, model_validator
+
+from app import bip32
+from app.addresses import Addresses, ScriptType, encode_addresses
+from app.base58 import check_decode, check_encode_many
+from app.cache import CacheStats, SecretCache
+from app.cursors import CursorState, cursor_store
+from app.derivation import HARDENED, MAX_DEPTH
+from app.executor import cpu_executor
+from app.metrics import Counter, Gauge, TimedRoute, registry
+from app.responses import BinaryFormat, dumps, response_format
+from app.shared_cache import NodeKey, SharedNodeCache
+from app.singleflight import SingleFlight
+from app.routers import (
+    XPUB_PATTERN,
+    DerivationType,
+    PublicDerivationType,
+    SeedType,
+)
+from app.settings import settings
+
+if TYPE_CHECKING:
+    from hdwallet.hds import BIP32HD
+
+router: APIRouter = APIRouter(
+    prefix="/keypair", tags=["Keypair"], route_class=TimedRoute
+)
+
+BATCH_CHUNK_MIN_SIZE: Final[int] = 32
+STREAM_CHUNK_SIZE: Final[int] = 256
+
+# (xpub, xprv, addresses), the private half is not computed for public only
+# requests, nor the addresses unless script types are requested
+KeypairTuple: TypeAlias = tuple[str, str | None, Addresses | None]
+# Base58Check, or the raw 78 bytes in hex for clients decoding them anyway
+KeyEncoding: TypeAlias = Literal["base58", "hex"]
+
+# (seed fingerprint, path prefix) -> 78 bytes serialized extended private key,
+# shared by the workers of a deployment when APP_SHARED_CACHE_DIR is set
+node_cache: Final[SecretCache[NodeKey] | SharedNodeCache] = (
+    SharedNodeCache(
+        Path(settings.shared_cache_dir, "node.cache"),
+        slots=settings.node_cache_size // bip32.NODE_SIZE,
+        ttl=settings.node_cache_ttl,
+    )
+    if settings.shared_cache_dir
+    else SecretCache(max_size=settings.node_cache_size, ttl=settings.node_cache_ttl)
+)
+
+# concurrent requests for the same keypair share one derivation
+derivations: Final[SingleFlight[tuple[bytes, KeypairTuple]]] = SingleFlight()
+_ = registry.register(
+    Counter(
+        "keypair_derivations_coalesced_total",
+        "Keypair requests served by the derivation of an identical request",
+        lambda: derivations.coalesced,
+    )
+)
+
+# derivations run on app.bip32 unless hdwallet, the reference implementation,
+# is configured
+NATIVE_ENGINE: Final[bool] = settings.bip32_engine == "native"
+
+
+def hdwallet_node() -> "BIP32HD":
+    # hdwallet loads every coin it supports when any of its modules is
+    # imported: only done once the reference engine is actually used
+    from hdwallet.cryptocurrencies import Bitcoin
+    from hdwallet.hds import BIP32HD
+
+    return BIP32HD(ecc=Bitcoin.ECC)
+
+
+def serialize_node(hdwallet: "BIP32HD") -> bytes:
+    return bytes.fromhex(hdwallet.xprivate_key(encoded=False))
+
+
+def serialize_keypair(
+    hdwallet: "BIP32HD",
+    public_only: bool,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> KeypairTuple:
+    encoded: bool = encoding == "base58"
+    return (
+        hdwallet.xpublic_key(encoded=encoded),
+        None if public_only else hdwallet.xprivate_key(encoded=encoded),
+        (
+            encode_addresses([bytes.fromhex(hdwallet.public_key())], scripts)[0]
+            if scripts
+            else None
+        ),
+    )
+
+
+def neuter(hdwallet: "BIP32HD") -> "BIP32HD":
+    xpub: bytes = bytes.fromhex(hdwallet.xpublic_key(encoded=False))
+    return hdwallet_node().from_xpublic_key(xpub, encoded=False)
+
+
+def derive_path(
+    seed: str | None,
+    node: bytes | None,
+    indexes: tuple[int, ...],
+    public_only: bool = False,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> tuple[list[bytes], KeypairTuple]:
+    # runs in the CPU executor: starts from the master node of the seed, or from
+    # an already derived node, and returns every node derived on the way along
+    # with the keypair of the last one
+    if NATIVE_ENGINE:
+        return native_derive_path(seed, node, indexes, public_only, encoding, scripts)
+    hdwallet: "BIP32HD" = hdwallet_node()
+    nodes: list[bytes] = []
+    if node is None:
+        assert seed is not None
+        hdwallet.from_seed(seed)
+        nodes.append(serialize_node(hdwallet))
+    else:
+        hdwallet.from_xprivate_key(node, encoded=False)
+    for index in indexes:
+        hdwallet.drive(index)
+        nodes.append(serialize_node(hdwallet))
+    return nodes, serialize_keypair(hdwallet, public_only, encoding, scripts)
+
+
+def derive_public(
+    xpub: str,
+    indexes: tuple[int, ...],
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> KeypairTuple:
+    # runs in the CPU executor: non-hardened public derivation, by point addition
+    if NATIVE_ENGINE:
+        node: bip32.Node = bip32.Node.decode(xpub).derive(indexes)
+        return native_keypairs([node], True, encoding, scripts)[0]
+    hdwallet: "BIP32HD" = hdwallet_node().from_xpublic_key(xpub)
+    for index in indexes:
+        hdwallet.drive(index)
+    return serialize_keypair(hdwallet, True, encoding, scripts)
+
+
+async def derive_node(
+    seed: str,
+    indexes: tuple[int, ...],
+    cache_leaf: bool = False,
+    public_only: bool = False,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> tuple[bytes, KeypairTuple]:
+    seed_fingerprint: bytes = node_cache.fingerprint(bytes.fromhex(seed))
+    # nodes down to this depth are cached: every strict prefix of the path,
+    # plus the requested node itself when cache_leaf is set
+    cached_depth: int = len(indexes) if cache_leaf else len(indexes) - 1
+
+    # resume from the deepest cached ancestor, one hit or miss per derivation
+    start: int = max(cached_depth, 0)
+    node: bytes | None = None
+    while start >= 0:
+        node = node_cache.peek((seed_fingerprint, indexes[:start]))
+        if node is not None:
+            break
+        start -= 1
+    node_cache.record(hit=node is not None)
+
+    nodes: list[bytes]
+    keypair: KeypairTuple
+    if node is None:
+        nodes, keypair = await cpu_executor.run(
+            derive_path, seed, None, indexes, public_only, encoding, scripts
+        )
+        depths: range = range(0, len(indexes) + 1)
+    else:
+        nodes, keypair = await cpu_executor.run(
+            derive_path, None, node, indexes[start:], public_only, encoding, scripts
+        )
+        depths = range(start + 1, len(indexes) + 1)
+    for depth, derived in zip(depths, nodes):
+        if depth <= cached_depth:
+            node_cache.put((seed_fingerprint, indexes[:depth]), derived)
+    return (nodes[-1] if nodes else node), keypair
+
+
+def derive_children(
+    node: bytes,
+    suffixes: list[tuple[int, ...]],
+    public_only: bool = False,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> list[KeypairTuple]:
+    # runs in the CPU executor: derives every suffix below one parent node
+    if NATIVE_ENGINE:
+        return native_derive_children(node, suffixes, public_only, encoding, scripts)
+    parent: "BIP32HD" = hdwallet_node().from_xprivate_key(node, encoded=False)
+    # watch-only results below a non-hardened suffix are derived from the
+    # public parent, without any private key math
+    public_parent: "BIP32HD | None" = neuter(parent) if public_only else None
+    keypairs: list[KeypairTuple] = []
+    for suffix in suffixes:
+        # drive() rebinds attributes instead of mutating them, a shallow copy
+        # is enough to branch from the parent
+        child: "BIP32HD" = copy.copy(
+            public_parent
+            if public_parent is not None and all(i < HARDENED for i in suffix)
+            else parent
+        )
+        for index in suffix:
+            child.drive(index)
+        keypairs.append(serialize_keypair(child, public_only, encoding, scripts))
+    return keypairs
+
+
+def key_encoding(encoding: KeyEncoding) -> KeyEncoding:
+    # binary responses carry the raw 78 bytes of each key: hex is decoded back
+    # for free, Base58Check would be computed only to be decoded
+    return "hex" if response_format.get() is not None else encoding
 
-from app.routers import DerivationType, SeedType
 
-router: APIRouter = APIRouter(prefix="/keypair", tags=["Keypair"])
+def encode_keys(raw: list[bytes], encoding: KeyEncoding) -> list[str]:
+    if encoding == "hex":
+        return [key.hex() for key in raw]
+    return check_encode_many(raw)
 
 
-async def internal_bip32_derivation(seed: str, derivation: str) -> BIP32HD:
-    hdwallet: BIP32HD = (
-        BIP32HD(ecc=Bitcoin.ECC)
-        .from_seed(seed)
-        .from_derivation(derivation=CustomDerivation(path=derivation))
+def native_keypairs(
+    nodes: list[bip32.Node],
+    public_only: bool,
+    encoding: KeyEncoding,
+    scripts: tuple[ScriptType, ...] = (),
+) -> list[KeypairTuple]:
+    # every key of the chunk is serialized, then encoded in a single call. The
+    # addresses are encoded from the public keys of the nodes, not from their
+    # serialization.
+    addresses: list[Addresses] | list[None] = (
+        encode_addresses([node.public_key for node in nodes], scripts)
+        if scripts
+        else [None] * len(nodes)
     )
-    return hdwallet
+    if public_only:
+        xpubs: list[str] = encode_keys(
+            [node.to_bytes(private=False) for node in nodes], encoding
+        )
+        return list(zip(xpubs, [None] * len(nodes), addresses))
+    raw: list[bytes] = []
+    for node in nodes:
+        raw += (node.to_bytes(private=False), node.to_bytes())
+    keys: list[str] = encode_keys(raw, encoding)
+    return list(zip(keys[::2], keys[1::2], addresses))
+
+
+def native_derive_path(
+    seed: str | None,
+    node: bytes | None,
+    indexes: tuple[int, ...],
+    public_only: bool = False,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> tuple[list[bytes], KeypairTuple]:
+    current: bip32.Node
+    nodes: list[bytes] = []
+    if node is None:
+        assert seed is not None
+        current = bip32.Node.from_seed(bytes.fromhex(seed))
+        nodes.append(current.to_bytes())
+    else:
+        current = bip32.Node.from_bytes(node)
+    for index in indexes:
+        current = current.child(index)
+        nodes.append(current.to_bytes())
+    return nodes, native_keypairs([current], public_only, encoding, scripts)[0]
+
+
+def native_derive_children(
+    node: bytes,
+    suffixes: list[tuple[int, ...]],
+    public_only: bool = False,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> list[KeypairTuple]:
+    # the public key and fingerprint of the parent are computed once for all
+    # children, and non-hardened suffixes of a watch-only request are derived
+    # from the public parent
+    parent: bip32.Node = bip32.Node.from_bytes(node)
+    public_parent: bip32.Node | None = parent.neuter() if public_only else None
+    children: list[bip32.Node] = [
+        (
+            public_parent
+            if public_parent is not None and all(i < HARDENED for i in suffix)
+            else parent
+        ).derive(suffix)
+        for suffix in suffixes
+    ]
+    return native_keypairs(children, public_only, encoding, scripts)
+
+
+def common_prefix(paths: list[tuple[int, ...]]) -> tuple[int, ...]:
+    shortest: tuple[int, ...] = min(paths, key=len)
+    for depth, index in enumerate(shortest):
+        if any(path[depth] != index for path in paths):
+            return shortest[:depth]
+    return shortest
+
+
+def unique_scripts(scripts: list[ScriptType]) -> list[ScriptType]:
+    return list(dict.fromkeys(scripts))
+
+
+# script types of the addresses returned along with each keypair, in the
+# order requested
+ScriptTypes: TypeAlias = Annotated[
+    list[ScriptType], Field(max_length=3), AfterValidator(unique_scripts)
+]
 
 
 class SeedBody(BaseModel):
@@ -25,36 +328,487 @@ class SeedBody(BaseModel):
     seed: SeedType
 
 
+class SeedQuery(SeedBody):
+    public_only: bool = False
+    encoding: KeyEncoding = "base58"
+    addresses: ScriptTypes = []
+
+
 class DerivationBody(SeedBody):
-    derivation: DerivationType = "m"
+    derivation: DerivationType = DerivationType.parse("m")
+    public_only: bool = False
+    encoding: KeyEncoding = "base58"
+    addresses: ScriptTypes = []
+
+
+def check_xpub(xpub: str) -> str:
+    try:
+        decoded: bytes = check_decode(xpub)
+    except ValueError:
+        raise ValueError("xpub checksum is not valid") from None
+    try:
+        # the version, and a public key on the curve
+        node: bip32.Node = bip32.Node.from_bytes(decoded)
+    except ValueError:
+        raise ValueError("xpub is not a valid extended public key") from None
+    if node.private_key is not None:
+        raise ValueError("xpub is not a valid extended public key")
+    return xpub
+
+
+XpubType: TypeAlias = Annotated[
+    str, Field(pattern=XPUB_PATTERN), AfterValidator(check_xpub)
+]
+
+
+class XpubQuery(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    xpub: XpubType
+    encoding: KeyEncoding = "base58"
+    addresses: ScriptTypes = []
+
+
+def check_xpub_depth(xpub: str, derivation: PublicDerivationType) -> None:
+    # the derived node must still fit the depth byte of its serialization
+    depth: int = check_decode(xpub)[4]
+    if depth + len(derivation.indexes) > MAX_DEPTH:
+        raise ValueError(
+            f"derivation must be at most {MAX_DEPTH - depth} levels deep"
+            f" from an xpub of depth {depth}"
+        )
+
+
+class XpubDerivationBody(XpubQuery):
+    derivation: PublicDerivationType = PublicDerivationType.parse("m")
+
+    @model_validator(mode="after")
+    def check_depth(self) -> Self:
+        check_xpub_depth(self.xpub, self.derivation)
+        return self
 
 
 class Keypair(BaseModel):
     model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
     pubkey: str | None
     prvkey: str | None
+    addresses: Addresses | None = None
+
+
+async def internal_bip32_derivation(
+    seed: str,
+    derivation: DerivationType,
+    public_only: bool = False,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+) -> Keypair:
+    key: bytes = derivations.fingerprint(
+        bytes.fromhex(seed),
+        b"".join(index.to_bytes(4) for index in derivation.indexes),
+        bytes((public_only,)),
+        encoding.encode(),
+        ",".join(scripts).encode(),
+    )
+    _, (pubkey, prvkey, addresses) = await derivations.run(
+        key,
+        lambda: derive_node(
+            seed,
+            derivation.indexes,
+            public_only=public_only,
+            encoding=encoding,
+            scripts=scripts,
+        ),
+    )
+    return Keypair(pubkey=pubkey, prvkey=prvkey, addresses=addresses)
+
+
+class IndexRange(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    start: int = Field(default=0, ge=0, lt=HARDENED)
+    count: int = Field(ge=1, le=settings.keypair_batch_max_size)
+    hardened: bool = False
+
+    @model_validator(mode="after")
+    def check_end(self) -> Self:
+        if self.start + self.count > HARDENED:
+            raise ValueError(f"range must end below {HARDENED}")
+        return self
+
+    def suffixes(self) -> Iterator[tuple[int, ...]]:
+        offset: int = HARDENED if self.hardened else 0
+        for index in range(self.start, self.start + self.count):
+            yield (offset + index,)
+
+
+class StreamRange(IndexRange):
+    count: int = Field(ge=1, le=HARDENED)
+
+
+def check_range_base(derivation: DerivationType) -> None:
+    # children of the base must still fit in a node
+    if len(derivation.indexes) >= MAX_DEPTH:
+        raise ValueError(f"base of a range must be less than {MAX_DEPTH} levels deep")
+
+
+class StreamBody(DerivationBody):
+    range: StreamRange
+
+    @model_validator(mode="after")
+    def check_base(self) -> Self:
+        check_range_base(self.derivation)
+        return self
+
+
+class BatchBody(DerivationBody):
+    range: IndexRange | None = None
+    paths: (
+        Annotated[
+            list[DerivationType],
+            Field(min_length=1, max_length=settings.keypair_batch_max_size),
+        ]
+        | None
+    ) = None
+
+    @model_validator(mode="after")
+    def check_range_or_paths(self) -> Self:
+        if (self.range is None) == (self.paths is None):
+            raise ValueError("exactly one of range or paths must be provided")
+        if self.paths is not None and "derivation" in self.model_fields_set:
+            raise ValueError("derivation is only used as the base of a range")
+        if self.range is not None:
+            check_range_base(self.derivation)
+        return self
 
 
 @router.get(
     "/from_derivation/{derivation:path}",
     summary="Generate a keypair from a BIP32 derivation path",
     response_description="A public/private key pair",
+    response_model_exclude_none=True,
 )
 async def get_bip32_derivation(
-    seed: Annotated[SeedBody, Query()],
+    seed: Annotated[SeedQuery, Query()],
     derivation: DerivationType,
 ) -> Keypair:
-    hdwallet: BIP32HD = await internal_bip32_derivation(seed.seed, derivation)
-    return Keypair(pubkey=hdwallet.xpublic_key(), prvkey=hdwallet.xprivate_key())
+    return await internal_bip32_derivation(
+        seed.seed,
+        derivation,
+        seed.public_only,
+        key_encoding(seed.encoding),
+        tuple(seed.addresses),
+    )
 
 
 @router.post(
     "/from_derivation/",
     summary="Generate a keypair from a BIP32 derivation path",
     response_description="A public/private key pair",
+    response_model_exclude_none=True,
 )
 async def post_bip32_derivation(payload: DerivationBody) -> Keypair:
     seed = payload.seed
     derivation = payload.derivation
-    hdwallet: BIP32HD = await internal_bip32_derivation(seed, derivation)
-    return Keypair(pubkey=hdwallet.xpublic_key(), prvkey=hdwallet.xprivate_key())
+    return await internal_bip32_derivation(
+        seed,
+        derivation,
+        payload.public_only,
+        key_encoding(payload.encoding),
+        tuple(payload.addresses),
+    )
+
+
+@router.get(
+    "/from_xpub/{derivation:path}",
+    summary="Derive a public key from an extended public key",
+    response_description="A public key, the private key is never known",
+    response_model_exclude_none=True,
+)
+async def get_xpub_derivation(
+    xpub: Annotated[XpubQuery, Query()],
+    derivation: PublicDerivationType,
+) -> Keypair:
+    # the path is not part of the query model, checked against it here
+    try:
+        check_xpub_depth(xpub.xpub, derivation)
+    except ValueError as error:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "value_error",
+                    "loc": ("path", "derivation"),
+                    "msg": f"Value error, {error}",
+                    "input": derivation.path,
+                }
+            ]
+        ) from None
+    pubkey, _, addresses = await cpu_executor.run(
+        derive_public,
+        xpub.xpub,
+        derivation.indexes,
+        key_encoding(xpub.encoding),
+        tuple(xpub.addresses),
+    )
+    return Keypair(pubkey=pubkey, prvkey=None, addresses=addresses)
+
+
+@router.post(
+    "/from_xpub/",
+    summary="Derive a public key from an extended public key",
+    response_description="A public key, the private key is never known",
+    response_model_exclude_none=True,
+)
+async def post_xpub_derivation(payload: XpubDerivationBody) -> Keypair:
+    pubkey, _, addresses = await cpu_executor.run(
+        derive_public,
+        payload.xpub,
+        payload.derivation.indexes,
+        key_encoding(payload.encoding),
+        tuple(payload.addresses),
+    )
+    return Keypair(pubkey=pubkey, prvkey=None, addresses=addresses)
+
+
+@router.post(
+    "/batch",
+    summary="Generate many keypairs from one seed",
+    response_description="Public/private key pairs, in the order requested",
+    response_model_exclude_none=True,
+)
+async def post_bip32_batch(payload: BatchBody) -> list[Keypair]:
+    prefix: tuple[int, ...]
+    suffixes: list[tuple[int, ...]]
+    if payload.range is not None:
+        prefix = payload.derivation.indexes
+        suffixes = list(payload.range.suffixes())
+    else:
+        assert payload.paths is not None
+        paths: list[tuple[int, ...]] = [path.indexes for path in payload.paths]
+        prefix = common_prefix(paths)
+        suffixes = [path[len(prefix) :] for path in paths]
+
+    # the shared prefix is derived once, the leaves are spread over the pool
+    node, _ = await derive_node(payload.seed, prefix, cache_leaf=True)
+    chunk_size: int = max(
+        -(-len(suffixes) // cpu_executor.workers), BATCH_CHUNK_MIN_SIZE
+    )
+    chunks: list[list[KeypairTuple]] = await cpu_executor.run_all(
+        derive_children,
+        [
+            (
+                node,
+                list(chunk),
+                payload.public_only,
+                key_encoding(payload.encoding),
+                tuple(payload.addresses),
+            )
+            for chunk in batched(suffixes, chunk_size)
+        ],
+    )
+    # built from keys serialized by the derivation, not validated again
+    return [
+        Keypair.model_construct(pubkey=pubkey, prvkey=prvkey, addresses=addresses)
+        for chunk in chunks
+        for pubkey, prvkey, addresses in chunk
+    ]
+
+
+async def stream_children(
+    node: bytes,
+    suffixes: Iterable[tuple[int, ...]],
+    public_only: bool = False,
+    encoding: KeyEncoding = "base58",
+    scripts: tuple[ScriptType, ...] = (),
+    wire: BinaryFormat | None = None,
+) -> AsyncIterator[bytes]:
+    # one chunk is derived at a time and only once the previous one has been
+    # sent, so a slow reader throttles the derivation. On disconnect Starlette
+    # stops iterating, and nothing more is derived. Admitted by the route: a
+    # chunk waits for a free slot, the headers are already sent.
+    for chunk in batched(suffixes, STREAM_CHUNK_SIZE):
+        keypairs: list[KeypairTuple] = await cpu_executor.run(
+            derive_children,
+            node,
+            list(chunk),
+            public_only,
+            "hex" if wire is not None else encoding,
+            scripts,
+            wait=True,
+        )
+        records: Iterator[dict[str, str | Addresses]] = (
+            {
+                key: value
+                for key, value in (
+                    ("pubkey", pubkey),
+                    ("prvkey", prvkey),
+                    ("addresses", addresses),
+                )
+                if value is not None
+            }
+            for pubkey, prvkey, addresses in keypairs
+        )
+        if wire is not None:
+            yield b"".join(wire.frame(record) for record in records)
+        else:
+            yield b"".join(dumps(record) + b"\n" for record in records)
+
+
+@router.post(
+    "/stream",
+    summary="Stream keypairs for a range of children as NDJSON",
+    response_description="One public/private key pair per line",
+    response_class=StreamingResponse,
+)
+async def post_bip32_stream(payload: StreamBody) -> StreamingResponse:
+    prefix: tuple[int, ...] = payload.derivation.indexes
+    node, _ = await derive_node(payload.seed, prefix, cache_leaf=True)
+    cpu_executor.admit()
+    wire: BinaryFormat | None = response_format.get()
+    return StreamingResponse(
+        stream_children(
+            node,
+            payload.range.suffixes(),
+            payload.public_only,
+            payload.encoding,
+            tuple(payload.addresses),
+            wire,
+        ),
+        media_type="application/x-ndjson" if wire is None else wire.media_type,
+    )
+
+
+class CursorBody(DerivationBody):
+    # children of the derivation, an account or one of its chains, from start
+    start: int = Field(default=0, ge=0, lt=HARDENED)
+    hardened: bool = False
+
+    @model_validator(mode="after")
+    def check_base(self) -> Self:
+        check_range_base(self.derivation)
+        return self
+
+
+class Cursor(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    cursor: str
+    # extended public key of the derivation, exported for watch-only wallets
+    xpub: str
+    next: int
+    expires_in: float
+
+
+class CursorPage(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    keypairs: list[Keypair]
+    # index of the first child of the next page
+    next: int
+
+
+CursorId: TypeAlias = Annotated[str, PathParameter(min_length=32, max_length=64)]
+
+_ = registry.register(
+    Gauge(
+        "keypair_cursors",
+        "Open keypair cursors",
+        lambda: cursor_store.stats().entries,
+    )
+)
+
+
+@router.post(
+    "/cursors",
+    summary="Open a cursor over the children of a derivation",
+    response_description="The cursor id, and the xpub of the derivation",
+    status_code=status.HTTP_201_CREATED,
+)
+async def post_cursor(payload: CursorBody) -> Cursor:
+    node, (xpub, _, _) = await derive_node(
+        payload.seed,
+        payload.derivation.indexes,
+        cache_leaf=True,
+        public_only=True,
+        encoding=key_encoding(payload.encoding),
+    )
+    cursor: str = secrets.token_urlsafe(32)
+    state = CursorState.from_node(
+        node,
+        payload.start,
+        payload.public_only,
+        payload.encoding == "hex",
+        payload.hardened,
+        tuple(payload.addresses),
+    )
+    cursor_store.put(cursor_store.fingerprint(cursor.encode()), state.to_bytes())
+    return Cursor(
+        cursor=cursor, xpub=xpub, next=payload.start, expires_in=cursor_store.ttl
+    )
+
+
+@router.get(
+    "/cursors/{cursor}",
+    summary="Next children of a cursor",
+    response_description="Public/private key pairs, and the index of the next page",
+    response_model_exclude_none=True,
+)
+async def get_cursor_page(
+    cursor: CursorId,
+    count: Annotated[int, Query(ge=1, le=settings.keypair_batch_max_size)] = 20,
+) -> CursorPage:
+    key: bytes = cursor_store.fingerprint(cursor.encode())
+    raw: bytes | None = cursor_store.get(key)
+    if raw is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="cursor not found or expired",
+        )
+    state: CursorState = CursorState.from_bytes(raw)
+    end: int = min(state.position + count, HARDENED)
+    # the page is taken before deriving it: concurrent requests of a worker get
+    # the following pages, and the expiry of the cursor is pushed back
+    cursor_store.put(key, state._replace(position=end).to_bytes())
+    offset: int = HARDENED if state.hardened else 0
+    try:
+        # only the children are derived, from the account node kept by the cursor
+        keypairs: list[KeypairTuple] = await cpu_executor.run(
+            derive_children,
+            state.node(),
+            [(offset + index,) for index in range(state.position, end)],
+            state.public_only,
+            key_encoding("hex" if state.hex_encoding else "base58"),
+            state.scripts,
+        )
+    except BaseException:
+        # the page is given back, e.g. when the executor answers 503, unless a
+        # following page was taken meanwhile: retrying returns the same page
+        current: bytes | None = cursor_store.peek(key)
+        if current is not None and CursorState.from_bytes(current).position == end:
+            cursor_store.put(key, raw)
+        raise
+    return CursorPage(
+        keypairs=[
+            Keypair.model_construct(pubkey=pubkey, prvkey=prvkey, addresses=addresses)
+            for pubkey, prvkey, addresses in keypairs
+        ],
+        next=end,
+    )
+
+
+@router.delete(
+    "/cursors/{cursor}",
+    summary="Close a cursor",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_cursor(cursor: CursorId) -> None:
+    # the state of the cursor is zeroised
+    if not cursor_store.delete(cursor_store.fingerprint(cursor.encode())):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="cursor not found or expired",
+        )
+
+
+@router.get(
+    "/cache/stats",
+    summary="Statistics of the derived node cache",
+    response_description="Hit, miss and eviction counters",
+)
+async def get_node_cache_stats() -> CacheStats:
+    return node_cache.stats()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import registry
+
+router = APIRouter(tags=["Metrics"])
+
+
+class MetricsResponse(PlainTextResponse):
+    # Prometheus text exposition format
+    media_type: str = "text/plain; version=0.0.4"
+
+
+@router.get(
+    "/metrics",
+    summary="Metrics in the Prometheus text format",
+    response_description="Latency histograms per route and stage, executor gauges",
+    response_class=MetricsResponse,
+)
+async def get_metrics() -> MetricsResponse:
+    return MetricsResponse(registry.render())
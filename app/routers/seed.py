@@ -1,20 +1,100 @@
-from typing import Annotated, ClassVar
+import hashlib
+import re
+import unicodedata
+from collections.abc import AsyncIterator, Iterator, Sequence
+from itertools import batched
+from pathlib import Path
+from typing import Annotated, ClassVar, Final, Literal, Self, TypeAlias
 
 from fastapi import APIRouter, Body
-from hdwallet.entropies.bip39 import BIP39Entropy
-from hdwallet.mnemonics.bip39 import BIP39_MNEMONIC_LANGUAGES, BIP39Mnemonic
-from hdwallet.seeds.bip39 import BIP39Seed
-from pydantic import AfterValidator, BaseModel, ConfigDict
+from fastapi.responses import StreamingResponse
+from pydantic import (
+    AfterValidator,
+    BaseModel,
+    ConfigDict,
+    Field,
+    PrivateAttr,
+    model_validator,
+)
 
+from app.cache import CacheStats, SecretCache
+from app.executor import cpu_executor
+from app.metrics import Counter, TimedRoute, registry
+from app.mnemonic import STRENGTHS, Mnemonic, encode_mnemonic, parse_mnemonic
+from app.responses import BinaryFormat, dumps, response_format
+from app.shared_cache import SharedSeedCache
+from app.singleflight import SingleFlight
 from app.routers import HEXADECIMAL_PATTERN, SeedType
+from app.settings import settings
+
+router = APIRouter(prefix="/seed", tags=["Seed"], route_class=TimedRoute)
+router_v2 = APIRouter(
+    prefix="/v2/seed", tags=["Seed"], route_class=TimedRoute
+)
 
-router = APIRouter(prefix="/seed", tags=["Seed"])
+SEED_SIZE: Final[int] = 64
+BIP39_ITERATIONS: Final[int] = 2048
+# the version 1 routes are configured to use test vectors from BIP39
+TEST_VECTORS_PASSPHRASE: Final[str] = "TREZOR"
+
+BATCH_CHUNK_MIN_SIZE: Final[int] = 8
+STREAM_CHUNK_SIZE: Final[int] = 32
+
+LanguageType: TypeAlias = Literal[
+    "chinese-simplified",
+    "chinese-traditional",
+    "czech",
+    "english",
+    "french",
+    "italian",
+    "japanese",
+    "korean",
+    "portuguese",
+    "russian",
+    "spanish",
+    "turkish",
+]
+
+# keyed BLAKE2b digest of (mnemonic, passphrase, iterations) -> 64 bytes seed,
+# disabled unless APP_SEED_CACHE_MAX_ENTRIES is set, shared by the workers of
+# a deployment when APP_SHARED_CACHE_DIR is
+seed_cache: Final[SecretCache[bytes] | SharedSeedCache] = (
+    SharedSeedCache(
+        Path(settings.shared_cache_dir, "seed.cache"),
+        slots=settings.seed_cache_max_entries,
+        ttl=settings.seed_cache_ttl,
+    )
+    if settings.shared_cache_dir
+    else SecretCache(
+        max_size=settings.seed_cache_max_entries * SEED_SIZE,
+        ttl=settings.seed_cache_ttl,
+        max_entries=settings.seed_cache_max_entries,
+    )
+)
+
+# concurrent requests for the same seed share one PBKDF2 run
+seed_derivations: Final[SingleFlight[str]] = SingleFlight()
+_ = registry.register(
+    Counter(
+        "seed_derivations_coalesced_total",
+        "Seed requests served by the PBKDF2 run of an identical request",
+        lambda: seed_derivations.coalesced,
+    )
+)
+
+
+def check_entropy(entropy: str) -> str:
+    if len(entropy) * 4 not in STRENGTHS:
+        raise ValueError(f"entropy must be one of {list(STRENGTHS)} bits")
+    return entropy
 
 
 class EntropyBody(BaseModel):
     model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
     entropy: Annotated[
-        str, Body(min_length=32, max_length=64, pattern=HEXADECIMAL_PATTERN)
+        str,
+        Body(min_length=32, max_length=64, pattern=HEXADECIMAL_PATTERN),
+        AfterValidator(check_entropy),
     ]
 
 
@@ -23,11 +103,166 @@ class SeedResponse(EntropyBody):
     seed: SeedType
 
 
-def check_wordlist(mnemonic: str) -> str:
-    words: list[str] = mnemonic.split("/")
-    if BIP39Mnemonic.is_valid(words):
-        return mnemonic
-    raise ValueError(f"mnemonic is not valid: {mnemonic}")
+class SeedOptions(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    passphrase: Annotated[str, Field(max_length=1024)] = ""
+    # anything but 2048 is not BIP39, only meant for benchmarks and tests
+    iterations: Annotated[int, Field(ge=1, le=BIP39_ITERATIONS)] = BIP39_ITERATIONS
+    language: LanguageType = "english"
+
+
+class SeedOptionsBody(EntropyBody, SeedOptions):
+    pass
+
+
+class MnemonicBody(SeedOptions):
+    mnemonic: list[str]
+    _parsed: Mnemonic = PrivateAttr()
+
+    @model_validator(mode="after")
+    def check_mnemonic(self) -> Self:
+        self._parsed = parse_mnemonic(self.mnemonic, self.language)
+        return self
+
+    @property
+    def parsed(self) -> Mnemonic:
+        return self._parsed
+
+
+# a mnemonic, or entropy to encode as one. Only the size is checked by the
+# validation of the body: the content of each item is checked on its own, and
+# a bad item reported in its place instead of failing the whole batch.
+class SeedBatchItem(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    mnemonic: (
+        Annotated[list[Annotated[str, Field(max_length=64)]], Field(max_length=48)]
+        | None
+    ) = None
+    entropy: Annotated[str, Field(max_length=128)] | None = None
+
+
+class SeedBatchBody(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    items: Annotated[
+        list[SeedBatchItem],
+        Field(min_length=1, max_length=settings.seed_batch_max_size),
+    ]
+    # the seeds of the version 1 routes by default
+    passphrase: Annotated[str, Field(max_length=1024)] = TEST_VECTORS_PASSPHRASE
+    iterations: Annotated[int, Field(ge=1, le=BIP39_ITERATIONS)] = BIP39_ITERATIONS
+    # mnemonics in any language and entropies encoded in English by default
+    language: LanguageType | None = None
+
+
+class SeedBatchError(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    error: str
+
+
+def stretch_mnemonic(
+    mnemonic: str, passphrase: str, iterations: int = BIP39_ITERATIONS
+) -> str:
+    # BIP39 PBKDF2 with 2048 rounds by default, runs in the CPU executor. The
+    # mnemonic has already been validated, unlike BIP39Seed.from_mnemonic no
+    # new check is done here.
+    return hashlib.pbkdf2_hmac(
+        "sha512",
+        unicodedata.normalize("NFKD", mnemonic).encode(),
+        unicodedata.normalize("NFKD", "mnemonic" + passphrase).encode(),
+        iterations,
+    ).hex()
+
+
+def stretch_mnemonics(
+    mnemonics: list[str], passphrase: str, iterations: int = BIP39_ITERATIONS
+) -> list[str]:
+    # a chunk of a batch in a single job, the salt is only normalized once
+    salt: bytes = unicodedata.normalize("NFKD", "mnemonic" + passphrase).encode()
+    return [
+        hashlib.pbkdf2_hmac(
+            "sha512", unicodedata.normalize("NFKD", mnemonic).encode(), salt, iterations
+        ).hex()
+        for mnemonic in mnemonics
+    ]
+
+
+def resolve_item(item: SeedBatchItem, language: str | None) -> tuple[str, list[str]]:
+    # (entropy, mnemonic) of an item, ValueError when it is not valid
+    if (item.mnemonic is None) == (item.entropy is None):
+        raise ValueError("exactly one of mnemonic or entropy must be provided")
+    if item.mnemonic is not None:
+        mnemonic: Mnemonic = parse_mnemonic(item.mnemonic, language)
+        return mnemonic.entropy.hex(), mnemonic.words
+    assert item.entropy is not None
+    # bytes.fromhex would skip whitespace
+    if re.fullmatch(HEXADECIMAL_PATTERN, item.entropy) is None:
+        raise ValueError("entropy must be hexadecimal")
+    return item.entropy, encode_mnemonic(
+        bytes.fromhex(check_entropy(item.entropy)), language or "english"
+    )
+
+
+async def derive_seeds(
+    items: Sequence[SeedBatchItem],
+    passphrase: str,
+    iterations: int,
+    language: str | None,
+    chunk_size: int,
+    wait: bool = False,
+) -> list[SeedResponse | SeedBatchError]:
+    # items in order, the valid ones stretched on the pool in chunks of
+    # chunk_size, one job per chunk. Batches skip the seed cache: a bulk import
+    # would only evict the seeds of the other requests.
+    resolved: list[tuple[str, list[str]] | SeedBatchError] = []
+    for item in items:
+        try:
+            resolved.append(resolve_item(item, language))
+        except ValueError as error:
+            resolved.append(SeedBatchError(error=str(error)))
+    phrases: list[str] = [
+        " ".join(words) for words in (r[1] for r in resolved if isinstance(r, tuple))
+    ]
+    chunks: list[list[str]] = await cpu_executor.run_all(
+        stretch_mnemonics,
+        [
+            (list(chunk), passphrase, iterations)
+            for chunk in batched(phrases, chunk_size)
+        ],
+        wait,
+    )
+    seeds: Iterator[str] = (seed for chunk in chunks for seed in chunk)
+    # built from validated items and hashlib output, not validated again
+    return [
+        result
+        if isinstance(result, SeedBatchError)
+        else SeedResponse.model_construct(
+            entropy=result[0], mnemonic=result[1], seed=next(seeds)
+        )
+        for result in resolved
+    ]
+
+
+async def derive_seed(
+    mnemonic: str, passphrase: str, iterations: int = BIP39_ITERATIONS
+) -> str:
+    parts: tuple[bytes, ...] = (
+        mnemonic.encode(),
+        passphrase.encode(),
+        iterations.to_bytes(4, "big"),
+    )
+    cache_key: bytes | None = None
+    if seed_cache.enabled:
+        cache_key = seed_cache.fingerprint(*parts)
+        cached: bytes | None = seed_cache.get(cache_key)
+        if cached is not None:
+            return cached.hex()
+    seed: str = await seed_derivations.run(
+        seed_derivations.fingerprint(*parts),
+        lambda: cpu_executor.run(stretch_mnemonic, mnemonic, passphrase, iterations),
+    )
+    if cache_key is not None:
+        seed_cache.put(cache_key, bytes.fromhex(seed))
+    return seed
 
 
 @router.get(
@@ -35,18 +270,11 @@ def check_wordlist(mnemonic: str) -> str:
     summary="Generate a BIP32 seed from a BIP39 mnemonic",
     response_description="a BIP32 seed, with the mnemonic that generated it",
 )
-async def get_seed_from_words(
-    mnemonic: Annotated[str, AfterValidator(check_wordlist)],
-) -> SeedResponse:
-    words = mnemonic.replace("/", " ")
-    bip39_mnemonic: BIP39Mnemonic = BIP39Mnemonic(mnemonic=words)
-    bip39_seed: str = BIP39Seed.from_mnemonic(
-        mnemonic=bip39_mnemonic,
-        passphrase="TREZOR",  # configured to use test vectors from BIP39
-    )
+async def get_seed_from_words(mnemonic: Mnemonic) -> SeedResponse:
+    bip39_seed: str = await derive_seed(mnemonic.phrase(), TEST_VECTORS_PASSPHRASE)
     return SeedResponse(
-        entropy=bip39_mnemonic.decode(words),
-        mnemonic=bip39_mnemonic.mnemonic().split(),
+        entropy=mnemonic.entropy.hex(),
+        mnemonic=mnemonic.words,
         seed=bip39_seed,
     )
 
@@ -57,17 +285,106 @@ async def get_seed_from_words(
     response_description="a BIP32 seed, with the mnemonic that generated it",
 )
 async def get_seed_from_entropy(entropy: EntropyBody) -> SeedResponse:
-    bip39_entropy: BIP39Entropy = BIP39Entropy(entropy=entropy.entropy)
-    bip39_mnemonic: str = BIP39Mnemonic.from_entropy(
-        bip39_entropy, BIP39_MNEMONIC_LANGUAGES.ENGLISH
-    )
-    bip39_seed: str = BIP39Seed.from_mnemonic(
-        mnemonic=bip39_mnemonic,
-        passphrase="TREZOR",  # configured to use test vectors from BIP39
-    )
+    words: list[str] = encode_mnemonic(bytes.fromhex(entropy.entropy))
+    bip39_seed: str = await derive_seed(" ".join(words), TEST_VECTORS_PASSPHRASE)
 
+    return SeedResponse(entropy=entropy.entropy, mnemonic=words, seed=bip39_seed)
+
+
+@router.get(
+    "/cache/stats",
+    summary="Statistics of the derived seed cache",
+    response_description="Hit, miss and eviction counters",
+)
+async def get_seed_cache_stats() -> CacheStats:
+    return seed_cache.stats()
+
+
+@router_v2.post(
+    "/from_words/",
+    summary="Generate a BIP32 seed from a BIP39 mnemonic",
+    response_description="a BIP32 seed, with the mnemonic that generated it",
+)
+async def post_seed_from_words(payload: MnemonicBody) -> SeedResponse:
+    mnemonic: Mnemonic = payload.parsed
+    bip39_seed: str = await derive_seed(
+        mnemonic.phrase(), payload.passphrase, payload.iterations
+    )
     return SeedResponse(
-        entropy=bip39_entropy.entropy(),
-        mnemonic=bip39_mnemonic.split(),
+        entropy=mnemonic.entropy.hex(),
+        mnemonic=mnemonic.words,
         seed=bip39_seed,
     )
+
+
+@router_v2.post(
+    "/from_entropy/",
+    summary="Generate a BIP32 seed from entropy",
+    response_description="a BIP32 seed, with the mnemonic that generated it",
+)
+async def post_seed_from_entropy(payload: SeedOptionsBody) -> SeedResponse:
+    words: list[str] = encode_mnemonic(bytes.fromhex(payload.entropy), payload.language)
+    bip39_seed: str = await derive_seed(
+        " ".join(words), payload.passphrase, payload.iterations
+    )
+    return SeedResponse(entropy=payload.entropy, mnemonic=words, seed=bip39_seed)
+
+
+@router.post(
+    "/batch",
+    summary="Generate BIP32 seeds from many mnemonics or entropies",
+    response_description="a seed, or the error of the item, in the order requested",
+)
+async def post_seed_batch(
+    payload: SeedBatchBody,
+) -> list[SeedResponse | SeedBatchError]:
+    # every worker gets one chunk of the batch
+    chunk_size: int = max(
+        -(-len(payload.items) // cpu_executor.workers), BATCH_CHUNK_MIN_SIZE
+    )
+    return await derive_seeds(
+        payload.items,
+        payload.passphrase,
+        payload.iterations,
+        payload.language,
+        chunk_size,
+    )
+
+
+async def stream_seeds(
+    payload: SeedBatchBody, wire: BinaryFormat | None = None
+) -> AsyncIterator[bytes]:
+    # one chunk per worker at a time, the next ones only once the previous
+    # ones have been sent, so a slow reader throttles the derivation. Admitted
+    # by the route: the chunks wait for free slots, the headers are already sent.
+    window: int = STREAM_CHUNK_SIZE * cpu_executor.workers
+    for items in batched(payload.items, window):
+        results: list[SeedResponse | SeedBatchError] = await derive_seeds(
+            items,
+            payload.passphrase,
+            payload.iterations,
+            payload.language,
+            STREAM_CHUNK_SIZE,
+            wait=True,
+        )
+        if wire is not None:
+            yield b"".join(wire.frame(result.model_dump()) for result in results)
+        else:
+            yield b"".join(dumps(result.model_dump()) + b"\n" for result in results)
+
+
+@router.post(
+    "/batch/stream",
+    summary="Stream BIP32 seeds from many mnemonics or entropies as NDJSON",
+    response_description="One seed, or the error of the item, per line",
+    response_class=StreamingResponse,
+)
+async def post_seed_batch_stream(payload: SeedBatchBody) -> StreamingResponse:
+    # as many slots as the chunks of the first window
+    chunks: int = -(-len(payload.items) // STREAM_CHUNK_SIZE)
+    cpu_executor.admit(min(chunks, cpu_executor.workers))
+    wire: BinaryFormat | None = response_format.get()
+    return StreamingResponse(
+        stream_seeds(payload, wire),
+        media_type="application/x-ndjson" if wire is None else wire.media_type,
+    )
@@ -0,0 +1,68 @@
+import asyncio
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import pytest
+
+from ..profiler import Profiler, Trace
+from ..settings import Settings
+from . import debug
+from .debug import router
+
+client = TestClient(router)
+
+TOKEN = "s3cr3t"
+
+
+@pytest.fixture
+def profiler(monkeypatch: pytest.MonkeyPatch) -> Profiler:
+    monkeypatch.setattr(debug, "settings", Settings(debug_token=TOKEN))
+    profiler = Profiler(slow_threshold=0, sample_rate=1, interval=1, buffer_size=4)
+    monkeypatch.setattr(debug, "profiler", profiler)
+    return profiler
+
+
+def record(profiler: Profiler) -> None:
+    async def start() -> Trace | None:
+        return profiler.start(asyncio.current_task())
+
+    trace = asyncio.run(start())
+    assert trace is not None
+    trace.stacks["app.routers.keypair.derive_node:1;app.executor.CPUExecutor._wait:2"] = 2
+    trace.samples = 2
+    profiler.finish(trace, "GET", "/keypair/from_derivation/{derivation:path}", 200, 0.0, 0.5)
+    profiler.close()
+
+
+class TestDebugProfiles:
+    def test_disabled_without_token(self):
+        with pytest.raises(HTTPException) as error:
+            _ = client.get("/debug/profiles", headers={"Authorization": "Bearer "})
+        assert error.value.status_code == 404
+
+    def test_invalid_token(self, profiler: Profiler):
+        with pytest.raises(HTTPException) as error:
+            _ = client.get("/debug/profiles")
+        assert error.value.status_code == 401
+        with pytest.raises(HTTPException) as error:
+            _ = client.get("/debug/profiles", headers={"Authorization": "Bearer wrong"})
+        assert error.value.status_code == 401
+
+    def test_list_and_download(self, profiler: Profiler):
+        record(profiler)
+        headers = {"Authorization": f"Bearer {TOKEN}"}
+
+        response = client.get("/debug/profiles", headers=headers)
+        assert response.status_code == 200
+        (summary,) = response.json()
+        assert summary["route"] == "/keypair/from_derivation/{derivation:path}"
+        assert "stacks" not in summary
+
+        response = client.get(f"/debug/profiles/{summary['id']}", headers=headers)
+        assert response.status_code == 200
+        assert response.text == "app.routers.keypair.derive_node:1;app.executor.CPUExecutor._wait:2 2\n"
+        assert response.headers["content-disposition"] == f'attachment; filename="profile-{summary["id"]}.folded"'
+
+        with pytest.raises(HTTPException) as error:
+            _ = client.get("/debug/profiles/999", headers=headers)
+        assert error.value.status_code == 404
@@ -1,6 +1,8 @@
 from fastapi.exceptions import RequestValidationError
 from fastapi.testclient import TestClient
+import cbor2
 import pytest
+from ..responses import FRAME_LENGTH
 from .entropy import router
 
 client = TestClient(router)
@@ -48,3 +50,54 @@ class TestEntropyGetGenerateValid:
         assert response.status_code == 200
         assert "entropy" in data
         assert len(data["entropy"]) == strength // 4
+
+
+class TestEntropyGetBulk:
+    def test_bulk_count(self):
+        response = client.get("/entropy/bulk/160?count=25")
+        data: list[dict[str, str]] = response.json()
+
+        assert response.status_code == 200
+        assert len(data) == 25
+        assert all(len(item["entropy"]) == 160 // 4 for item in data)
+        assert len({item["entropy"] for item in data}) == 25
+
+    def test_bulk_cbor(self):
+        response = client.get(
+            "/entropy/bulk/160?count=3", headers={"accept": "application/cbor"}
+        )
+        assert response.headers["content-type"] == "application/cbor"
+        body = response.content
+        entropies = []
+        while body:
+            (size,) = FRAME_LENGTH.unpack_from(body)
+            entropies.append(cbor2.loads(body[4 : 4 + size])["entropy"])
+            body = body[4 + size :]
+        assert [len(entropy) for entropy in entropies] == [20] * 3
+
+    def test_bulk_default_count(self):
+        response = client.get("/entropy/bulk/128")
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+
+    def test_bulk_count_too_large(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.get("/entropy/bulk/128?count=1001")
+
+    def test_bulk_count_zero(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.get("/entropy/bulk/128?count=0")
+
+    def test_bulk_invalid_strength(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.get("/entropy/bulk/129?count=2")
+
+
+class TestEntropyGetPool:
+    def test_pool_levels(self):
+        response = client.get("/entropy/pool")
+        data: list[dict[str, int]] = response.json()
+
+        assert response.status_code == 200
+        assert [level["strength"] for level in data] == [128, 160, 192, 224, 256]
+        assert all(level["available"] >= 0 for level in data)
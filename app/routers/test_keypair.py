@@ -1,7 +1,29 @@
+import asyncio
+import json
+
+import cbor2
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from fastapi.exceptions import RequestValidationError
-from .keypair import router
+from pydantic import ValidationError
+
+from ..base58 import check_decode, check_encode
+from ..cache import SecretCache
+from ..responses import FRAME_LENGTH
+from . import keypair
+from .keypair import (
+    HARDENED,
+    BatchBody,
+    StreamBody,
+    derive_children,
+    derive_node,
+    derive_path,
+    derive_public,
+    node_cache,
+    router,
+    stream_children,
+)
 
 client = TestClient(router)
 
@@ -366,3 +388,840 @@ class TestKeypairGetBip32SeedVector2:
         response = client.get(f"/keypair/from_derivation/{derivation}?seed={self.SEED}")
         assert response.status_code == 200
         assert response.json() == {"pubkey": expected_pub, "prvkey": expected_prv}
+
+
+class TestKeypairNodeCache:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def test_sibling_paths_hit_cache(self):
+        node_cache.clear()
+        expected = [
+            client.post(
+                "/keypair/from_derivation/",
+                json={"seed": self.SEED, "derivation": f"m/44'/0'/0'/0/{i}"},
+            ).json()
+            for i in range(3)
+        ]
+        before = client.get("/keypair/cache/stats").json()
+        assert before["entries"] == 5
+
+        for i in range(3):
+            response = client.get(
+                f"/keypair/from_derivation/m/44'/0'/0'/0/{i}?seed={self.SEED}"
+            )
+            assert response.status_code == 200
+            assert response.json() == expected[i]
+
+        after = client.get("/keypair/cache/stats").json()
+        assert after["hits"] - before["hits"] == 3
+        assert after["misses"] == before["misses"]
+        assert after["entries"] == before["entries"]
+
+    def test_one_miss_per_derivation(self):
+        node_cache.clear()
+        before = client.get("/keypair/cache/stats").json()
+        response = client.get(
+            f"/keypair/from_derivation/m/1'/2/3'/4/5?seed={self.SEED}"
+        )
+        assert response.status_code == 200
+
+        after = client.get("/keypair/cache/stats").json()
+        assert after["misses"] - before["misses"] == 1
+        assert after["hits"] == before["hits"]
+        assert after["entries"] == 5
+
+    def test_root_path_not_cached(self):
+        node_cache.clear()
+        response = client.get(f"/keypair/from_derivation/m?seed={self.SEED}")
+        assert response.status_code == 200
+        assert client.get("/keypair/cache/stats").json()["entries"] == 0
+
+    def test_cached_matches_uncached(self):
+        node_cache.clear()
+        derivation = "m/0'/1/2'/2/1000000000"
+        cold = client.get(f"/keypair/from_derivation/{derivation}?seed={self.SEED}")
+        warm = client.get(f"/keypair/from_derivation/{derivation}?seed={self.SEED}")
+        assert cold.json() == warm.json()
+
+
+class TestKeypairPostBatch:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def single(self, derivation: str) -> dict[str, str]:
+        response = client.post(
+            "/keypair/from_derivation/",
+            json={"seed": self.SEED, "derivation": derivation},
+        )
+        return response.json()
+
+    def test_batch_range(self):
+        response = client.post(
+            "/keypair/batch",
+            json={
+                "seed": self.SEED,
+                "derivation": "m/0'/1",
+                "range": {"start": 5, "count": 40},
+            },
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 40
+        assert data[0] == self.single("m/0'/1/5")
+        assert data[39] == self.single("m/0'/1/44")
+
+    def test_batch_range_hardened(self):
+        response = client.post(
+            "/keypair/batch",
+            json={
+                "seed": self.SEED,
+                "derivation": "m/0'/1",
+                "range": {"start": 2, "count": 1, "hardened": True},
+            },
+        )
+        assert response.status_code == 200
+        assert response.json() == [self.single("m/0'/1/2'")]
+
+    def test_batch_paths_keep_order(self):
+        paths = ["m/0'/1/2'/2", "m/0'/1", "m/0'/1/2'", "m/0'"]
+        response = client.post(
+            "/keypair/batch", json={"seed": self.SEED, "paths": paths}
+        )
+        assert response.status_code == 200
+        assert response.json() == [self.single(path) for path in paths]
+
+    def test_batch_paths_without_common_prefix(self):
+        paths = ["m/1", "m/0'/1", "m"]
+        response = client.post(
+            "/keypair/batch", json={"seed": self.SEED, "paths": paths}
+        )
+        assert response.status_code == 200
+        assert response.json() == [self.single(path) for path in paths]
+
+
+class TestKeypairPostBatchErrors:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def test_batch_range_and_paths(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/batch",
+                json={
+                    "seed": self.SEED,
+                    "range": {"count": 1},
+                    "paths": ["m/0"],
+                },
+            )
+
+    def test_batch_nothing(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/keypair/batch", json={"seed": self.SEED})
+
+    def test_batch_paths_with_derivation(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/batch",
+                json={"seed": self.SEED, "derivation": "m/0", "paths": ["m/0"]},
+            )
+
+    def test_batch_range_overflow(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/batch",
+                json={
+                    "seed": self.SEED,
+                    "range": {"start": 2147483647, "count": 2},
+                },
+            )
+
+    def test_batch_paths_empty(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/keypair/batch", json={"seed": self.SEED, "paths": []})
+
+    def test_batch_path_out_of_range(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/batch",
+                json={"seed": self.SEED, "paths": ["m/0", "m/9999999999"]},
+            )
+
+    def test_batch_range_base_out_of_range(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/batch",
+                json={
+                    "seed": self.SEED,
+                    "derivation": "m/9999999999'",
+                    "range": {"count": 1},
+                },
+            )
+
+    def test_batch_range_base_too_deep(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/batch",
+                json={
+                    "seed": self.SEED,
+                    "derivation": "m/" + "/".join(["0"] * 255),
+                    "range": {"count": 1},
+                },
+            )
+
+
+class TestKeypairDerivationOutOfRange:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def test_get(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.get(f"/keypair/from_derivation/m/9999999999?seed={self.SEED}")
+
+    def test_post(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/from_derivation/",
+                json={"seed": self.SEED, "derivation": "m/0'/2147483648'"},
+            )
+
+    def test_stream_base(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/stream",
+                json={
+                    "seed": self.SEED,
+                    "derivation": "m/9999999999",
+                    "range": {"count": 1},
+                },
+            )
+
+
+class TestKeypairPostStream:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def test_stream_range(self):
+        payload = {
+            "seed": self.SEED,
+            "derivation": "m/0'/1",
+            "range": {"start": 10, "count": 300},
+        }
+        expected = client.post("/keypair/batch", json=payload).json()
+
+        with client.stream("POST", "/keypair/stream", json=payload) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/x-ndjson"
+            lines = [json.loads(line) for line in response.iter_lines()]
+        assert lines == expected
+
+    def test_stream_range_above_batch_limit(self):
+        payload = {"seed": self.SEED, "range": {"count": 1_000_000}}
+        with pytest.raises(ValidationError):
+            _ = BatchBody.model_validate(payload)
+        body = StreamBody.model_validate(payload)
+        assert body.range.count == 1_000_000
+
+    def test_stream_stops_with_reader(self):
+        consumed: list[int] = []
+
+        def suffixes():
+            for index in range(HARDENED):
+                consumed.append(index)
+                yield (index,)
+
+        async def scenario() -> int:
+            node, _ = await derive_node(self.SEED, (0,))
+            stream = stream_children(node, suffixes())
+            received: list[str] = []
+
+            async def reader() -> None:
+                async for chunk in stream:
+                    received.append(chunk)
+                    await asyncio.sleep(3600)  # a stalled client
+
+            task = asyncio.ensure_future(reader())
+            while not received:
+                await asyncio.sleep(0.01)
+            # nothing more is derived while the reader is not pulling
+            await asyncio.sleep(0.2)
+            derived = len(consumed)
+
+            # client disconnects
+            _ = task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await stream.aclose()
+            assert len(received) == 1
+            return derived
+
+        assert asyncio.run(scenario()) <= 2 * 256
+
+    def test_stream_saturated(self, monkeypatch: pytest.MonkeyPatch):
+        payload = {"seed": self.SEED, "range": {"count": 3}}
+        expected = client.post("/keypair/batch", json=payload).json()
+        node, _ = asyncio.run(derive_node(self.SEED, ()))
+
+        async def scenario() -> list[bytes]:
+            return [chunk async for chunk in stream_children(node, [(0,), (1,), (2,)])]
+
+        monkeypatch.setattr(
+            keypair.cpu_executor, "queue_depth", -keypair.cpu_executor.workers
+        )
+        # rejected before the response starts
+        with pytest.raises(HTTPException) as error:
+            _ = client.post("/keypair/stream", json=payload)
+        assert error.value.status_code == 503
+        # once started, a stream waits for the executor instead of breaking off
+        lines = b"".join(asyncio.run(scenario())).splitlines()
+        assert [json.loads(line) for line in lines] == expected
+
+    def test_stream_paths_rejected(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.post(
+                "/keypair/stream", json={"seed": self.SEED, "paths": ["m/0"]}
+            )
+
+
+class TestKeypairPublicOnly:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+    XPUB_M_0H: str = "xpub68Gmy5EdvgibQVfPdqkBBCHxA5htiqg55crXYuXoQRKfDBFA1WEjWgP6LHhwBZeNK1VTsfTFUHCdrfp1bgwQ9xv5ski8PX9rL2dZXvgGDnw"
+    XPUB_M_0H_1: str = "xpub6ASuArnXKPbfEwhqN6e3mwBcDTgzisQN1wXN9BJcM47sSikHjJf3UFHKkNAWbWMiGj7Wf5uMash7SyYq527Hqck2AxYysAA7xmALppuCkwQ"
+
+    def test_get_public_only(self):
+        response = client.get(
+            f"/keypair/from_derivation/m/0'/1?seed={self.SEED}&public_only=true"
+        )
+        assert response.status_code == 200
+        assert response.json() == {"pubkey": self.XPUB_M_0H_1}
+
+    def test_post_public_only(self):
+        response = client.post(
+            "/keypair/from_derivation/",
+            json={"seed": self.SEED, "derivation": "m/0'/1", "public_only": True},
+        )
+        assert response.status_code == 200
+        assert response.json() == {"pubkey": self.XPUB_M_0H_1}
+
+    def test_batch_public_only(self):
+        payload = {"seed": self.SEED, "paths": ["m/0'/1", "m/0'/1/2'/2", "m/0'"]}
+        full = client.post("/keypair/batch", json=payload).json()
+        response = client.post("/keypair/batch", json={**payload, "public_only": True})
+        assert response.status_code == 200
+        assert response.json() == [{"pubkey": keypair["pubkey"]} for keypair in full]
+
+    def test_get_from_xpub(self):
+        response = client.get(f"/keypair/from_xpub/m/1?xpub={self.XPUB_M_0H}")
+        assert response.status_code == 200
+        assert response.json() == {"pubkey": self.XPUB_M_0H_1}
+
+    def test_post_from_xpub(self):
+        response = client.post(
+            "/keypair/from_xpub/", json={"xpub": self.XPUB_M_0H, "derivation": "m/1"}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"pubkey": self.XPUB_M_0H_1}
+
+    def test_from_xpub_root(self):
+        response = client.post("/keypair/from_xpub/", json={"xpub": self.XPUB_M_0H})
+        assert response.status_code == 200
+        assert response.json() == {"pubkey": self.XPUB_M_0H}
+
+    def test_from_xpub_hardened(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.get(f"/keypair/from_xpub/m/1'?xpub={self.XPUB_M_0H}")
+
+    def test_from_xpub_bad_checksum(self):
+        xpub = self.XPUB_M_0H[:-1] + "x"
+        with pytest.raises(RequestValidationError):
+            _ = client.get(f"/keypair/from_xpub/m/1?xpub={xpub}")
+
+    def test_from_xpub_xprv(self):
+        xprv = "xprv9uHRZZhk6KAJC1avXpDAp4MDc3sQKNxDiPvvkX8Br5ngLNv1TxvUxt4cV1rGL5hj6KCesnDYUhd7oWgT11eZG7XnxHrnYeSvkzY7d2bhkJ7"
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/keypair/from_xpub/", json={"xpub": xprv})
+
+
+    @pytest.mark.parametrize(
+        "version, key",
+        [
+            # x = 5 is not the coordinate of a point on the curve
+            ("0488b21e", "02" + "00" * 31 + "05"),
+            # still an xpub prefix in Base58, but not the mainnet version
+            ("0488b21f", None),
+        ],
+    )
+    def test_from_xpub_invalid_key(self, version: str, key: str | None):
+        decoded = check_decode(self.XPUB_M_0H)
+        xpub = check_encode(
+            bytes.fromhex(version)
+            + decoded[4:45]
+            + (decoded[45:] if key is None else bytes.fromhex(key))
+        )
+        assert xpub.startswith("xpub")
+        with pytest.raises(RequestValidationError):
+            _ = client.get(f"/keypair/from_xpub/m/1?xpub={xpub}")
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/keypair/from_xpub/", json={"xpub": xpub})
+
+    def test_from_xpub_too_deep(self):
+        decoded = check_decode(self.XPUB_M_0H)
+        xpub = check_encode(decoded[:4] + bytes((250,)) + decoded[5:])
+        response = client.get(f"/keypair/from_xpub/m/1/2/3/4/5?xpub={xpub}")
+        assert response.status_code == 200
+        with pytest.raises(RequestValidationError):
+            _ = client.get(f"/keypair/from_xpub/m/1/2/3/4/5/6?xpub={xpub}")
+        payload = {"xpub": xpub, "derivation": "m/1/2/3/4/5/6"}
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/keypair/from_xpub/", json=payload)
+
+class TestKeypairEngines:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def run_both(self, monkeypatch: pytest.MonkeyPatch, fn, *args):
+        monkeypatch.setattr(keypair, "NATIVE_ENGINE", True)
+        native = fn(*args)
+        monkeypatch.setattr(keypair, "NATIVE_ENGINE", False)
+        return native, fn(*args)
+
+    def test_same_results(self, monkeypatch: pytest.MonkeyPatch):
+        path = (HARDENED + 44, HARDENED, HARDENED, 0)
+        native, reference = self.run_both(monkeypatch, derive_path, self.SEED, None, path)
+        assert native == reference
+        nodes, (xpub, _, _) = native
+
+        native, reference = self.run_both(monkeypatch, derive_path, None, nodes[1], path[1:], True)
+        assert native == reference
+
+        suffixes = [(0,), (1, 2), (HARDENED + 3,)]
+        for public_only in (False, True):
+            native, reference = self.run_both(monkeypatch, derive_children, nodes[-1], suffixes, public_only)
+            assert native == reference
+
+        native, reference = self.run_both(monkeypatch, derive_public, xpub, (5, 6))
+        assert native == reference
+
+    def test_same_hex_results(self, monkeypatch: pytest.MonkeyPatch):
+        path = (HARDENED + 44, HARDENED, 0)
+        native, reference = self.run_both(monkeypatch, derive_path, self.SEED, None, path, False, "hex")
+        assert native == reference
+        nodes, (xpub, _, _) = native
+
+        suffixes = [(0,), (1, 2), (HARDENED + 3,)]
+        for public_only in (False, True):
+            native, reference = self.run_both(monkeypatch, derive_children, nodes[-1], suffixes, public_only, "hex")
+            assert native == reference
+
+    def test_same_addresses(self, monkeypatch: pytest.MonkeyPatch):
+        scripts = ("p2pkh", "p2wpkh", "p2tr")
+        native, reference = self.run_both(monkeypatch, derive_path, self.SEED, None, (HARDENED + 86,), False, "base58", scripts)
+        assert native == reference
+        nodes, (xpub, _, addresses) = native
+        assert list(addresses) == list(scripts)
+
+        suffixes = [(0,), (1, 2), (HARDENED + 3,)]
+        native, reference = self.run_both(monkeypatch, derive_children, nodes[-1], suffixes, True, "base58", scripts)
+        assert native == reference
+
+        native, reference = self.run_both(monkeypatch, derive_public, xpub, (5, 6), "base58", scripts)
+        assert native == reference
+
+
+class TestKeypairHexEncoding:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+    XPUB_M_0H: str = TestKeypairPublicOnly.XPUB_M_0H
+
+    def test_get_hex(self):
+        base58 = client.get(f"/keypair/from_derivation/m/0'?seed={self.SEED}").json()
+        response = client.get(
+            f"/keypair/from_derivation/m/0'?seed={self.SEED}&encoding=hex"
+        )
+        assert response.status_code == 200
+        keys = response.json()
+        assert keys == {
+            "pubkey": check_decode(base58["pubkey"]).hex(),
+            "prvkey": check_decode(base58["prvkey"]).hex(),
+        }
+        assert len(bytes.fromhex(keys["pubkey"])) == 78
+
+    def test_batch_hex(self):
+        payload = {"seed": self.SEED, "paths": ["m/0'/1", "m/0'/1/2'/2", "m/0'"]}
+        base58 = client.post("/keypair/batch", json=payload).json()
+        response = client.post("/keypair/batch", json={**payload, "encoding": "hex"})
+        assert response.status_code == 200
+        assert response.json() == [
+            {name: check_decode(key).hex() for name, key in keys.items()}
+            for keys in base58
+        ]
+
+    def test_stream_hex(self):
+        payload = {"seed": self.SEED, "range": {"count": 3}, "public_only": True}
+        response = client.post("/keypair/stream", json={**payload, "encoding": "hex"})
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [bytes.fromhex(line["pubkey"])[9:13] for line in lines] == [
+            index.to_bytes(4) for index in range(3)
+        ]
+
+    def test_from_xpub_hex(self):
+        response = client.post(
+            "/keypair/from_xpub/", json={"xpub": self.XPUB_M_0H, "encoding": "hex"}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"pubkey": check_decode(self.XPUB_M_0H).hex()}
+
+    def test_unknown_encoding(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.get(
+                f"/keypair/from_derivation/m/0'?seed={self.SEED}&encoding=base64"
+            )
+
+
+class TestKeypairCoalescing:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def test_identical_requests_share_derivation(self, monkeypatch: pytest.MonkeyPatch):
+        calls: list[tuple[int, ...]] = []
+        original = keypair.derive_node
+
+        async def counted(seed, indexes, **kwargs):
+            calls.append(indexes)
+            return await original(seed, indexes, **kwargs)
+
+        monkeypatch.setattr(keypair, "derive_node", counted)
+        derivation = keypair.DerivationType.parse("m/0'/1")
+        other = keypair.DerivationType.parse("m/0'/2")
+
+        async def main():
+            return await asyncio.gather(
+                *(keypair.internal_bip32_derivation(self.SEED, derivation) for _ in range(4)),
+                keypair.internal_bip32_derivation(self.SEED, derivation, public_only=True),
+                keypair.internal_bip32_derivation(self.SEED, other),
+            )
+
+        coalesced = keypair.derivations.coalesced
+        results = asyncio.run(main())
+        assert len(calls) == 3
+        assert keypair.derivations.coalesced == coalesced + 3
+        assert results[0] == results[3]
+        assert results[4].prvkey is None
+        assert keypair.derivations.in_flight == 0
+
+
+class TestKeypairCursor:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+
+    def open(self, **body) -> dict:
+        response = client.post("/keypair/cursors", json={"seed": self.SEED, **body})
+        assert response.status_code == 201
+        return response.json()
+
+    def batch(self, derivation: str, start: int, count: int, **body) -> list[dict]:
+        return client.post(
+            "/keypair/batch",
+            json={
+                "seed": self.SEED,
+                "derivation": derivation,
+                "range": {"start": start, "count": count, **body.pop("range", {})},
+                **body,
+            },
+        ).json()
+
+    def test_pages(self):
+        cursor = self.open(derivation="m/0'/1")
+        xpub = client.get(
+            f"/keypair/from_derivation/m/0'/1?seed={self.SEED}"
+        ).json()["pubkey"]
+        assert (cursor["xpub"], cursor["next"]) == (xpub, 0)
+
+        keypairs = []
+        for count in (3, 5, 2):
+            page = client.get(f"/keypair/cursors/{cursor['cursor']}?count={count}")
+            assert page.status_code == 200
+            keypairs += page.json()["keypairs"]
+            assert page.json()["next"] == len(keypairs)
+        assert keypairs == self.batch("m/0'/1", 0, 10)
+
+    def test_options(self):
+        cursor = self.open(
+            derivation="m/0'",
+            start=7,
+            hardened=True,
+            public_only=True,
+            encoding="hex",
+        )
+        assert len(bytes.fromhex(cursor["xpub"])) == 78
+        page = client.get(f"/keypair/cursors/{cursor['cursor']}?count=3").json()
+        assert page["next"] == 10
+        assert page["keypairs"] == self.batch(
+            "m/0'", 7, 3, range={"hardened": True}, public_only=True, encoding="hex"
+        )
+        assert all(keypair.keys() == {"pubkey"} for keypair in page["keypairs"])
+
+    def test_end_of_children(self):
+        cursor = self.open(derivation="m/1", start=HARDENED - 2)
+        page = client.get(f"/keypair/cursors/{cursor['cursor']}?count=5").json()
+        assert (len(page["keypairs"]), page["next"]) == (2, HARDENED)
+        page = client.get(f"/keypair/cursors/{cursor['cursor']}").json()
+        assert page == {"keypairs": [], "next": HARDENED}
+
+    def test_seed_not_derived_again(self, monkeypatch: pytest.MonkeyPatch):
+        cursor = self.open(derivation="m/44'/0'/0'/0")
+        expected = self.batch("m/44'/0'/0'/0", 0, 4)
+        node_cache.clear()
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("derived from the seed")
+
+        # pages only derive children of the node kept by the cursor
+        monkeypatch.setattr(keypair, "derive_node", fail)
+        page = client.get(f"/keypair/cursors/{cursor['cursor']}?count=4").json()
+        assert page["keypairs"] == expected
+
+    def assert_not_found(self, method: str, cursor: str):
+        with pytest.raises(HTTPException) as error:
+            _ = client.request(method, f"/keypair/cursors/{cursor}")
+        assert error.value.status_code == 404
+
+    def test_close(self):
+        cursor = self.open()["cursor"]
+        assert client.delete(f"/keypair/cursors/{cursor}").status_code == 204
+        self.assert_not_found("GET", cursor)
+        self.assert_not_found("DELETE", cursor)
+
+    def test_expired(self, monkeypatch: pytest.MonkeyPatch):
+        clock = [0.0]
+        store: SecretCache[bytes] = SecretCache(
+            max_size=1024, ttl=10, max_entries=4, clock=lambda: clock[0]
+        )
+        monkeypatch.setattr(keypair, "cursor_store", store)
+        cursor = self.open()["cursor"]
+        clock[0] = 9
+        assert client.get(f"/keypair/cursors/{cursor}").status_code == 200
+        # every page pushes the expiry back
+        clock[0] = 18
+        assert client.get(f"/keypair/cursors/{cursor}").status_code == 200
+        clock[0] = 28
+        self.assert_not_found("GET", cursor)
+
+    def test_bounded(self, monkeypatch: pytest.MonkeyPatch):
+        store: SecretCache[bytes] = SecretCache(max_size=1024, ttl=10, max_entries=2)
+        monkeypatch.setattr(keypair, "cursor_store", store)
+        cursors = [self.open()["cursor"] for _ in range(3)]
+        self.assert_not_found("GET", cursors[0])
+        assert client.get(f"/keypair/cursors/{cursors[2]}").status_code == 200
+        assert store.stats().size == 2 * 70
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            {"start": HARDENED},
+            {"derivation": "m" + "/0" * 255},
+            {"unknown": True},
+        ],
+    )
+    def test_invalid_body(self, body: dict[str, object]):
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/keypair/cursors", json={"seed": self.SEED, **body})
+
+    def test_page_rejected(self, monkeypatch: pytest.MonkeyPatch):
+        cursor = self.open(derivation="m/0'")["cursor"]
+        first = client.get(f"/keypair/cursors/{cursor}?count=2").json()
+        # a saturated executor admits nothing
+        with monkeypatch.context() as patch:
+            patch.setattr(
+                keypair.cpu_executor, "queue_depth", -keypair.cpu_executor.workers
+            )
+            with pytest.raises(HTTPException) as error:
+                _ = client.get(f"/keypair/cursors/{cursor}?count=3")
+            assert error.value.status_code == 503
+        # the rejected page is served on retry, no child is skipped
+        page = client.get(f"/keypair/cursors/{cursor}?count=3").json()
+        assert page["next"] == first["next"] + 3
+        assert first["keypairs"] + page["keypairs"] == self.batch("m/0'", 0, 5)
+
+    def test_invalid_count(self):
+        cursor = self.open()["cursor"]
+        with pytest.raises(RequestValidationError):
+            _ = client.get(f"/keypair/cursors/{cursor}?count=0")
+
+
+class TestKeypairAddresses:
+    # BIP39 seed of "abandon abandon ... about", without passphrase
+    SEED: str = "5eb00bbddcf069084889a8ab9155568165f5c453ccb85e70811aaed6f6da5fc19a5ac40b389cd370d086206dec8aa6c43daea6690f20ad3d8d48b2d2ce9e38e4"
+    # BIP44, BIP84 and BIP86 vectors, first receiving addresses
+    P2PKH: str = "1LqBGSKuX5yYUonjxT5qGfpUsXKYYWeabA"
+    P2WPKH: tuple[str, str] = ("bc1qcr8te4kr609gcawutmrza0j4xv80jy8z306fyu", "bc1qnjg0jd8228aq7egyzacy8cys3knf9xvrerkf9g")
+    P2TR: str = "bc1p5cyxnuxmeuwuvkwfem96lqzszd02n6xdcjrs20cac6yqjjwudpxqkedrcr"
+
+    @pytest.mark.parametrize(
+        "derivation, script, address",
+        [
+            ("m/44'/0'/0'/0/0", "p2pkh", P2PKH),
+            ("m/84'/0'/0'/0/0", "p2wpkh", P2WPKH[0]),
+            ("m/86'/0'/0'/0/0", "p2tr", P2TR),
+        ],
+    )
+    def test_vectors(self, derivation: str, script: str, address: str):
+        response = client.get(
+            f"/keypair/from_derivation/{derivation}?seed={self.SEED}&addresses={script}"
+        )
+        assert response.status_code == 200
+        assert response.json()["addresses"] == {script: address}
+
+    def test_post(self):
+        response = client.post(
+            "/keypair/from_derivation/",
+            json={
+                "seed": self.SEED,
+                "derivation": "m/86'/0'/0'/0/0",
+                "public_only": True,
+                "addresses": ["p2tr", "p2wpkh", "p2tr"],
+            },
+        )
+        assert response.status_code == 200
+        keypair = response.json()
+        assert list(keypair) == ["pubkey", "addresses"]
+        # in the order requested, without duplicates
+        assert list(keypair["addresses"]) == ["p2tr", "p2wpkh"]
+        assert keypair["addresses"]["p2tr"] == self.P2TR
+
+    def test_from_xpub(self):
+        xpub = client.get(
+            f"/keypair/from_derivation/m/84'/0'/0'?seed={self.SEED}&public_only=true"
+        ).json()["pubkey"]
+        response = client.post(
+            "/keypair/from_xpub/",
+            json={"xpub": xpub, "derivation": "m/0/1", "addresses": ["p2wpkh"]},
+        )
+        assert response.status_code == 200
+        assert response.json()["addresses"] == {"p2wpkh": self.P2WPKH[1]}
+        response = client.get(
+            f"/keypair/from_xpub/m/0/1?xpub={xpub}&addresses=p2wpkh"
+        )
+        assert response.json()["addresses"] == {"p2wpkh": self.P2WPKH[1]}
+
+    def test_batch(self):
+        response = client.post(
+            "/keypair/batch",
+            json={
+                "seed": self.SEED,
+                "derivation": "m/84'/0'/0'/0",
+                "range": {"count": 2},
+                "addresses": ["p2wpkh"],
+            },
+        )
+        assert response.status_code == 200
+        assert [keypair["addresses"] for keypair in response.json()] == [
+            {"p2wpkh": address} for address in self.P2WPKH
+        ]
+
+    def test_stream(self):
+        response = client.post(
+            "/keypair/stream",
+            json={
+                "seed": self.SEED,
+                "derivation": "m/84'/0'/0'/0",
+                "range": {"count": 2},
+                "public_only": True,
+                "addresses": ["p2wpkh"],
+            },
+        )
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [list(line) for line in lines] == [["pubkey", "addresses"]] * 2
+        assert [line["addresses"]["p2wpkh"] for line in lines] == list(self.P2WPKH)
+
+    def test_cursor(self):
+        response = client.post(
+            "/keypair/cursors",
+            json={
+                "seed": self.SEED,
+                "derivation": "m/84'/0'/0'/0",
+                "addresses": ["p2tr", "p2wpkh"],
+            },
+        )
+        cursor = response.json()["cursor"]
+        keypairs = client.get(f"/keypair/cursors/{cursor}?count=2").json()["keypairs"]
+        # kept by the cursor in a fixed order
+        assert [list(keypair["addresses"]) for keypair in keypairs] == [
+            ["p2wpkh", "p2tr"]
+        ] * 2
+        assert [keypair["addresses"]["p2wpkh"] for keypair in keypairs] == list(
+            self.P2WPKH
+        )
+
+    def test_unknown_script(self):
+        with pytest.raises(RequestValidationError):
+            _ = client.get(
+                f"/keypair/from_derivation/m/0?seed={self.SEED}&addresses=p2sh"
+            )
+
+
+class TestKeypairBinary:
+    SEED: str = "000102030405060708090a0b0c0d0e0f"
+    CBOR: dict[str, str] = {"accept": "application/cbor"}
+
+    def read_frames(self, body: bytes) -> list[dict[str, object]]:
+        items = []
+        while body:
+            (size,) = FRAME_LENGTH.unpack_from(body)
+            items.append(cbor2.loads(body[4 : 4 + size]))
+            body = body[4 + size :]
+        return items
+
+    def raw(self, keypairs: list[dict[str, str]]) -> list[dict[str, object]]:
+        return [
+            {
+                name: value if name == "addresses" else check_decode(value)
+                for name, value in keypair.items()
+            }
+            for keypair in keypairs
+        ]
+
+    def test_batch(self):
+        payload = {
+            "seed": self.SEED,
+            "paths": ["m/0'/1", "m/0'/1/2'"],
+            "addresses": ["p2wpkh"],
+        }
+        expected = self.raw(client.post("/keypair/batch", json=payload).json())
+        # Base58 or hex, the keys are sent as their raw 78 bytes
+        for encoding in ("base58", "hex"):
+            response = client.post(
+                "/keypair/batch",
+                json={**payload, "encoding": encoding},
+                headers=self.CBOR,
+            )
+            assert response.headers["content-type"] == "application/cbor"
+            assert self.read_frames(response.content) == expected
+
+    def test_stream(self):
+        payload = {"seed": self.SEED, "range": {"count": 3}, "public_only": True}
+        expected = client.post("/keypair/batch", json=payload).json()
+        response = client.post("/keypair/stream", json=payload, headers=self.CBOR)
+        assert response.headers["content-type"] == "application/cbor"
+        assert self.read_frames(response.content) == self.raw(expected)
+
+    def test_single(self):
+        expected = client.get(
+            f"/keypair/from_derivation/m/0'?seed={self.SEED}&public_only=true"
+        ).json()
+        response = client.get(
+            f"/keypair/from_derivation/m/0'?seed={self.SEED}&public_only=true",
+            headers=self.CBOR,
+        )
+        assert cbor2.loads(response.content) == self.raw([expected])[0]
+        response = client.post(
+            "/keypair/from_xpub/", json={"xpub": expected["pubkey"]}, headers=self.CBOR
+        )
+        assert cbor2.loads(response.content) == self.raw([expected])[0]
+
+    def test_cursor(self):
+        response = client.post(
+            "/keypair/cursors", json={"seed": self.SEED}, headers=self.CBOR
+        )
+        assert response.status_code == 201
+        cursor = cbor2.loads(response.content)
+        assert cursor["xpub"][:4] == bytes.fromhex("0488b21e")
+        page = client.get(f"/keypair/cursors/{cursor['cursor']}", headers=self.CBOR)
+        keypairs = cbor2.loads(page.content)["keypairs"]
+        assert len(keypairs) == 20
+        # the cursor still serves Base58 keys to JSON clients
+        page = client.get(f"/keypair/cursors/{cursor['cursor']}?count=1").json()
+        assert page["keypairs"][0]["pubkey"].startswith("xpub")
@@ -1,9 +1,20 @@
+from fastapi import HTTPException
 from fastapi.exceptions import RequestValidationError
 from fastapi.testclient import TestClient
+import asyncio
+import hashlib
+import json
+
+import cbor2
 import pytest
-from .seed import router
+
+from ..cache import SecretCache
+from ..responses import FRAME_LENGTH
+from . import seed
+from .seed import router, router_v2
 
 client = TestClient(router)
+client_v2 = TestClient(router_v2)
 
 BIP39_TEST_VECTORS = [
     [
@@ -218,3 +229,268 @@ class TestSeedErrors:
         body = "0123456789abcdef0123456789xbcdef0123456789abcdef0123456789abcdef"
         with pytest.raises(RequestValidationError):
             _ = client.post("/seed/from_entropy", json=body)
+
+    def test_seed_entropy_strength(self):
+        body = {"entropy": "0123456789abcdef0123456789abcdef0123"}
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/seed/from_entropy/", json=body)
+
+
+class TestSeedCache:
+    MNEMONIC: str = BIP39_TEST_VECTORS[0][1]
+    SEED: str = BIP39_TEST_VECTORS[0][2]
+
+    def test_disabled_by_default(self):
+        response = client.get(f"/seed/from_words/{self.MNEMONIC.replace(' ', '/')}")
+        assert response.status_code == 200
+        stats = client.get("/seed/cache/stats").json()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (0, 0, 0)
+
+    def test_enabled(self, monkeypatch: pytest.MonkeyPatch):
+        cache: SecretCache[bytes] = SecretCache(max_size=2 * 64, ttl=60, max_entries=2)
+        monkeypatch.setattr(seed, "seed_cache", cache)
+
+        for _ in range(3):
+            response = client.get(
+                f"/seed/from_words/{self.MNEMONIC.replace(' ', '/')}"
+            )
+            assert response.status_code == 200
+            assert response.json()["seed"] == self.SEED
+        response = client.post(
+            "/seed/from_entropy/", json={"entropy": BIP39_TEST_VECTORS[0][0]}
+        )
+        assert response.json()["seed"] == self.SEED
+
+        stats = client.get("/seed/cache/stats").json()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 1, 1)
+        assert stats["hit_rate"] == 0.75
+
+    def test_max_entries(self, monkeypatch: pytest.MonkeyPatch):
+        cache: SecretCache[bytes] = SecretCache(max_size=2 * 64, ttl=60, max_entries=2)
+        monkeypatch.setattr(seed, "seed_cache", cache)
+
+        for expected_entropy, _, expected_seed, _ in BIP39_TEST_VECTORS[:3]:
+            response = client.post(
+                "/seed/from_entropy/", json={"entropy": expected_entropy}
+            )
+            assert response.json()["seed"] == expected_seed
+
+        stats = client.get("/seed/cache/stats").json()
+        assert (stats["entries"], stats["evictions"]) == (2, 1)
+
+
+class TestSeedV2:
+    ENTROPY: str = BIP39_TEST_VECTORS[0][0]
+    MNEMONIC: list[str] = BIP39_TEST_VECTORS[0][1].split()
+
+    def test_bip39_test_vectors(self):
+        for expected_entropy, mnemonic, expected_seed, _ in BIP39_TEST_VECTORS:
+            expected = {
+                "entropy": expected_entropy,
+                "mnemonic": mnemonic.split(),
+                "seed": expected_seed,
+            }
+            response = client_v2.post(
+                "/v2/seed/from_entropy/",
+                json={"entropy": expected_entropy, "passphrase": "TREZOR"},
+            )
+            assert response.json() == expected
+            response = client_v2.post(
+                "/v2/seed/from_words/",
+                json={"mnemonic": mnemonic.split(), "passphrase": "TREZOR"},
+            )
+            assert response.json() == expected
+
+    def test_empty_passphrase_by_default(self):
+        expected = hashlib.pbkdf2_hmac(
+            "sha512", " ".join(self.MNEMONIC).encode(), b"mnemonic", 2048
+        ).hex()
+        response = client_v2.post(
+            "/v2/seed/from_entropy/", json={"entropy": self.ENTROPY}
+        )
+        assert response.json()["seed"] == expected
+        response = client_v2.post(
+            "/v2/seed/from_words/", json={"mnemonic": self.MNEMONIC}
+        )
+        assert response.json()["seed"] == expected
+
+    def test_iterations(self):
+        expected = hashlib.pbkdf2_hmac(
+            "sha512", " ".join(self.MNEMONIC).encode(), b"mnemonicTREZOR", 1
+        ).hex()
+        response = client_v2.post(
+            "/v2/seed/from_words/",
+            json={"mnemonic": self.MNEMONIC, "passphrase": "TREZOR", "iterations": 1},
+        )
+        assert response.json()["seed"] == expected
+
+    def test_language(self):
+        response = client_v2.post(
+            "/v2/seed/from_entropy/",
+            json={"entropy": self.ENTROPY, "language": "french"},
+        )
+        french = response.json()
+        assert french["mnemonic"] != self.MNEMONIC
+
+        response = client_v2.post(
+            "/v2/seed/from_words/",
+            json={"mnemonic": french["mnemonic"], "language": "french"},
+        )
+        assert response.json() == french
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            {"iterations": 0},
+            {"iterations": 2049},
+            {"language": "klingon"},
+            {"passphrase": "x" * 1025},
+            {"unknown": True},
+        ],
+    )
+    def test_invalid_options(self, body: dict[str, object]):
+        with pytest.raises(RequestValidationError):
+            _ = client_v2.post(
+                "/v2/seed/from_entropy/", json={"entropy": self.ENTROPY, **body}
+            )
+        with pytest.raises(RequestValidationError):
+            _ = client_v2.post(
+                "/v2/seed/from_words/", json={"mnemonic": self.MNEMONIC, **body}
+            )
+
+    def test_words_of_another_language(self):
+        with pytest.raises(RequestValidationError):
+            _ = client_v2.post(
+                "/v2/seed/from_words/",
+                json={"mnemonic": self.MNEMONIC, "language": "french"},
+            )
+
+
+class TestSeedBatch:
+    def test_bip39_test_vectors(self):
+        items = [
+            {"entropy": entropy} if position % 2 else {"mnemonic": mnemonic.split()}
+            for position, (entropy, mnemonic, _, _) in enumerate(BIP39_TEST_VECTORS)
+        ]
+        response = client.post("/seed/batch", json={"items": items})
+        assert response.status_code == 200
+        assert response.json() == [
+            {"entropy": entropy, "mnemonic": mnemonic.split(), "seed": expected_seed}
+            for entropy, mnemonic, expected_seed, _ in BIP39_TEST_VECTORS
+        ]
+
+    def test_errors_inline(self):
+        entropy, mnemonic, expected_seed, _ = BIP39_TEST_VECTORS[0]
+        items = [
+            {"mnemonic": ["zoo"] * 12},
+            {"entropy": entropy},
+            {"entropy": "0123"},
+            {"entropy": " 0" * 16},
+            {"mnemonic": ["legal", "winner"]},
+            {},
+            {"entropy": entropy, "mnemonic": mnemonic.split()},
+            {"mnemonic": mnemonic.split()},
+        ]
+        results = client.post("/seed/batch", json={"items": items}).json()
+        assert [result.get("seed") for result in results] == (
+            [None, expected_seed] + [None] * 5 + [expected_seed]
+        )
+        assert all(set(result) == {"error"} for result in results[2:7])
+        assert "not valid" in results[0]["error"]
+
+    def test_options(self):
+        entropy, mnemonic, _, _ = BIP39_TEST_VECTORS[0]
+        expected = hashlib.pbkdf2_hmac(
+            "sha512", mnemonic.encode(), b"mnemonic", 1
+        ).hex()
+        response = client.post(
+            "/seed/batch",
+            json={"items": [{"entropy": entropy}], "passphrase": "", "iterations": 1},
+        )
+        assert response.json()[0]["seed"] == expected
+
+        response = client.post(
+            "/seed/batch",
+            json={"items": [{"mnemonic": mnemonic.split()}], "language": "french"},
+        )
+        assert "error" in response.json()[0]
+
+    def test_chunks(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(seed, "BATCH_CHUNK_MIN_SIZE", 1)
+        items = [{"entropy": entropy} for entropy, _, _, _ in BIP39_TEST_VECTORS]
+        response = client.post("/seed/batch", json={"items": items * 3})
+        assert [result["seed"] for result in response.json()] == [
+            expected_seed for _, _, expected_seed, _ in BIP39_TEST_VECTORS
+        ] * 3
+
+    def test_stream(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(seed, "STREAM_CHUNK_SIZE", 2)
+        items = [{"entropy": entropy} for entropy, _, _, _ in BIP39_TEST_VECTORS]
+        items.insert(3, {"entropy": "xyz"})
+        response = client.post("/seed/batch/stream", json={"items": items})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == len(items)
+        assert lines[3] == {"error": "entropy must be hexadecimal"}
+        assert [line["seed"] for line in lines[:3] + lines[4:]] == [
+            expected_seed for _, _, expected_seed, _ in BIP39_TEST_VECTORS
+        ]
+
+    def test_stream_saturated(self, monkeypatch: pytest.MonkeyPatch):
+        entropy, _, expected_seed, _ = BIP39_TEST_VECTORS[0]
+        payload = seed.SeedBatchBody.model_validate({"items": [{"entropy": entropy}]})
+        monkeypatch.setattr(
+            seed.cpu_executor, "queue_depth", -seed.cpu_executor.workers
+        )
+        # rejected before the response starts
+        with pytest.raises(HTTPException) as error:
+            _ = client.post("/seed/batch/stream", json=payload.model_dump())
+        assert error.value.status_code == 503
+
+        # once started, a stream waits for the executor instead of breaking off
+        async def scenario() -> list[bytes]:
+            return [chunk async for chunk in seed.stream_seeds(payload)]
+
+        lines = b"".join(asyncio.run(scenario())).splitlines()
+        assert json.loads(lines[0])["seed"] == expected_seed
+
+    def read_frames(self, body: bytes) -> list[dict[str, object]]:
+        items = []
+        while body:
+            (size,) = FRAME_LENGTH.unpack_from(body)
+            items.append(cbor2.loads(body[4 : 4 + size]))
+            body = body[4 + size :]
+        return items
+
+    @pytest.mark.parametrize("path", ["/seed/batch", "/seed/batch/stream"])
+    def test_cbor(self, path: str):
+        entropy, mnemonic, expected_seed, _ = BIP39_TEST_VECTORS[0]
+        response = client.post(
+            path,
+            json={"items": [{"entropy": entropy}, {"entropy": "xyz"}]},
+            headers={"accept": "application/cbor"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/cbor"
+        assert self.read_frames(response.content) == [
+            {
+                "entropy": bytes.fromhex(entropy),
+                "mnemonic": mnemonic.split(),
+                "seed": bytes.fromhex(expected_seed),
+            },
+            {"error": "entropy must be hexadecimal"},
+        ]
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            {"items": []},
+            {"items": [{"entropy": "00" * 16}], "iterations": 0},
+            {"items": [{"entropy": "00" * 16, "unknown": True}]},
+            {"items": [{"mnemonic": ["abandon"] * 49}]},
+        ],
+    )
+    def test_invalid_body(self, body: dict[str, object]):
+        with pytest.raises(RequestValidationError):
+            _ = client.post("/seed/batch", json=body)
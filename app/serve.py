@@ -0,0 +1,71 @@
+# Deployment entry point: N uvicorn workers sharing their derived node and
+# seed caches, their keypair cursors and their rate limits, through files
+# mapped in memory, see app.shared_cache.
+#
+#   uv run python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+#
+# The cache files live in a private directory of /dev/shm, created before the
+# workers start and wiped once they are all stopped: a restarted worker finds
+# the caches warm. Every other setting is read from APP_* variables as usual.
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Final
+
+import uvicorn
+
+# that of app.settings, which is not imported here: its settings would be read
+# before the variables below are set, and served as is by a single worker
+ENV_PREFIX: Final[str] = "APP_"
+# memory backed on Linux, secrets in the caches never reach a disk
+SHARED_MEMORY: Final[Path] = Path("/dev/shm")
+
+
+def wipe(directory: Path) -> None:
+    for path in directory.iterdir():
+        with path.open("r+b") as cache:
+            _ = cache.write(bytes(path.stat().st_size))
+        path.unlink()
+    directory.rmdir()
+
+
+def main() -> int:
+    cpus: int = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(
+        description="Serve the API with workers sharing their caches"
+    )
+    _ = parser.add_argument("--host", default="127.0.0.1")
+    _ = parser.add_argument("--port", type=int, default=8000)
+    _ = parser.add_argument("--workers", type=int, default=cpus)
+    arguments: argparse.Namespace = parser.parse_args()
+    if arguments.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    directory: Path = Path(
+        tempfile.mkdtemp(
+            prefix="app-cache-",
+            dir=SHARED_MEMORY if SHARED_MEMORY.is_dir() else None,
+        )
+    )
+    # inherited by the workers, which read their settings when importing app
+    os.environ[f"{ENV_PREFIX}SHARED_CACHE_DIR"] = str(directory)
+    # one CPU executor per worker, the cores are split between them
+    _ = os.environ.setdefault(
+        f"{ENV_PREFIX}CPU_WORKERS", str(max(1, cpus // arguments.workers))
+    )
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=arguments.host,
+            port=arguments.port,
+            workers=arguments.workers,
+        )
+    finally:
+        wipe(directory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+from collections.abc import Mapping
+from typing import ClassVar, Final, Literal
+
+from pydantic import BaseModel, ConfigDict, Field
+
+ENV_PREFIX: Final[str] = "APP_"
+
+
+class Settings(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="ignore", frozen=True)
+
+    cpu_executor: Literal["process", "thread"] = "process"
+    cpu_workers: int = Field(default_factory=lambda: os.cpu_count() or 1, ge=1)
+    cpu_queue_depth: int = Field(default=64, ge=0)
+    cpu_retry_after: int = Field(default=1, ge=0)
+
+    node_cache_size: int = Field(default=4 * 1024 * 1024, ge=0)
+    node_cache_ttl: float = Field(default=300.0, ge=0)
+    shared_cache_dir: str = ""
+
+    seed_cache_max_entries: int = Field(default=0, ge=0)
+    seed_cache_ttl: float = Field(default=300.0, ge=0)
+    seed_batch_max_size: int = Field(default=10_000, ge=1)
+
+    keypair_batch_max_size: int = Field(default=10_000, ge=1)
+    keypair_cursor_max_entries: int = Field(default=1024, ge=1)
+    keypair_cursor_ttl: float = Field(default=600.0, gt=0)
+    bip32_engine: Literal["native", "hdwallet"] = "native"
+    fast_responses: bool = True
+    warm_up: bool = True
+
+    entropy_pool_low_watermark: int = Field(default=64, ge=0)
+    entropy_pool_high_watermark: int = Field(default=1024, ge=0)
+    entropy_bulk_max_size: int = Field(default=1000, ge=1)
+
+    # tokens per second and client, 0 disables the rate limiter
+    rate_limit_rate: float = Field(default=0.0, ge=0)
+    rate_limit_burst: float = Field(default=200.0, gt=0)
+    rate_limit_max_clients: int = Field(default=10_000, ge=1)
+    rate_limit_client_header: str = ""
+
+    profiler_slow_threshold: float = Field(default=0.0, ge=0)
+    profiler_sample_rate: int = Field(default=0, ge=0)
+    profiler_interval: float = Field(default=0.005, gt=0)
+    profiler_buffer_size: int = Field(default=32, ge=1)
+    debug_token: str = ""
+
+
+def load_settings(environ: Mapping[str, str] = os.environ) -> Settings:
+    values: dict[str, str] = {
+        name.removeprefix(ENV_PREFIX).lower(): value
+        for name, value in environ.items()
+        if name.startswith(ENV_PREFIX)
+    }
+    return Settings.model_validate(values)
+
+
+settings: Final[Settings] = load_settings()
@@ -0,0 +1,311 @@
+import fcntl
+import mmap
+import os
+import secrets
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import ClassVar, Final, Generic, TypeAlias, TypeVar
+
+from app.bip32 import NODE_SIZE, XPRV_VERSION
+from app.cache import CacheStats, keyed_fingerprint
+
+MAGIC: Final[bytes] = b"SHCACHE1"
+# magic, slots, record size, fingerprint key, then the counters
+HEADER: Final[struct.Struct] = struct.Struct(">8sII32s")
+COUNTER: Final[struct.Struct] = struct.Struct(">Q")
+HITS, MISSES, EVICTIONS, EXPIRATIONS, ENTRIES = range(5)
+HEADER_SIZE: Final[int] = 128
+# lookup key, expiry (wall clock, 0 for a free slot), private key or first
+# half of a seed, chain code or second half of a seed, depth, child index,
+# parent fingerprint
+RECORD: Final[struct.Struct] = struct.Struct(">16sd32s32sBI4s")
+SLOT: Final[struct.Struct] = struct.Struct(">16sd")
+# slots probed from the home slot of a key, the oldest is evicted when full
+PROBES: Final[int] = 8
+SEED_SIZE: Final[int] = 64
+# private key, chain code, depth, next child and flags, see app.cursors
+CURSOR_SIZE: Final[int] = 70
+
+Fields: TypeAlias = tuple[bytes, bytes, int, int, bytes]
+# (seed fingerprint, path prefix), see app.routers.keypair
+NodeKey: TypeAlias = tuple[bytes, tuple[int, ...]]
+K = TypeVar("K")
+
+
+# fixed-size hash table of secrets in a file mapped by every worker of a
+# deployment, see app.serve. Same interface as SecretCache: entries are
+# zeroised in place when they leave the cache, and fingerprints are keyed by a
+# random key stored in the file, so every worker computes the same ones. All
+# accesses hold an fcntl lock on the file, and a thread lock within a worker.
+class SharedSecretCache(ABC, Generic[K]):
+    value_size: ClassVar[int]
+
+    def __init__(
+        self,
+        path: Path,
+        slots: int,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path: Path = path
+        self.slots: int = slots
+        self.ttl: float = ttl
+        # shared by processes: wall clock, not a per-process monotonic one
+        self._clock: Callable[[], float] = clock
+        self._lock: threading.Lock = threading.Lock()
+        self._fd: int = -1
+        self._map: mmap.mmap | None = None
+        self._fingerprint_key: bytes = b""
+        if slots > 0:
+            self._open()
+
+    def _open(self) -> None:
+        size: int = HEADER_SIZE + self.slots * RECORD.size
+        fd: int = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                # the first worker to get the lock lays out the file
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, size)
+                    header: bytes = HEADER.pack(
+                        MAGIC, self.slots, RECORD.size, secrets.token_bytes(32)
+                    )
+                    _ = os.pwrite(fd, header, 0)
+                magic, slots, record_size, key = HEADER.unpack(
+                    os.pread(fd, HEADER.size, 0)
+                )
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            if (magic, slots, record_size) != (MAGIC, self.slots, RECORD.size):
+                raise ValueError(f"{self.path} is not a cache of {self.slots} slots")
+            self._map = mmap.mmap(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._fingerprint_key = key
+
+    @property
+    def enabled(self) -> bool:
+        return self._map is not None and self.ttl > 0
+
+    def fingerprint(self, *parts: bytes) -> bytes:
+        return keyed_fingerprint(self._fingerprint_key, *parts)
+
+    # the lookup key stored in the slot of an entry
+    @abstractmethod
+    def slot_key(self, key: K) -> bytes: ...
+
+    # a value split into the fields of a record, and back
+    @abstractmethod
+    def pack(self, value: bytes) -> Fields: ...
+
+    @abstractmethod
+    def unpack(self, fields: Fields) -> bytes: ...
+
+    @contextmanager
+    def _locked(self) -> Iterator[mmap.mmap]:
+        assert self._map is not None
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self._map
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _probe(self, lookup: bytes) -> Iterator[int]:
+        home: int = int.from_bytes(lookup[:8]) % self.slots
+        for step in range(min(PROBES, self.slots)):
+            yield HEADER_SIZE + (home + step) % self.slots * RECORD.size
+
+    def _count(self, shared: mmap.mmap, counter: int, delta: int = 1) -> None:
+        offset: int = HEADER.size + counter * COUNTER.size
+        (value,) = COUNTER.unpack_from(shared, offset)
+        COUNTER.pack_into(shared, offset, value + delta)
+
+    def _discard(self, shared: mmap.mmap, offset: int) -> None:
+        shared[offset : offset + RECORD.size] = bytes(RECORD.size)
+        self._count(shared, ENTRIES, -1)
+
+    def get(self, key: K) -> bytes | None:
+        value: bytes | None = self.peek(key)
+        self.record(hit=value is not None)
+        return value
+
+    def peek(self, key: K) -> bytes | None:
+        if not self.enabled:
+            return None
+        lookup: bytes = self.slot_key(key)
+        with self._locked() as shared:
+            for offset in self._probe(lookup):
+                stored, expires_at, *fields = RECORD.unpack_from(shared, offset)
+                if expires_at == 0 or stored != lookup:
+                    continue
+                if expires_at <= self._clock():
+                    self._discard(shared, offset)
+                    self._count(shared, EXPIRATIONS)
+                    return None
+                return self.unpack(tuple(fields))
+        return None
+
+    def record(self, hit: bool) -> None:
+        if not self.enabled:
+            return
+        with self._locked() as shared:
+            self._count(shared, HITS if hit else MISSES)
+
+    def put(self, key: K, value: bytes) -> None:
+        if not self.enabled:
+            return
+        lookup: bytes = self.slot_key(key)
+        fields: Fields = self.pack(value)
+        record: bytes = RECORD.pack(lookup, self._clock() + self.ttl, *fields)
+        with self._locked() as shared:
+            now: float = self._clock()
+            target: int | None = None
+            free: int | None = None
+            oldest: tuple[float, int] | None = None
+            for offset in self._probe(lookup):
+                stored, expires_at = SLOT.unpack_from(shared, offset)
+                if expires_at != 0 and stored == lookup:
+                    target = offset
+                    break
+                if free is None and expires_at <= now:
+                    free = offset
+                if oldest is None or expires_at < oldest[0]:
+                    oldest = (expires_at, offset)
+            if target is None:
+                if free is not None:
+                    target = free
+                else:
+                    assert oldest is not None
+                    target = oldest[1]
+                    self._count(shared, EVICTIONS)
+                _, expires_at = SLOT.unpack_from(shared, target)
+                if expires_at == 0:
+                    self._count(shared, ENTRIES)
+                elif free is not None:
+                    self._count(shared, EXPIRATIONS)
+            shared[target : target + RECORD.size] = record
+
+    def delete(self, key: K) -> bool:
+        if not self.enabled:
+            return False
+        lookup: bytes = self.slot_key(key)
+        with self._locked() as shared:
+            for offset in self._probe(lookup):
+                stored, expires_at = SLOT.unpack_from(shared, offset)
+                if expires_at != 0 and stored == lookup:
+                    self._discard(shared, offset)
+                    return True
+        return False
+
+    def clear(self) -> None:
+        if self._map is None:
+            return
+        with self._locked() as shared:
+            shared[HEADER_SIZE:] = bytes(len(shared) - HEADER_SIZE)
+            COUNTER.pack_into(shared, HEADER.size + ENTRIES * COUNTER.size, 0)
+
+    def stats(self) -> CacheStats:
+        counters: list[int] = [0] * 5
+        if self._map is not None:
+            with self._locked() as shared:
+                counters = [
+                    COUNTER.unpack_from(shared, HEADER.size + i * COUNTER.size)[0]
+                    for i in range(5)
+                ]
+        return CacheStats(
+            hits=counters[HITS],
+            misses=counters[MISSES],
+            evictions=counters[EVICTIONS],
+            expirations=counters[EXPIRATIONS],
+            entries=counters[ENTRIES],
+            size=counters[ENTRIES] * self.value_size,
+            max_size=self.slots * self.value_size,
+            max_entries=self.slots,
+        )
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = None
+
+
+# serialized extended private keys, as cached by app.routers.keypair
+class SharedNodeCache(SharedSecretCache[NodeKey]):
+    value_size: ClassVar[int] = NODE_SIZE
+
+    def slot_key(self, key: NodeKey) -> bytes:
+        seed, indexes = key
+        return self.fingerprint(seed, b"".join(i.to_bytes(4) for i in indexes))
+
+    def pack(self, value: bytes) -> Fields:
+        if len(value) != NODE_SIZE or value[:4] != XPRV_VERSION or value[45] != 0:
+            raise ValueError("not a serialized extended private key")
+        return (
+            value[46:],
+            value[13:45],
+            value[4],
+            int.from_bytes(value[9:13]),
+            value[5:9],
+        )
+
+    def unpack(self, fields: Fields) -> bytes:
+        key, chain_code, depth, index, parent_fingerprint = fields
+        return (
+            XPRV_VERSION
+            + bytes((depth,))
+            + parent_fingerprint
+            + index.to_bytes(4)
+            + chain_code
+            + b"\x00"
+            + key
+        )
+
+
+# BIP39 seeds, split over the key and chain code fields
+class SharedSeedCache(SharedSecretCache[bytes]):
+    value_size: ClassVar[int] = SEED_SIZE
+
+    def slot_key(self, key: bytes) -> bytes:
+        return self.fingerprint(key)
+
+    def pack(self, value: bytes) -> Fields:
+        if len(value) != SEED_SIZE:
+            raise ValueError(f"seed must be {SEED_SIZE} bytes")
+        return (value[:32], value[32:], 0, 0, bytes(4))
+
+    def unpack(self, fields: Fields) -> bytes:
+        return fields[0] + fields[1]
+
+
+# cursors over the children of an account node, see app.cursors: the next
+# child takes the place of the child index, the flags of the fingerprint
+class SharedCursorCache(SharedSecretCache[bytes]):
+    value_size: ClassVar[int] = CURSOR_SIZE
+
+    def slot_key(self, key: bytes) -> bytes:
+        return self.fingerprint(key)
+
+    def pack(self, value: bytes) -> Fields:
+        if len(value) != CURSOR_SIZE:
+            raise ValueError(f"cursor must be {CURSOR_SIZE} bytes")
+        return (
+            value[:32],
+            value[32:64],
+            value[64],
+            int.from_bytes(value[65:69]),
+            value[69:] + bytes(3),
+        )
+
+    def unpack(self, fields: Fields) -> bytes:
+        key, chain_code, depth, position, flags = fields
+        return key + chain_code + bytes((depth,)) + position.to_bytes(4) + flags[:1]
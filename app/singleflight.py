@@ -0,0 +1,58 @@
+import asyncio
+import secrets
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+from app.cache import keyed_fingerprint
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    __slots__: tuple[str, ...] = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task[T]) -> None:
+        self.task: asyncio.Task[T] = task
+        self.waiters: int = 0
+
+
+# Coalesces concurrent identical calls: the first caller of a key starts the
+# work as a task, and every caller arriving before it completes awaits the
+# same result, or exception. Keys are keyed fingerprints, secrets are never
+# kept. A call leaves the table as soon as it completes, or once its last
+# caller is cancelled, which cancels the work too.
+class SingleFlight(Generic[T]):
+    def __init__(self) -> None:
+        self._calls: dict[bytes, _Call[T]] = {}
+        self._fingerprint_key: bytes = secrets.token_bytes(32)
+        self.coalesced: int = 0
+
+    def fingerprint(self, *parts: bytes) -> bytes:
+        return keyed_fingerprint(self._fingerprint_key, *parts)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: bytes, work: Callable[[], Awaitable[T]]) -> T:
+        call: _Call[T] | None = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(work()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            # a cancelled caller must not cancel the work of the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # nobody left waiting: new callers start over
+                self._forget(key, call)
+                _ = call.task.cancel()
+
+    def _forget(self, key: bytes, call: _Call[T]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
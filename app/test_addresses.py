@@ -0,0 +1,57 @@
+import pytest
+
+from .addresses import encode_addresses, segwit_address, taproot_output_key
+
+# compressed public key of the generator, private key 1
+G: bytes = bytes.fromhex(
+    "0279be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798"
+)
+
+
+class TestAddresses:
+    def test_generator(self):
+        assert encode_addresses([G], ("p2pkh", "p2wpkh")) == [
+            {
+                "p2pkh": "1BgGZ9tcN4rm9KBzDn7KprQz87SZ26SAMH",
+                # BIP173
+                "p2wpkh": "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",
+            }
+        ]
+
+    def test_taproot(self):
+        # BIP86, m/86'/0'/0'/0/0 of the "abandon ... about" mnemonic
+        internal = bytes.fromhex(
+            "03cc8a4bc64d897bddc5fbc2f670f7a8ba0b386779106cf1223c6fc5d7cd6fc115"
+        )
+        assert taproot_output_key(internal).hex() == (
+            "a60869f0dbcf1dc659c9cecbaf8050135ea9e8cdc487053f1dc6880949dc684c"
+        )
+        assert encode_addresses([internal], ("p2tr",)) == [
+            {"p2tr": "bc1p5cyxnuxmeuwuvkwfem96lqzszd02n6xdcjrs20cac6yqjjwudpxqkedrcr"}
+        ]
+
+    @pytest.mark.parametrize(
+        "version, program, address",
+        [
+            # BIP350
+            (
+                1,
+                "79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798",
+                "bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0",
+            ),
+            (
+                0,
+                "751e76e8199196d454941c45d1b3a323f1433bd6",
+                "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",
+            ),
+        ],
+    )
+    def test_segwit_vectors(self, version: int, program: str, address: str):
+        assert segwit_address(version, bytes.fromhex(program)) == address
+
+    def test_order_and_batch(self):
+        scripts = ("p2tr", "p2pkh")
+        batch = encode_addresses([G, G], scripts)
+        assert [list(addresses) for addresses in batch] == [["p2tr", "p2pkh"]] * 2
+        assert batch[0] == batch[1]
+        assert encode_addresses([], scripts) == []
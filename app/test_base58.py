@@ -0,0 +1,43 @@
+import os
+
+import pytest
+from hdwallet.libs import base58 as reference
+
+from .base58 import check_decode, check_encode, check_encode_many, decode, encode
+
+
+class TestBase58:
+    def test_reference_encoder(self):
+        for size in range(100):
+            for zeros in (0, 1, 3):
+                data = bytes(zeros) + os.urandom(size)
+                assert encode(data) == reference.encode(data)
+                assert check_encode(data) == reference.check_encode(data)
+
+    def test_round_trip(self):
+        for size in range(100):
+            data = bytes(size % 3) + os.urandom(size)
+            assert decode(encode(data)) == data
+            assert check_decode(check_encode(data)) == data
+
+    def test_empty(self):
+        assert encode(b"") == ""
+        assert decode("") == b""
+        assert encode(b"\0\0") == "11"
+        assert decode("11") == b"\0\0"
+
+    def test_encode_many(self):
+        items = [os.urandom(78) for _ in range(10)]
+        assert check_encode_many(items) == [check_encode(item) for item in items]
+
+    def test_invalid_character(self):
+        with pytest.raises(ValueError):
+            _ = decode("0OIl")
+
+    def test_invalid_checksum(self):
+        encoded = check_encode(b"extended key")
+        corrupted = encoded[:-1] + ("2" if encoded[-1] != "2" else "3")
+        with pytest.raises(ValueError):
+            _ = check_decode(corrupted)
+        with pytest.raises(ValueError):
+            _ = check_decode("1")
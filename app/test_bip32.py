@@ -0,0 +1,85 @@
+import pytest
+from hdwallet.cryptocurrencies import Bitcoin
+from hdwallet.hds import BIP32HD
+
+from .bip32 import HARDENED, Node
+
+# BIP32 test vectors 1 and 2: seed, path, xpub, xprv
+BIP32_TEST_VECTORS = [
+    (
+        "000102030405060708090a0b0c0d0e0f",
+        (),
+        "xpub661MyMwAqRbcFtXgS5sYJABqqG9YLmC4Q1Rdap9gSE8NqtwybGhePY2gZ29ESFjqJoCu1Rupje8YtGqsefD265TMg7usUDFdp6W1EGMcet8",
+        "xprv9s21ZrQH143K3QTDL4LXw2F7HEK3wJUD2nW2nRk4stbPy6cq3jPPqjiChkVvvNKmPGJxWUtg6LnF5kejMRNNU3TGtRBeJgk33yuGBxrMPHi",
+    ),
+    (
+        "000102030405060708090a0b0c0d0e0f",
+        (HARDENED, 1, HARDENED + 2, 2, 1000000000),
+        "xpub6H1LXWLaKsWFhvm6RVpEL9P4KfRZSW7abD2ttkWP3SSQvnyA8FSVqNTEcYFgJS2UaFcxupHiYkro49S8yGasTvXEYBVPamhGW6cFJodrTHy",
+        "xprvA41z7zogVVwxVSgdKUHDy1SKmdb533PjDz7J6N6mV6uS3ze1ai8FHa8kmHScGpWmj4WggLyQjgPie1rFSruoUihUZREPSL39UNdE3BBDu76",
+    ),
+    (
+        "fffcf9f6f3f0edeae7e4e1dedbd8d5d2cfccc9c6c3c0bdbab7b4b1aeaba8a5a29f9c999693908d8a8784817e7b7875726f6c696663605d5a5754514e4b484542",
+        (0, HARDENED + 2147483647, 1, HARDENED + 2147483646, 2),
+        "xpub6FnCn6nSzZAw5Tw7cgR9bi15UV96gLZhjDstkXXxvCLsUXBGXPdSnLFbdpq8p9HmGsApME5hQTZ3emM2rnY5agb9rXpVGyy3bdW6EEgAtqt",
+        "xprvA2nrNbFZABcdryreWet9Ea4LvTJcGsqrMzxHx98MMrotbir7yrKCEXw7nadnHM8Dq38EGfSh6dqA9QWTyefMLEcBYJUuekgW4BYPJcr9E7j",
+    ),
+]
+
+
+def reference(seed: str, path: tuple[int, ...]) -> BIP32HD:
+    hdwallet = BIP32HD(ecc=Bitcoin.ECC).from_seed(seed)
+    for index in path:
+        hdwallet.drive(index)
+    return hdwallet
+
+
+class TestNode:
+    def test_bip32_test_vectors(self):
+        for seed, path, xpub, xprv in BIP32_TEST_VECTORS:
+            node = Node.from_seed(bytes.fromhex(seed)).derive(path)
+            assert (node.xpub(), node.xprv()) == (xpub, xprv)
+
+    def test_matches_hdwallet(self):
+        seed = BIP32_TEST_VECTORS[2][0]
+        for path in [(HARDENED + 44, HARDENED, HARDENED, 0, 7), (1, 2, 3), (HARDENED,)]:
+            node = Node.from_seed(bytes.fromhex(seed)).derive(path)
+            hdwallet = reference(seed, path)
+            assert node.to_bytes() == bytes.fromhex(hdwallet.xprivate_key(encoded=False))
+            assert node.to_bytes(private=False) == bytes.fromhex(hdwallet.xpublic_key(encoded=False))
+
+    def test_round_trip(self):
+        seed, path, xpub, xprv = BIP32_TEST_VECTORS[1]
+        node = Node.from_seed(bytes.fromhex(seed)).derive(path)
+        assert Node.from_bytes(node.to_bytes()).xprv() == xprv
+        assert Node.decode(xprv).xpub() == xpub
+        assert Node.decode(xpub).xpub() == xpub
+
+    def test_public_derivation(self):
+        seed = BIP32_TEST_VECTORS[0][0]
+        parent = Node.from_seed(bytes.fromhex(seed)).derive((HARDENED,))
+        public = Node.decode(parent.xpub())
+        assert public.private_key is None
+        for path in [(1,), (1, 2), (0, 5, 1000000000)]:
+            assert public.derive(path).xpub() == parent.derive(path).xpub()
+        with pytest.raises(ValueError):
+            _ = public.child(HARDENED)
+        with pytest.raises(ValueError):
+            _ = public.xprv()
+
+    def test_invalid_bytes(self):
+        seed = BIP32_TEST_VECTORS[0][0]
+        raw = Node.from_seed(bytes.fromhex(seed)).to_bytes()
+        with pytest.raises(ValueError):
+            _ = Node.from_bytes(raw[:-1])
+        with pytest.raises(ValueError):
+            _ = Node.from_bytes(bytes(4) + raw[4:])
+        with pytest.raises(ValueError):
+            # zero private key
+            _ = Node.from_bytes(raw[:46] + bytes(32))
+
+    def test_invalid_public_key(self):
+        raw = Node.decode(BIP32_TEST_VECTORS[0][2]).to_bytes(private=False)
+        with pytest.raises(ValueError):
+            # x = 5 is not the coordinate of a point on the curve
+            _ = Node.from_bytes(raw[:46] + (5).to_bytes(32))
@@ -0,0 +1,78 @@
+from .cache import SecretCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSecretCache:
+    def test_hit_and_miss(self):
+        cache: SecretCache[str] = SecretCache(max_size=64, ttl=10)
+        assert cache.get("a") is None
+        cache.put("a", b"secret")
+        assert cache.get("a") == b"secret"
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.entries, stats.size) == (1, 1, 1, 6)
+
+    def test_lru_eviction_zeroises(self):
+        cache: SecretCache[str] = SecretCache(max_size=8, ttl=10)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+        evicted = cache._entries["b"].value
+        assert cache.get("a") == b"aaaa"
+
+        cache.put("c", b"cccc")
+        assert cache.get("b") is None
+        assert evicted == bytearray(4)
+        assert cache.get("a") == b"aaaa"
+        assert cache.get("c") == b"cccc"
+        assert cache.stats().evictions == 1
+
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache: SecretCache[str] = SecretCache(max_size=64, ttl=5, clock=clock)
+        cache.put("a", b"secret")
+        clock.now = 4.9
+        assert cache.get("a") == b"secret"
+        clock.now = 5.0
+        assert cache.get("a") is None
+
+        stats = cache.stats()
+        assert (stats.expirations, stats.entries, stats.size) == (1, 0, 0)
+
+    def test_disabled(self):
+        cache: SecretCache[str] = SecretCache(max_size=0, ttl=5)
+        cache.put("a", b"secret")
+        assert cache.get("a") is None
+        assert cache.stats().entries == 0
+
+    def test_fingerprint(self):
+        cache: SecretCache[str] = SecretCache(max_size=64, ttl=5)
+        assert cache.fingerprint(b"ab", b"c") != cache.fingerprint(b"a", b"bc")
+        assert cache.fingerprint(b"seed") == cache.fingerprint(b"seed")
+        assert len(cache.fingerprint(b"seed")) == 16
+
+    def test_peek_does_not_count(self):
+        cache: SecretCache[str] = SecretCache(max_size=64, ttl=5)
+        cache.put("a", b"secret")
+        assert cache.peek("a") == b"secret"
+        assert cache.peek("b") is None
+        cache.record(hit=False)
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses) == (0, 1)
+
+    def test_delete_zeroises(self):
+        cache: SecretCache[str] = SecretCache(max_size=64, ttl=10)
+        cache.put("a", b"secret")
+        value = cache._entries["a"].value
+        assert cache.delete("a")
+        assert value == bytes(6)
+        assert cache.get("a") is None
+        assert not cache.delete("a")
+        assert cache.stats().size == 0
@@ -0,0 +1,60 @@
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from .derivation import HARDENED, MAX_DEPTH, Derivation, PublicDerivation
+
+
+class Body(BaseModel):
+    derivation: Derivation
+    public: PublicDerivation | None = None
+
+
+class TestDerivation:
+    def test_parse(self):
+        assert Derivation.parse("m").indexes == ()
+        assert Derivation.parse("m/44'/0'/0'/0/1").indexes == (
+            HARDENED + 44,
+            HARDENED,
+            HARDENED,
+            0,
+            1,
+        )
+        assert Derivation.parse("m/2147483647'").indexes == (2 * HARDENED - 1,)
+
+    def test_interned(self):
+        assert Derivation.parse("m/0'/1") is Derivation.parse("m/0'/1")
+        assert PublicDerivation.parse("m/0/1") is not Derivation.parse("m/0/1")
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "m/2147483648",
+            "m/9999999999'",
+            "m/1/",
+            "n/1",
+            "m/1''",
+            "m/-1",
+            "m/" + "/".join(["0"] * (MAX_DEPTH + 1)),
+        ],
+    )
+    def test_invalid(self, path: str):
+        with pytest.raises(ValueError):
+            _ = Derivation.parse(path)
+        with pytest.raises(ValidationError):
+            _ = Body(derivation=path)
+
+    def test_max_depth(self):
+        path = "m/" + "/".join(["0"] * MAX_DEPTH)
+        assert len(Derivation.parse(path).indexes) == MAX_DEPTH
+
+    def test_public(self):
+        assert PublicDerivation.parse("m/0/1").indexes == (0, 1)
+        with pytest.raises(ValueError):
+            _ = PublicDerivation.parse("m/0'")
+        with pytest.raises(ValidationError):
+            _ = Body(derivation="m", public="m/0'")
+
+    def test_model(self):
+        body = Body.model_validate({"derivation": "m/0'/1", "public": "m/2"})
+        assert body.derivation.indexes == (HARDENED, 1)
+        assert body.model_dump() == {"derivation": "m/0'/1", "public": "m/2"}
@@ -0,0 +1,37 @@
+import time
+
+from .entropy_pool import STRENGTHS, EntropyPool
+
+
+class TestEntropyPool:
+    def test_refill_to_high_watermark(self):
+        pool = EntropyPool(low_watermark=2, high_watermark=8)
+        pool.refill()
+        assert [level.available for level in pool.levels()] == [8] * len(STRENGTHS)
+
+    def test_take_sizes(self):
+        pool = EntropyPool(low_watermark=2, high_watermark=8)
+        pool.refill()
+        for strength in STRENGTHS:
+            entropies = pool.take(strength, 3)
+            assert len(entropies) == 3
+            assert all(len(entropy) == strength // 4 for entropy in entropies)
+        pool.close()
+
+    def test_never_twice(self):
+        pool = EntropyPool(low_watermark=0, high_watermark=16)
+        pool.refill()
+        entropies = pool.take(128, 40)
+        assert len(entropies) == 40
+        assert len(set(entropies)) == 40
+        pool.close()
+
+    def test_background_refill(self):
+        pool = EntropyPool(low_watermark=4, high_watermark=8)
+        pool.refill()
+        _ = pool.take(256, 6)
+        deadline = time.monotonic() + 5
+        while pool.levels()[-1].available < 8 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.levels()[-1].available == 8
+        pool.close()
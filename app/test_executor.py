@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from .executor import CPUExecutor
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+class TestCPUExecutor:
+    def test_run_thread(self):
+        executor = CPUExecutor(kind="thread", workers=2, queue_depth=0)
+        assert asyncio.run(executor.run(add, 1, 2)) == 3
+        assert executor.in_flight == 0
+        executor.shutdown()
+
+    def test_run_process(self):
+        executor = CPUExecutor(kind="process", workers=1, queue_depth=0)
+        assert asyncio.run(executor.run(add, 2, 3)) == 5
+        assert executor.in_flight == 0
+        executor.shutdown()
+
+    def test_saturated(self):
+        executor = CPUExecutor(kind="thread", workers=1, queue_depth=1, retry_after=7)
+        release = threading.Event()
+
+        async def scenario() -> list[bool]:
+            first = asyncio.ensure_future(executor.run(release.wait))
+            second = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0)
+            assert executor.in_flight == 2
+            assert executor.queued == 1
+            with pytest.raises(HTTPException) as error:
+                _ = await executor.run(release.wait)
+            assert error.value.status_code == 503
+            assert error.value.headers == {"Retry-After": "7"}
+            assert executor.rejected == 1
+            release.set()
+            return await asyncio.gather(first, second)
+
+        assert asyncio.run(scenario()) == [True, True]
+        assert executor.in_flight == 0
+        executor.shutdown()
+
+    def test_run_all_keeps_order(self):
+        executor = CPUExecutor(kind="thread", workers=2, queue_depth=2)
+        results = asyncio.run(executor.run_all(add, [(1, 1), (2, 2), (3, 3)]))
+        assert results == [2, 4, 6]
+        assert executor.in_flight == 0
+        executor.shutdown()
+
+    def test_run_all_rejected_at_once(self):
+        executor = CPUExecutor(kind="thread", workers=1, queue_depth=2)
+        release = threading.Event()
+
+        async def scenario() -> bool:
+            first = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as error:
+                _ = await executor.run_all(add, [(1, 1), (2, 2), (3, 3)])
+            assert error.value.status_code == 503
+            # nothing of the rejected group was admitted
+            assert executor.in_flight == 1
+            release.set()
+            return await first
+
+        assert asyncio.run(scenario()) is True
+        assert executor.in_flight == 0
+        executor.shutdown()
+
+    def test_admitted_jobs_wait(self):
+        executor = CPUExecutor(kind="thread", workers=1, queue_depth=0)
+        release = threading.Event()
+
+        async def scenario() -> list[object]:
+            executor.admit()
+            first = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as error:
+                executor.admit()
+            assert error.value.status_code == 503
+            # the job of an admitted stream waits instead of being rejected
+            second = asyncio.ensure_future(executor.run(add, 1, 2, wait=True))
+            third = asyncio.ensure_future(
+                executor.run_all(add, [(1, 1), (2, 2)], wait=True)
+            )
+            await asyncio.sleep(0.05)
+            assert not second.done() and not third.done()
+            assert executor.in_flight == 1
+            release.set()
+            return await asyncio.gather(first, second, third)
+
+        assert asyncio.run(scenario()) == [True, 3, [2, 4]]
+        assert executor.in_flight == 0
+        assert executor.rejected == 1
+        executor.shutdown()
@@ -0,0 +1,97 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from .main import app
+from .metrics import Histogram, RequestTimings, current_timings, stage
+
+client = TestClient(app)
+
+SEED = "000102030405060708090a0b0c0d0e0f"
+
+
+def sample(text: str, line: str, default: float | None = None) -> float:
+    for exposed in text.splitlines():
+        if exposed.startswith(line + " "):
+            return float(exposed.rsplit(" ", 1)[1])
+    assert default is not None, f"{line} not found"
+    return default
+
+
+class TestHistogram:
+    def test_render(self):
+        histogram = Histogram("latency_seconds", "help", buckets=(0.1, 1.0))
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.5, route="/a")
+        histogram.observe(5, route="/a")
+        assert list(histogram.render()) == [
+            "# HELP latency_seconds help",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="/a",le="0.1"} 1',
+            'latency_seconds_bucket{route="/a",le="1.0"} 2',
+            'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+            'latency_seconds_sum{route="/a"} 5.55',
+            'latency_seconds_count{route="/a"} 3',
+        ]
+
+    def test_escaped_labels(self):
+        histogram = Histogram("latency_seconds", "help", buckets=())
+        histogram.observe(1, route='a"b\\c')
+        assert 'latency_seconds_count{route="a\\"b\\\\c"} 1' in histogram.render()
+
+
+class TestStage:
+    def test_without_request(self):
+        with stage("crypto"):
+            pass
+        assert current_timings.get() is None
+
+    def test_accumulates(self):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        for _ in range(2):
+            with stage("crypto"):
+                asyncio.run(asyncio.sleep(0.01))
+        current_timings.reset(token)
+        assert timings.stages["crypto"] >= 0.02
+
+
+class TestMetricsRoute:
+    def test_stages_per_route_template(self):
+        path = "/keypair/from_derivation/{derivation:path}"
+        crypto = f'http_request_stage_duration_seconds_count{{route="{path}",stage="crypto"}}'
+        count = sample(client.get("/metrics").text, crypto, default=0)
+
+        response = client.get(f"/keypair/from_derivation/m/0'/1?seed={SEED}")
+        assert response.status_code == 200
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        for name in ("validation", "endpoint", "crypto", "serialization"):
+            assert f'route="{path}",stage="{name}"' in text
+        assert sample(text, crypto) == count + 1
+        assert f'method="GET",route="{path}",status="200"' in text
+        # only the route template is recorded, never the path or the query
+        assert SEED not in text
+        assert "m/0'/1" not in text
+
+    def test_validation_error(self):
+        response = client.post("/seed/from_entropy/", json={"entropy": "xyz"})
+        assert response.status_code == 422
+        text = client.get("/metrics").text
+        assert 'route="/seed/from_entropy/",stage="validation"' in text
+        assert 'method="POST",route="/seed/from_entropy/",status="422"' in text
+
+    def test_unmatched(self):
+        assert client.get("/nowhere").status_code == 404
+        assert 'route="unmatched",status="404"' in client.get("/metrics").text
+
+    def test_executor_gauges(self):
+        text = client.get("/metrics").text
+        assert sample(text, "cpu_executor_in_flight") == 0
+        assert sample(text, "cpu_executor_queued") == 0
+        assert sample(text, "cpu_executor_capacity") > 0
+        assert "# TYPE cpu_executor_rejected_total counter" in text
+        assert "# TYPE event_loop_lag_seconds histogram" in text
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from hdwallet.mnemonics.bip39 import BIP39Mnemonic
+
+from .mnemonic import LANGUAGES, encode_mnemonic, parse_mnemonic
+from .routers.test_seed import BIP39_TEST_VECTORS
+
+
+class TestParseMnemonic:
+    def test_bip39_test_vectors(self):
+        for test_vector in BIP39_TEST_VECTORS:
+            expected_entropy, mnemonic, _, _ = test_vector
+
+            parsed = parse_mnemonic(mnemonic.split())
+            assert parsed.entropy.hex() == expected_entropy
+            assert parsed.words == mnemonic.split()
+            assert parsed.language == "english"
+
+    def test_normalized(self):
+        parsed = parse_mnemonic("ZOO zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo Wrong".split())
+        assert parsed.phrase() == "zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo wrong"
+
+    def test_other_language(self):
+        words = "implorer visage sonnette voyage véloce pourpre volaille tribunal implorer visage sonnette voyelle"
+        parsed = parse_mnemonic(words.split())
+        assert parsed.language == "french"
+        assert parsed.entropy.hex() == "7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f"
+
+    def test_bad_checksum(self):
+        with pytest.raises(ValueError):
+            _ = parse_mnemonic("zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo".split())
+
+    def test_unknown_word(self):
+        with pytest.raises(ValueError):
+            _ = parse_mnemonic("zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo zzz".split())
+
+    def test_word_count(self):
+        with pytest.raises(ValueError):
+            _ = parse_mnemonic("zoo zoo zoo zoo zoo zoo zoo zoo zoo zoo wrong".split())
+
+    def test_given_language(self):
+        words = BIP39_TEST_VECTORS[0][1].split()
+        assert parse_mnemonic(words, "english").language == "english"
+        with pytest.raises(ValueError):
+            _ = parse_mnemonic(words, "french")
+
+
+class TestEncodeMnemonic:
+    def test_bip39_test_vectors(self):
+        for entropy, mnemonic, _, _ in BIP39_TEST_VECTORS:
+            assert encode_mnemonic(bytes.fromhex(entropy)) == mnemonic.split()
+
+    def test_reference_encoder(self):
+        for language in LANGUAGES:
+            for size in (16, 20, 24, 28, 32):
+                entropy = os.urandom(size)
+                words = encode_mnemonic(entropy, language)
+                assert " ".join(words) == BIP39Mnemonic.from_entropy(
+                    entropy.hex(), language
+                )
+                assert parse_mnemonic(words, language).entropy == entropy
+
+    def test_strength(self):
+        with pytest.raises(ValueError):
+            _ = encode_mnemonic(bytes(18))
+
+
+class TestImports:
+    def test_hdwallet_not_imported(self):
+        # hdwallet loads every coin it supports, the native engine avoids it
+        script = "import sys, app.main; print('hdwallet' in sys.modules)"
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            env={**os.environ, "APP_BIP32_ENGINE": "native"},
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        assert output.strip() == "False"
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from .profiler import Profiler, ProfilerMiddleware
+
+SEED = "000102030405060708090a0b0c0d0e0f"
+
+
+async def wait_for_crypto() -> None:
+    await asyncio.sleep(0.05)
+
+
+def build_client(profiler: Profiler) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+    @app.get("/slow/{derivation:path}")
+    async def slow(derivation: str, seed: str) -> str:
+        await wait_for_crypto()
+        return "slow"
+
+    @app.get("/blocking")
+    async def blocking() -> str:
+        time.sleep(0.05)
+        return "blocking"
+
+    @app.get("/fast")
+    async def fast() -> str:
+        return "fast"
+
+    return TestClient(app)
+
+
+class TestProfiler:
+    def test_disabled_by_default(self):
+        profiler = Profiler(slow_threshold=0, sample_rate=0, interval=0.001, buffer_size=4)
+        client = build_client(profiler)
+        assert client.get("/fast").status_code == 200
+        assert not profiler.enabled
+        assert profiler.profiles() == []
+
+    def test_slow_request(self):
+        profiler = Profiler(slow_threshold=0.02, sample_rate=0, interval=0.001, buffer_size=4)
+        client = build_client(profiler)
+        assert client.get(f"/slow/m/0'/1?seed={SEED}").status_code == 200
+        assert client.get("/fast").status_code == 200
+        profiler.close()
+
+        (summary,) = profiler.profiles()
+        assert (summary.route, summary.method, summary.status, summary.reason) == (
+            "/slow/{derivation:path}",
+            "GET",
+            200,
+            "slow",
+        )
+        assert summary.duration >= 0.05
+        assert summary.samples > 0
+
+        profile = profiler.get(summary.id)
+        assert profile is not None
+        # suspended: the awaited coroutines are sampled
+        assert any("wait_for_crypto" in stack for stack in profile.stacks)
+        folded = profile.folded()
+        assert SEED not in folded and "m/0'/1" not in folded
+
+    def test_blocking_request(self):
+        profiler = Profiler(slow_threshold=0.02, sample_rate=0, interval=0.001, buffer_size=4)
+        client = build_client(profiler)
+        assert client.get("/blocking").status_code == 200
+        profiler.close()
+
+        (summary,) = profiler.profiles()
+        profile = profiler.get(summary.id)
+        assert profile is not None
+        # running: the thread stack below the endpoint is sampled
+        endpoint = "app.test_profiler.build_client.<locals>.blocking:"
+        assert any(stack.split(";")[-1].startswith(endpoint) for stack in profile.stacks)
+
+    def test_sampled_requests(self):
+        profiler = Profiler(slow_threshold=0, sample_rate=2, interval=0.001, buffer_size=4)
+        client = build_client(profiler)
+        for _ in range(4):
+            assert client.get("/fast").status_code == 200
+        profiler.close()
+
+        summaries = profiler.profiles()
+        assert [summary.reason for summary in summaries] == ["sampled", "sampled"]
+        assert [summary.route for summary in summaries] == ["/fast", "/fast"]
+
+    def test_ring_buffer(self):
+        profiler = Profiler(slow_threshold=0, sample_rate=1, interval=0.001, buffer_size=2)
+        client = build_client(profiler)
+        for _ in range(3):
+            assert client.get("/fast").status_code == 200
+        profiler.close()
+
+        assert [summary.id for summary in profiler.profiles()] == [2, 3]
+        assert profiler.get(1) is None
@@ -0,0 +1,156 @@
+from pathlib import Path
+from typing import ClassVar
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, ConfigDict
+
+from .ratelimit import (
+    RateLimitMiddleware,
+    SharedTokenBuckets,
+    TokenBuckets,
+    client_key,
+    route_cost,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Body(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    entropy: str
+
+
+def make_client(buckets: TokenBuckets, client_header: str = "") -> TestClient:
+    test_app = FastAPI()
+    test_app.state.calls = 0
+
+    @test_app.post("/seed/from_entropy/")
+    async def post_seed(body: Body) -> Body:
+        test_app.state.calls += 1
+        return body
+
+    @test_app.get("/entropy/pool")
+    async def get_pool() -> int:
+        return 0
+
+    test_app.add_middleware(
+        RateLimitMiddleware, buckets=buckets, client_header=client_header
+    )
+    return TestClient(test_app)
+
+
+class TestRouteCost:
+    @pytest.mark.parametrize(
+        "path, cost",
+        [
+            ("/entropy/generate/128", 1),
+            ("/entropy/pool", 0),
+            ("/seed/from_words/abandon", 4),
+            ("/v2/seed/from_entropy/", 4),
+            ("/seed/batch/stream", 100),
+            ("/seed/cache/stats", 0),
+            ("/keypair/from_derivation/m/0", 2),
+            ("/keypair/batch", 50),
+            ("/keypair/cache/stats", 0),
+            ("/metrics", 0),
+        ],
+    )
+    def test_cost(self, path: str, cost: int):
+        assert route_cost(path) == cost
+
+
+class TestTokenBuckets:
+    def test_refill(self):
+        clock = Clock()
+        buckets = TokenBuckets(rate=2.0, burst=10.0, max_clients=8, clock=clock)
+        assert [buckets.take(b"a", 4) for _ in range(3)] == [0.0, 0.0, 1.0]
+        assert buckets.take(b"b", 4) == 0.0
+        clock.now += 1.0
+        assert buckets.take(b"a", 4) == 0.0
+        assert buckets.rejected == 1
+        assert buckets.clients == 2
+
+    def test_cost_above_burst(self):
+        clock = Clock()
+        buckets = TokenBuckets(rate=1.0, burst=5.0, max_clients=8, clock=clock)
+        assert buckets.take(b"a", 100) == 0.0
+        assert buckets.take(b"a", 100) == 5.0
+
+    def test_max_clients(self):
+        clock = Clock()
+        buckets = TokenBuckets(rate=1.0, burst=5.0, max_clients=2, clock=clock)
+        for key in (b"a", b"b", b"c"):
+            assert buckets.take(key, 5) == 0.0
+        assert buckets.clients == 2
+        # forgotten, as if its bucket was full
+        assert buckets.take(b"a", 5) == 0.0
+        assert buckets.take(b"c", 5) == 5.0
+
+    def test_shared(self, tmp_path: Path):
+        clock = Clock()
+        path = tmp_path / "ratelimit.table"
+        first = SharedTokenBuckets(path, 1.0, 5.0, max_clients=4, clock=clock)
+        second = SharedTokenBuckets(path, 1.0, 5.0, max_clients=4, clock=clock)
+        key = client_key({"headers": [], "client": ("10.0.0.1", 1234)}, b"")
+        assert first.take(key, 3) == 0.0
+        assert second.take(key, 3) == 1.0
+        clock.now += 1.0
+        assert second.take(key, 3) == 0.0
+        assert first.clients == second.clients == 1
+        # every slot probed is taken: the least recently seen client is replaced
+        for index in range(5):
+            assert first.take(bytes([index]) * 16, 1) == 0.0
+        assert first.clients == 4
+        with pytest.raises(ValueError):
+            _ = SharedTokenBuckets(path, 1.0, 5.0, max_clients=8)
+
+
+class TestRateLimitMiddleware:
+    def test_rejected_before_validation(self):
+        clock = Clock()
+        client = make_client(TokenBuckets(1.0, 8.0, max_clients=8, clock=clock))
+        # an invalid body still takes its tokens once admitted
+        assert client.post("/seed/from_entropy/", json={}).status_code == 422
+        response = client.post("/seed/from_entropy/", json={"entropy": "00"})
+        assert response.status_code == 200
+        response = client.post("/seed/from_entropy/", json={"entropy": "00"})
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "4"
+        assert response.json() == {"detail": "rate limit exceeded, retry later"}
+        assert client.app.state.calls == 1
+        # routes without a cost are not limited
+        assert client.get("/entropy/pool").status_code == 200
+        clock.now += 4.0
+        response = client.post("/seed/from_entropy/", json={"entropy": "00"})
+        assert response.status_code == 200
+
+    def test_client_header(self):
+        clock = Clock()
+        client = make_client(
+            TokenBuckets(1.0, 4.0, max_clients=8, clock=clock), "X-Api-Key"
+        )
+        for key in ("a", "b, proxy"):
+            response = client.post(
+                "/seed/from_entropy/",
+                json={"entropy": "00"},
+                headers={"x-api-key": key},
+            )
+            assert response.status_code == 200
+        response = client.post(
+            "/seed/from_entropy/", json={"entropy": "00"}, headers={"x-api-key": "a"}
+        )
+        assert response.status_code == 429
+
+    def test_disabled(self):
+        client = make_client(TokenBuckets(0.0, 1.0, max_clients=8))
+        for _ in range(3):
+            response = client.post("/seed/from_entropy/", json={"entropy": "00"})
+            assert response.status_code == 200
@@ -0,0 +1,206 @@
+from typing import Any, ClassVar
+
+import cbor2
+import pytest
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, ConfigDict
+
+from .base58 import check_decode
+from .main import app
+from .metrics import TimedRoute
+from .responses import (
+    BINARY_FORMATS,
+    FRAME_LENGTH,
+    FastJSONResponse,
+    SerializingRoute,
+    dumps,
+    negotiate,
+)
+
+SEED = "000102030405060708090a0b0c0d0e0f"
+CBOR = {"accept": "application/cbor"}
+
+
+def read_frames(body: bytes) -> list[Any]:
+    items: list[Any] = []
+    offset = 0
+    while offset < len(body):
+        (size,) = FRAME_LENGTH.unpack_from(body, offset)
+        offset += FRAME_LENGTH.size
+        items.append(cbor2.loads(body[offset : offset + size]))
+        offset += size
+    return items
+
+
+class Item(BaseModel):
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+    name: str
+    note: str | None = None
+
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/item", response_model_exclude_none=True)
+async def get_item() -> Item:
+    return Item(name="ünïcode")
+
+
+@router.post("/items", status_code=201)
+async def post_items() -> list[Item]:
+    return [Item.model_construct(name="a", note=None)]
+
+
+@router.get("/header")
+async def get_header(response: Response) -> Item:
+    response.headers["X-Item"] = "set"
+    return Item(name="a")
+
+
+@router.get("/plain")
+async def get_plain() -> dict[str, int]:
+    return {"count": 1}
+
+
+def make_client(default_response_class: type[Response]) -> TestClient:
+    test_app = FastAPI(default_response_class=default_response_class)
+    test_app.include_router(router)
+    return TestClient(test_app)
+
+
+fast_client = make_client(FastJSONResponse)
+standard_client = make_client(JSONResponse)
+
+
+class TestFastJSONResponse:
+    def test_render(self):
+        assert FastJSONResponse({"a": [1, "é"]}).body == '{"a":[1,"é"]}'.encode()
+        assert FastJSONResponse(b'{"a":1}').body == b'{"a":1}'
+
+    def test_dumps(self):
+        assert dumps([{"a": None}, 1.5, True]) == b'[{"a":null},1.5,true]'
+
+
+class TestSerializingRoute:
+    def route(self, client: TestClient, path: str) -> SerializingRoute:
+        route = next(r for r in client.app.routes if getattr(r, "path", "") == path)
+        assert isinstance(route, SerializingRoute)
+        return route
+
+    def test_same_body(self):
+        response = fast_client.get("/item")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == {"name": "ünïcode"}
+        assert self.route(fast_client, "/item").serializer is not None
+
+    def test_status_code(self):
+        response = fast_client.post("/items")
+        assert response.status_code == 201
+        assert response.json() == [{"name": "a", "note": None}]
+
+    def test_injected_response(self):
+        response = fast_client.get("/header")
+        assert response.headers["x-item"] == "set"
+        assert self.route(fast_client, "/header").serializer is None
+
+    def test_plain_content(self):
+        assert fast_client.get("/plain").json() == {"count": 1}
+
+    def test_router_routes_unchanged(self):
+        # only routes included with a FastJSONResponse skip FastAPI's encoding
+        for route in router.routes:
+            assert isinstance(route, SerializingRoute)
+            assert route.serializer is None
+        assert self.route(standard_client, "/item").serializer is None
+
+    def test_endpoint_wrapped_once(self):
+        route = self.route(fast_client, "/item")
+        assert route.endpoint is get_item
+
+
+class TestAppResponses:
+    def test_keypair(self):
+        client = TestClient(app)
+        response = client.get(f"/keypair/from_derivation/m/0'?seed={SEED}")
+        assert response.status_code == 200
+        assert set(response.json()) == {"pubkey", "prvkey"}
+        response = client.post(
+            "/keypair/batch",
+            json={"seed": SEED, "range": {"count": 2}, "public_only": True},
+        )
+        assert response.status_code == 200
+        assert [set(keypair) for keypair in response.json()] == [{"pubkey"}] * 2
+
+
+class TestNegotiate:
+    @pytest.mark.parametrize(
+        "accept, media_type",
+        [
+            (None, None),
+            ("*/*", None),
+            ("application/json", None),
+            ("application/cbor", "application/cbor"),
+            ("application/cbor, application/json", "application/cbor"),
+            ("application/json, application/cbor;q=0.5", None),
+            ("application/json;q=0.5, application/cbor", "application/cbor"),
+            ("application/cbor;q=0", None),
+            ("application/cbor;q=oops", None),
+            ("text/html, application/CBOR; q=0.9, */*;q=0.8", "application/cbor"),
+            # not offered
+            ("application/msgpack", None),
+        ],
+    )
+    def test_accept(self, accept: str | None, media_type: str | None):
+        wire = negotiate(accept)
+        assert (wire.media_type if wire is not None else None) == media_type
+
+    def test_binary_format(self):
+        wire = BINARY_FORMATS["application/cbor"]
+        content = {"pubkey": "00ff", "name": "00ff", "items": [{"seed": "01"}]}
+        assert cbor2.loads(wire.render(content)) == {
+            "pubkey": b"\x00\xff",
+            "name": "00ff",
+            "items": [{"seed": b"\x01"}],
+        }
+        body = wire.render([{"entropy": "02"}, {"error": "bad"}])
+        assert body[:4] == len(cbor2.dumps({"entropy": b"\x02"})).to_bytes(4)
+        assert read_frames(body) == [{"entropy": b"\x02"}, {"error": "bad"}]
+
+
+class TestBinaryResponses:
+    @pytest.mark.parametrize("client", [fast_client, standard_client])
+    def test_model(self, client: TestClient):
+        response = client.get("/item", headers=CBOR)
+        assert response.headers["content-type"] == "application/cbor"
+        assert cbor2.loads(response.content) == {"name": "ünïcode"}
+
+    @pytest.mark.parametrize("client", [fast_client, standard_client])
+    def test_list(self, client: TestClient):
+        response = client.post("/items", headers=CBOR)
+        assert response.status_code == 201
+        assert read_frames(response.content) == [{"name": "a", "note": None}]
+
+    def test_injected_response(self):
+        response = fast_client.get("/header", headers=CBOR)
+        assert response.headers["x-item"] == "set"
+        assert response.json() == {"name": "a", "note": None}
+
+    def test_app_routes(self):
+        client = TestClient(app)
+        response = client.get("/entropy/generate/128", headers=CBOR)
+        assert len(cbor2.loads(response.content)["entropy"]) == 16
+        response = client.get(f"/keypair/from_derivation/m/0'?seed={SEED}")
+        keypair = client.get(
+            f"/keypair/from_derivation/m/0'?seed={SEED}", headers=CBOR
+        )
+        assert keypair.headers["content-type"] == "application/cbor"
+        assert cbor2.loads(keypair.content) == {
+            name: check_decode(key) for name, key in response.json().items()
+        }
+        # errors are still JSON
+        response = client.get("/entropy/generate/100", headers=CBOR)
+        assert response.status_code == 422
+        assert response.headers["content-type"] == "application/json"
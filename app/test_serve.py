@@ -0,0 +1,14 @@
+import subprocess
+import sys
+
+from . import serve, settings
+
+
+class TestServe:
+    def test_env_prefix(self):
+        assert serve.ENV_PREFIX == settings.ENV_PREFIX
+
+    def test_settings_not_imported(self):
+        # the variables set by main must be there before app.settings is read
+        code = "import sys, app.serve; assert 'app.settings' not in sys.modules"
+        _ = subprocess.run([sys.executable, "-c", code], check=True)
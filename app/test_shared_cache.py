@@ -0,0 +1,158 @@
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+from .bip32 import Node
+from .cursors import CursorState
+from .shared_cache import (
+    HEADER_SIZE,
+    RECORD,
+    SharedCursorCache,
+    SharedNodeCache,
+    SharedSeedCache,
+)
+
+SEED = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def put_node(path: Path, key: bytes, value: bytes) -> None:
+    SharedNodeCache(path, slots=16, ttl=60).put((key, (1, 2)), value)
+
+
+class TestSharedNodeCache:
+    def test_round_trip(self, tmp_path: Path):
+        cache = SharedNodeCache(tmp_path / "node.cache", slots=16, ttl=60)
+        node = Node.from_seed(SEED).derive((0x80000000, 1)).to_bytes()
+        key = (cache.fingerprint(SEED), (0x80000000, 1))
+        assert cache.get(key) is None
+        cache.put(key, node)
+        assert cache.get(key) == node
+        assert cache.get((key[0], (0x80000000,))) is None
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.entries) == (1, 2, 1)
+        assert (stats.size, stats.max_entries) == (78, 16)
+
+    def test_record_layout(self, tmp_path: Path):
+        path = tmp_path / "node.cache"
+        cache = SharedNodeCache(path, slots=4, ttl=60)
+        assert RECORD.size == 97
+        assert path.stat().st_size == HEADER_SIZE + 4 * RECORD.size
+        with pytest.raises(ValueError):
+            cache.put((b"seed", ()), Node.from_seed(SEED).to_bytes(private=False))
+
+    def test_shared_between_processes(self, tmp_path: Path):
+        path = tmp_path / "node.cache"
+        cache = SharedNodeCache(path, slots=16, ttl=60)
+        key = cache.fingerprint(SEED)
+        node = Node.from_seed(SEED).derive((1, 2)).to_bytes()
+        process = multiprocessing.get_context("spawn").Process(
+            target=put_node, args=(path, key, node)
+        )
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        assert cache.get((key, (1, 2))) == node
+
+    def test_fingerprint_shared(self, tmp_path: Path):
+        first = SharedSeedCache(tmp_path / "seed.cache", slots=4, ttl=60)
+        second = SharedSeedCache(tmp_path / "seed.cache", slots=4, ttl=60)
+        assert first.fingerprint(b"mnemonic") == second.fingerprint(b"mnemonic")
+        other = SharedSeedCache(tmp_path / "other.cache", slots=4, ttl=60)
+        assert first.fingerprint(b"mnemonic") != other.fingerprint(b"mnemonic")
+
+    def test_layout_mismatch(self, tmp_path: Path):
+        _ = SharedSeedCache(tmp_path / "seed.cache", slots=4, ttl=60)
+        with pytest.raises(ValueError):
+            _ = SharedSeedCache(tmp_path / "seed.cache", slots=8, ttl=60)
+
+
+class TestSharedSeedCache:
+    def test_ttl_expiration_zeroises(self, tmp_path: Path):
+        clock = FakeClock()
+        path = tmp_path / "seed.cache"
+        cache = SharedSeedCache(path, slots=4, ttl=5, clock=clock)
+        seed = bytes(range(64))
+        cache.put(b"key", seed)
+        assert seed in path.read_bytes()
+        clock.now += 4.9
+        assert cache.get(b"key") == seed
+        clock.now += 0.1
+        assert cache.get(b"key") is None
+        assert seed[:32] not in path.read_bytes()
+        stats = cache.stats()
+        assert (stats.expirations, stats.entries) == (1, 0)
+
+    def test_eviction_of_oldest(self, tmp_path: Path):
+        clock = FakeClock()
+        cache = SharedSeedCache(tmp_path / "seed.cache", slots=2, ttl=5, clock=clock)
+        cache.put(b"a", bytes([1]) * 64)
+        clock.now += 1
+        cache.put(b"b", bytes([2]) * 64)
+        cache.put(b"c", bytes([3]) * 64)
+        assert cache.get(b"a") is None
+        assert cache.get(b"b") == bytes([2]) * 64
+        assert cache.get(b"c") == bytes([3]) * 64
+        stats = cache.stats()
+        assert (stats.evictions, stats.entries) == (1, 2)
+
+    def test_replace(self, tmp_path: Path):
+        cache = SharedSeedCache(tmp_path / "seed.cache", slots=4, ttl=5)
+        cache.put(b"a", bytes([1]) * 64)
+        cache.put(b"a", bytes([2]) * 64)
+        assert cache.get(b"a") == bytes([2]) * 64
+        assert cache.stats().entries == 1
+
+    def test_clear(self, tmp_path: Path):
+        path = tmp_path / "seed.cache"
+        cache = SharedSeedCache(path, slots=4, ttl=5)
+        cache.put(b"a", bytes(range(64)))
+        cache.clear()
+        assert cache.get(b"a") is None
+        assert path.read_bytes()[HEADER_SIZE:] == bytes(4 * RECORD.size)
+        assert cache.stats().entries == 0
+
+    def test_disabled(self, tmp_path: Path):
+        cache = SharedSeedCache(tmp_path / "seed.cache", slots=0, ttl=5)
+        assert not cache.enabled
+        cache.put(b"a", bytes(64))
+        assert cache.get(b"a") is None
+        assert not (tmp_path / "seed.cache").exists()
+
+    def test_delete(self, tmp_path: Path):
+        path = tmp_path / "seed.cache"
+        cache = SharedSeedCache(path, slots=4, ttl=5)
+        cache.put(b"a", bytes(range(64)))
+        assert cache.delete(b"a")
+        assert cache.get(b"a") is None
+        assert not cache.delete(b"a")
+        assert bytes(range(64))[:32] not in path.read_bytes()
+        assert cache.stats().entries == 0
+
+
+class TestSharedCursorCache:
+    def test_round_trip(self, tmp_path: Path):
+        cache = SharedCursorCache(tmp_path / "cursor.cache", slots=4, ttl=60)
+        node = Node.from_seed(SEED).derive((0x80000000, 1)).to_bytes()
+        state = CursorState.from_node(
+            node, 0x7FFFFFFF, public_only=True, hex_encoding=False, hardened=True
+        )
+        cache.put(b"cursor", state.to_bytes())
+        stored = cache.get(b"cursor")
+        assert stored is not None
+        assert CursorState.from_bytes(stored) == state
+        # same children as the node it was made from
+        assert Node.from_bytes(state.node()).child(3).xpub() == (
+            Node.from_bytes(node).child(3).xpub()
+        )
+        with pytest.raises(ValueError):
+            cache.put(b"cursor", state.to_bytes()[:-1])
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from .singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_coalesced(self):
+        flight: SingleFlight[int] = SingleFlight()
+        calls: list[int] = []
+
+        async def work() -> int:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        async def main() -> list[int]:
+            key = flight.fingerprint(b"seed", b"path")
+            return list(
+                await asyncio.gather(*(flight.run(key, work) for _ in range(5)))
+            )
+
+        assert asyncio.run(main()) == [42] * 5
+        assert len(calls) == 1
+        assert flight.coalesced == 4
+        assert flight.in_flight == 0
+
+    def test_distinct_keys(self):
+        flight: SingleFlight[bytes] = SingleFlight()
+
+        async def echo(key: bytes) -> bytes:
+            await asyncio.sleep(0)
+            return key
+
+        async def main() -> list[bytes]:
+            keys = [flight.fingerprint(bytes([i])) for i in range(3)]
+            return list(
+                await asyncio.gather(
+                    *(flight.run(key, lambda key=key: echo(key)) for key in keys)
+                )
+            )
+
+        assert len(set(asyncio.run(main()))) == 3
+        assert flight.coalesced == 0
+
+    def test_exception_shared(self):
+        flight: SingleFlight[int] = SingleFlight()
+
+        async def work() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        async def main() -> list[BaseException | int]:
+            return list(
+                await asyncio.gather(
+                    *(flight.run(b"key", work) for _ in range(3)),
+                    return_exceptions=True,
+                )
+            )
+
+        results = asyncio.run(main())
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.in_flight == 0
+
+    def test_cancelled_caller(self):
+        flight: SingleFlight[int] = SingleFlight()
+
+        async def work() -> int:
+            await asyncio.sleep(0.02)
+            return 42
+
+        async def main() -> int:
+            first = asyncio.ensure_future(flight.run(b"key", work))
+            second = asyncio.ensure_future(flight.run(b"key", work))
+            await asyncio.sleep(0.005)
+            _ = first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+
+        assert asyncio.run(main()) == 42
+        assert flight.in_flight == 0
+
+    def test_every_caller_cancelled(self):
+        flight: SingleFlight[int] = SingleFlight()
+
+        async def main() -> tuple[bool, int]:
+            started = asyncio.Event()
+            done = asyncio.Event()
+
+            async def work() -> int:
+                started.set()
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    done.set()
+                    raise
+                return 0
+
+            callers = [
+                asyncio.ensure_future(flight.run(b"key", work)) for _ in range(2)
+            ]
+            await started.wait()
+            for caller in callers:
+                _ = caller.cancel()
+            _ = await asyncio.gather(*callers, return_exceptions=True)
+            assert flight.in_flight == 0
+            await asyncio.wait_for(done.wait(), 1)
+
+            async def again() -> int:
+                return 7
+
+            # a new caller does not join the cancelled work
+            return done.is_set(), await flight.run(b"key", again)
+
+        assert asyncio.run(main()) == (True, 7)
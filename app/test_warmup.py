@@ -0,0 +1,14 @@
+import asyncio
+
+from .mnemonic import LANGUAGES, word_indexes
+from .warmup import prime_worker, warm_up
+
+
+class TestWarmUp:
+    def test_wordlists_loaded(self):
+        word_indexes.cache_clear()
+        asyncio.run(warm_up())
+        assert word_indexes.cache_info().currsize == len(LANGUAGES)
+
+    def test_prime_worker(self):
+        prime_worker()
@@ -0,0 +1,31 @@
+import importlib
+from typing import Final
+
+from app import bip32
+from app.executor import cpu_executor
+from app.mnemonic import load_wordlists
+
+# modules of the jobs run in the CPU executor, imported by each of its workers
+JOB_MODULES: Final[tuple[str, ...]] = ("app.routers.keypair", "app.routers.seed")
+
+
+def prime() -> None:
+    # BIP39 wordlists, and the secp256k1 context of the native engine along
+    # with the code path of a derivation
+    load_wordlists()
+    _ = bip32.Node.from_seed(bytes(16)).child(0).child(0x80000000).xpub()
+
+
+def prime_worker() -> None:
+    for module in JOB_MODULES:
+        _ = importlib.import_module(module)
+    prime()
+
+
+# run by the lifespan before the first request: the work the first requests
+# would otherwise pay for, spawning and priming every worker of the executor
+async def warm_up() -> None:
+    prime()
+    _ = await cpu_executor.run_all(
+        prime_worker, [() for _ in range(cpu_executor.workers)]
+    )
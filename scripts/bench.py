@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# Throughput, latency percentiles and CPU time of the API routes.
+#
+#   uv run python scripts/bench.py --mode asgi --output bench.json
+#   uv run python scripts/bench.py --mode uvicorn --baseline bench.json
+#
+# The app is either driven in-process through httpx's ASGITransport, or served
+# by a real uvicorn process. Results are written as JSON, and compared against
+# a previous run when --baseline is given: the exit status is 1 when a route
+# lost more than --tolerance of its throughput or of its p99 latency. Binary
+# formats are measured with e.g. --accept application/cbor.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Final, NamedTuple
+
+import httpx
+
+ROOT: Final[Path] = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+ENTROPY: Final[str] = "7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f7f"
+MNEMONIC: Final[str] = (
+    "legal winner thank year wave sausage worth useful legal winner thank yellow"
+)
+SEED: Final[str] = (
+    "2e8905819b8723fe2c1d161860e5ee1830318dbf49a83bd451cfb8440c28bd6f"
+    "a457fe1296106559a3c80937a1c1069be3a3a5bd381ee6260e8d9739fce1f607"
+)
+CLOCK_TICKS: Final[int] = os.sysconf("SC_CLK_TCK")
+
+
+class Route(NamedTuple):
+    method: str
+    url: str
+    body: dict[str, Any] | None = None
+
+
+def routes(iterations: int) -> dict[str, Route]:
+    return {
+        "entropy_generate": Route("GET", "/entropy/generate/256"),
+        "seed_from_entropy": Route(
+            "POST", "/seed/from_entropy/", {"entropy": ENTROPY}
+        ),
+        "seed_from_words": Route(
+            "GET", f"/seed/from_words/{MNEMONIC.replace(' ', '/')}"
+        ),
+        "seed_v2_from_entropy": Route(
+            "POST",
+            "/v2/seed/from_entropy/",
+            {"entropy": ENTROPY, "iterations": iterations},
+        ),
+        "seed_batch": Route(
+            "POST",
+            "/seed/batch",
+            {"items": [{"entropy": ENTROPY}] * 32, "iterations": iterations},
+        ),
+        "keypair_from_derivation": Route(
+            "GET", f"/keypair/from_derivation/m/1'/2/3'/4?seed={SEED}"
+        ),
+        "keypair_batch": Route(
+            "POST",
+            "/keypair/batch",
+            {"seed": SEED, "derivation": "m/1'/2", "range": {"count": 100}},
+        ),
+        "keypair_stream": Route(
+            "POST",
+            "/keypair/stream",
+            {"seed": SEED, "derivation": "m/1'/2", "range": {"count": 1000}},
+        ),
+    }
+
+
+def cpu_seconds(pid: int) -> float:
+    # user + system time of a process and of its living children, the workers
+    # of the CPU executor included. Linux only, 0 elsewhere.
+    try:
+        stat: str = Path(f"/proc/{pid}/stat").read_text()
+        children: list[int] = [
+            int(child)
+            for task in Path(f"/proc/{pid}/task").iterdir()
+            for child in (task / "children").read_text().split()
+        ]
+    except OSError:
+        return 0.0
+    # utime and stime, counted after the parenthesised command name
+    fields: list[str] = stat.rsplit(")", 1)[1].split()
+    ticks: int = int(fields[11]) + int(fields[12])
+    return ticks / CLOCK_TICKS + sum(cpu_seconds(child) for child in children)
+
+
+def percentile(sorted_values: list[float], rank: float) -> float:
+    # nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    index: int = round(rank / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, index))]
+
+
+async def measure(
+    client: httpx.AsyncClient,
+    route: Route,
+    requests: int,
+    concurrency: int,
+    server_pid: int,
+    headers: dict[str, str],
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors: int = 0
+    received: int = 0
+    remaining: int = requests
+
+    async def worker() -> None:
+        nonlocal errors, received, remaining
+        while remaining > 0:
+            remaining -= 1
+            start: float = time.perf_counter()
+            response: httpx.Response = await client.request(
+                route.method, route.url, json=route.body, headers=headers
+            )
+            latencies.append(time.perf_counter() - start)
+            received += len(response.content)
+            if response.status_code != 200:
+                errors += 1
+
+    cpu_start: float = cpu_seconds(server_pid)
+    start: float = time.perf_counter()
+    _ = await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration: float = time.perf_counter() - start
+    cpu: float = cpu_seconds(server_pid) - cpu_start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "duration": duration,
+        "throughput": requests / duration,
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) * 1000,
+            "p50": percentile(latencies, 50) * 1000,
+            "p90": percentile(latencies, 90) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "cpu_seconds": cpu,
+        "cpu_ms_per_request": cpu / requests * 1000,
+        "bytes_per_response": received / requests,
+    }
+
+
+@asynccontextmanager
+async def asgi_client() -> AsyncIterator[tuple[httpx.AsyncClient, int]]:
+    from app.main import app
+
+    # ASGITransport does not run the lifespan, entered here instead
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            # the client shares the process with the app: its CPU time is counted
+            yield client, os.getpid()
+
+
+@asynccontextmanager
+async def uvicorn_client(
+    concurrency: int, workers: int
+) -> AsyncIterator[tuple[httpx.AsyncClient, int]]:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port: int = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            f"--port={port}",
+            f"--workers={workers}",
+            "--log-level=warning",
+        ],
+        cwd=ROOT,
+    )
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=None
+        ) as client:
+            deadline: float = time.monotonic() + 30
+            while True:
+                try:
+                    _ = await client.get("/entropy/pool")
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn did not start") from None
+                    await asyncio.sleep(0.1)
+            yield client, server.pid
+    finally:
+        server.terminate()
+        _ = server.wait()
+
+
+async def run(arguments: argparse.Namespace) -> dict[str, Any]:
+    selected: dict[str, Route] = routes(arguments.iterations)
+    if arguments.routes:
+        selected = {name: selected[name] for name in arguments.routes}
+
+    client_factory: Callable[[], Any] = (
+        asgi_client
+        if arguments.mode == "asgi"
+        else (lambda: uvicorn_client(arguments.concurrency, arguments.workers))
+    )
+    headers: dict[str, str] = {"accept": arguments.accept}
+    results: dict[str, Any] = {}
+    async with client_factory() as (client, server_pid):
+        for name, route in selected.items():
+            # warm-up: executor workers, caches, lazy imports
+            _ = await measure(
+                client,
+                route,
+                arguments.warmup,
+                arguments.concurrency,
+                server_pid,
+                headers,
+            )
+            results[name] = await measure(
+                client,
+                route,
+                arguments.requests,
+                arguments.concurrency,
+                server_pid,
+                headers,
+            )
+            print(format_result(name, results[name]), file=sys.stderr)
+    return {
+        "mode": arguments.mode,
+        "accept": arguments.accept,
+        "concurrency": arguments.concurrency,
+        "requests": arguments.requests,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "routes": results,
+    }
+
+
+def format_result(name: str, result: dict[str, Any]) -> str:
+    latency: dict[str, float] = result["latency_ms"]
+    return (
+        f"{name:<24} {result['throughput']:>9.1f} req/s"
+        f"  p50 {latency['p50']:>8.2f} ms  p99 {latency['p99']:>8.2f} ms"
+        f"  cpu {result['cpu_ms_per_request']:>7.2f} ms/req"
+        f"  {result['bytes_per_response']:>9.0f} B"
+        f"  errors {result['errors']}"
+    )
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    regressions: list[str] = []
+    for name, result in current["routes"].items():
+        reference: dict[str, Any] | None = baseline["routes"].get(name)
+        if reference is None:
+            continue
+        throughput: float = result["throughput"] / reference["throughput"] - 1
+        p99: float = result["latency_ms"]["p99"] / reference["latency_ms"]["p99"] - 1
+        print(
+            f"{name:<24} throughput {throughput:+7.1%}  p99 {p99:+7.1%}",
+            file=sys.stderr,
+        )
+        if throughput < -tolerance:
+            regressions.append(f"{name}: throughput {throughput:+.1%}")
+        if p99 > tolerance:
+            regressions.append(f"{name}: p99 latency {p99:+.1%}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark of the API routes")
+    _ = parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    _ = parser.add_argument("--concurrency", type=int, default=16)
+    _ = parser.add_argument("--requests", type=int, default=1000, help="per route")
+    _ = parser.add_argument("--warmup", type=int, default=50, help="per route")
+    _ = parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    _ = parser.add_argument(
+        "--iterations", type=int, default=2048, help="PBKDF2 rounds, v2 seed route"
+    )
+    _ = parser.add_argument(
+        "--routes", nargs="*", choices=tuple(routes(2048)), help="all by default"
+    )
+    _ = parser.add_argument(
+        "--accept", default="application/json", help="Accept header of the requests"
+    )
+    _ = parser.add_argument("--output", type=Path, help="stdout by default")
+    _ = parser.add_argument("--baseline", type=Path, help="results to compare with")
+    _ = parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="allowed regression, 0.1 is 10%%"
+    )
+    arguments: argparse.Namespace = parser.parse_args()
+
+    results: dict[str, Any] = asyncio.run(run(arguments))
+    output: str = json.dumps(results, indent=2)
+    if arguments.output is None:
+        print(output)
+    else:
+        _ = arguments.output.write_text(output + "\n")
+
+    if arguments.baseline is None:
+        return 0
+    regressions: list[str] = compare(
+        results, json.loads(arguments.baseline.read_text()), arguments.tolerance
+    )
+    for regression in regressions:
+        print(f"regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Cold start of the API: import time of app.main, and time to first response
+# of a fresh uvicorn process, split into the time until it accepts requests
+# (imports and lifespan, warm-up included) and the latency of the first
+# request of each route.
+#
+#   uv run python scripts/startup.py --runs 5 --output startup.json
+#   APP_WARM_UP=false uv run python scripts/startup.py --runs 5
+#
+# Every run starts new processes, the median of the runs is reported.
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Final
+
+import httpx
+
+from bench import ROOT, Route, routes
+
+IMPORT_SCRIPT: Final[str] = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_seconds() -> float:
+    output: str = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(output)
+
+
+def first_responses(selected: dict[str, Route]) -> dict[str, float]:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port: int = probe.getsockname()[1]
+    start: float = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            f"--port={port}",
+            "--log-level=warning",
+        ],
+        cwd=ROOT,
+    )
+    timings: dict[str, float] = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            # uvicorn accepts connections once the lifespan has started
+            deadline: float = time.monotonic() + 60
+            while True:
+                try:
+                    _ = client.get("/openapi.json")
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn did not start") from None
+                    time.sleep(0.01)
+            timings["ready"] = time.perf_counter() - start
+            for name, route in selected.items():
+                request_start: float = time.perf_counter()
+                response: httpx.Response = client.request(
+                    route.method, route.url, json=route.body
+                )
+                response.raise_for_status()
+                timings[name] = time.perf_counter() - request_start
+    finally:
+        server.terminate()
+        _ = server.wait()
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cold start of the API")
+    _ = parser.add_argument("--runs", type=int, default=5)
+    _ = parser.add_argument(
+        "--routes", nargs="*", choices=tuple(routes(2048)), help="all by default"
+    )
+    _ = parser.add_argument("--output", type=Path, help="stdout by default")
+    arguments: argparse.Namespace = parser.parse_args()
+
+    selected: dict[str, Route] = routes(2048)
+    if arguments.routes:
+        selected = {name: selected[name] for name in arguments.routes}
+
+    imports: list[float] = [import_seconds() for _ in range(arguments.runs)]
+    runs: list[dict[str, float]] = [
+        first_responses(selected) for _ in range(arguments.runs)
+    ]
+    ready: float = statistics.median(run["ready"] for run in runs)
+    first: dict[str, float] = {
+        name: statistics.median(run[name] for run in runs) for name in selected
+    }
+    results: dict[str, Any] = {
+        "runs": arguments.runs,
+        "warm_up": os.environ.get("APP_WARM_UP", "true"),
+        "import_seconds": statistics.median(imports),
+        "ready_seconds": ready,
+        "first_response_seconds": first,
+        "time_to_first_response_seconds": {
+            name: ready + latency for name, latency in first.items()
+        },
+    }
+    print(
+        f"import {results['import_seconds'] * 1000:8.1f} ms"
+        f"  ready {ready * 1000:8.1f} ms",
+        file=sys.stderr,
+    )
+    for name, latency in first.items():
+        print(
+            f"{name:<24} first response {latency * 1000:8.1f} ms"
+            f"  from start {(ready + latency) * 1000:8.1f} ms",
+            file=sys.stderr,
+        )
+
+    output: str = json.dumps(results, indent=2)
+    if arguments.output is None:
+        print(output)
+    else:
+        _ = arguments.output.write_text(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())